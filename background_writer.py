@@ -0,0 +1,166 @@
+"""
+Bounded-queue background writer shared by the recorders and the transcript store.
+
+The caller only queues an item; a daemon thread takes the queue in order
+and writes it to a file. When the thread falls more than ``max_pending``
+items behind, new items are dropped and counted rather than growing memory.
+"""
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator, List, Union
+
+from st_utils import get_logger
+
+logger = get_logger(__name__)
+
+_CLOSE = object()
+
+
+class BackgroundWriter:
+    """
+    Base class for writers that hand items to a background thread.
+
+    Subclasses queue items with ``_put`` and implement ``_write``, which
+    consumes ``_items`` or ``_batches`` until ``close``. An exception raised
+    by ``_write`` stops writing; queued items are then discarded, and the
+    exception is raised again from ``close``.
+
+    Use as a context manager or call ``start`` and ``close``.
+    """
+
+    # Prefix of the writer thread's name
+    thread_name = "writer"
+    # What is dropped, for the warning when the writer falls behind
+    item_name = "items"
+
+    def __init__(self, path: Union[str, Path], *, max_pending: int):
+        """
+        Args:
+            path (Union[str, Path]): File the thread writes to
+            max_pending (int): Items queued before new ones are dropped
+        """
+        self.path = Path(path)
+        self.dropped = 0
+        self._queue = queue.Queue(max_pending)
+        self._thread = None
+        self._error = None
+        # Items the writer thread took from the queue but has not written yet
+        self._taken = 0
+        self._closing = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def start(self):
+        """
+        Start the writer thread.
+
+        Returns:
+            BackgroundWriter: This writer
+        """
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.thread_name}-{self.path.name}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    @property
+    def pending(self) -> int:
+        """
+        Returns:
+            int: Items queued but not yet written
+        """
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Wait until every queued item is written"""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Write queued items and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            raise self._error
+
+    def _put(self, item: Any) -> bool:
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if not self.dropped:
+                logger.warning(
+                    f"{type(self).__name__} for {self.path} is falling behind, "
+                    f"dropping {self.item_name}"
+                )
+            self.dropped += 1
+            return False
+        return True
+
+    def _batches(self, max_batch: int = 1, interval: float = 0.0) -> Iterator[List[Any]]:
+        """
+        Yield queued items until ``close``.
+
+        Args:
+            max_batch (int): Items per batch at most
+            interval (float): Seconds to collect a batch for after its first item
+
+        Yields:
+            List[Any]: Items in queue order; they count as written once the
+                next batch is requested
+        """
+        while not self._closing:
+            batch = []
+            item = self._queue.get()
+            self._taken += 1
+            deadline = time.monotonic() + interval
+            while True:
+                if item is _CLOSE:
+                    self._closing = True
+                else:
+                    batch.append(item)
+                if self._closing or len(batch) >= max_batch:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                self._taken += 1
+            if batch:
+                yield batch
+            self._mark_taken_done()
+
+    def _mark_taken_done(self) -> None:
+        for _ in range(self._taken):
+            self._queue.task_done()
+        self._taken = 0
+
+    def _items(self) -> Iterator[Any]:
+        """
+        Yields:
+            Any: Queued items one at a time, until ``close``
+        """
+        for batch in self._batches():
+            yield from batch
+
+    def _write(self) -> None:
+        raise NotImplementedError
+
+    def _run(self) -> None:
+        try:
+            self._write()
+        except Exception as error:
+            logger.error(f"Writing {self.item_name} to {self.path} failed: {error}")
+            self._error = error
+            self._mark_taken_done()
+            # Keep draining so callers never block on a dead writer
+            while not self._closing:
+                self._closing = self._queue.get() is _CLOSE
+                self._queue.task_done()
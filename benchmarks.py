@@ -0,0 +1,844 @@
+"""
+Micro-benchmarks for the hot paths of the app.
+
+Run all benchmarks with:
+
+    uv run python benchmarks.py
+
+or a single one by name, e.g. ``uv run python benchmarks.py component_payload``.
+"""
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Modules that only server-side audio features may load; importing the
+# Streamlit entry point must not pull them in
+AUDIO_MODULES = ("av", "numpy", "websockets")
+
+
+def _time_per_call(func, iterations: int) -> float:
+    """
+    Measure the average wall time of a zero-argument callable.
+
+    Args:
+        func (callable): Function to benchmark
+        iterations (int): Number of calls to average over
+
+    Returns:
+        float: Average time per call in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_component_payload(iterations: int = 2000) -> None:
+    """
+    Compare the client payload sent to the browser on every rerun with the
+    page inlined into the component args and with static bundles plus args
+    """
+    import json
+
+    from main import build_client_config
+    from prompt_utils import get_default_instructions
+    from realtime_component import BUNDLES, SOURCE_DIR
+
+    def config():
+        return build_client_config(get_default_instructions(), "sk-benchmark")
+
+    args = len(json.dumps(config()).encode())
+    page = sum(len((SOURCE_DIR / name).read_bytes()) for name in ("index.html", *BUNDLES))
+    print(f"component_payload  inline page: {page + args:8d} B/rerun")
+    print(f"component_payload  args only:   {args:8d} B/rerun"
+          f"  (bundles: {page} B, cached by the browser)")
+    print(f"component_payload  build args:  {_time_per_call(config, iterations):8.1f} us/rerun")
+
+
+def _allocated_per_call(func, iterations: int) -> float:
+    """
+    Measure the average peak Python heap growth of a zero-argument callable.
+
+    Args:
+        func (callable): Function to benchmark
+        iterations (int): Number of calls to average over
+
+    Returns:
+        float: Average peak bytes allocated per call
+    """
+    tracemalloc.start()
+    total = 0
+    for _ in range(iterations):
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        total += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.reset_peak()
+    tracemalloc.stop()
+    return total / iterations
+
+
+def bench_silence(iterations: int = 20000) -> None:
+    """Compare blank frame creation with fresh and cached silence buffers"""
+    import av
+    from utils import AudioFramePool, get_blank_audio_frame
+
+    params = dict(format="s16", layout="mono", samples=960, sample_rate=48000)
+    pool = AudioFramePool()
+
+    def fresh():
+        frame = av.AudioFrame(format="s16", layout="mono", samples=960)
+        for p in frame.planes:
+            p.update(bytes(p.buffer_size))
+        frame.sample_rate = 48000
+
+    def cached():
+        get_blank_audio_frame(**params)
+
+    def pooled():
+        pool.release(get_blank_audio_frame(**params, pool=pool))
+
+    for name, func in (("fresh", fresh), ("cached", cached), ("pooled", pooled)):
+        func()
+        print(
+            f"silence      {name + ':':8}{_time_per_call(func, iterations):8.1f} us/frame"
+            f"  {_allocated_per_call(func, iterations // 10):8.0f} B/frame peak"
+        )
+
+
+def bench_session_tokens(connects: int = 5, mint_latency: float = 0.15) -> None:
+    """Compare token acquisition on connect with and without a pre-warmed pool"""
+    from fake_realtime import FakeSessionEndpoint
+    from session_tokens import SessionTokenPool, mint_session_token
+
+    with FakeSessionEndpoint(latency=mint_latency) as endpoint:
+        def cold():
+            mint_session_token("sk-benchmark", model="m", voice="alloy", url=endpoint.url)
+
+        pool = SessionTokenPool("sk-benchmark", model="m", voice="alloy", url=endpoint.url).start()
+        cold_ms = _time_per_call(cold, connects) / 1000
+
+        warm_total = 0.0
+        for _ in range(connects):
+            # Users click Start seconds apart, which gives the pool time to refill
+            while pool.ready() < pool.size:
+                time.sleep(0.01)
+            started = time.perf_counter()
+            pool.get()
+            warm_total += time.perf_counter() - started
+        pool.stop()
+
+    print(f"session_token cold:  {cold_ms:8.1f} ms/connect"
+          f" (mint latency {mint_latency * 1000:.0f} ms)")
+    print(f"session_token warm:  {warm_total / connects * 1000:8.2f} ms/connect")
+
+
+def bench_import_time() -> None:
+    """
+    Measure the cold import time of the Streamlit entry point.
+
+    Exits non-zero if an audio-only dependency is imported, or if the total
+    exceeds the IMPORT_BUDGET_MS environment variable when it is set.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent,
+    )
+    cumulative_ms = {}
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if line.startswith("import time:") and len(fields) == 3 and fields[1].strip().isdigit():
+            cumulative_ms[fields[2].strip()] = int(fields[1]) / 1000
+
+    total = cumulative_ms["main"]
+    streamlit = cumulative_ms.get("streamlit", 0.0)
+    print(f"import_time  main:      {total:8.1f} ms")
+    print(f"import_time  streamlit: {streamlit:8.1f} ms")
+    print(f"import_time  app:       {total - streamlit:8.1f} ms")
+
+    failures = [f"{name} was imported" for name in AUDIO_MODULES if name in cumulative_ms]
+    budget = os.environ.get("IMPORT_BUDGET_MS")
+    if budget and total > float(budget):
+        failures.append(f"import took {total:.1f} ms, budget is {budget} ms")
+    for failure in failures:
+        print(f"import_time  FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+def _rss_bytes(pid: str = "self") -> int:
+    """
+    Args:
+        pid (str): Process id, the current process by default
+
+    Returns:
+        int: Resident set size of the process in bytes (Linux only)
+    """
+    with open(f"/proc/{pid}/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _cpu_seconds(pid: str = "self") -> float:
+    """
+    Args:
+        pid (str): Process id, the current process by default
+
+    Returns:
+        float: User plus system CPU time of the process in seconds (Linux only)
+    """
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def bench_recording(minutes: int = 10, chunk_ms: int = 20) -> None:
+    """
+    Record a long synthetic session and check that memory stays flat.
+
+    Exits non-zero if resident memory grows by more than 8 MB between the
+    first and the last minute of audio.
+    """
+    import tempfile
+
+    from recorder import SessionRecorder
+
+    chunk = bytes(24000 * chunk_ms // 1000 * 2)
+    chunks_per_minute = 60000 // chunk_ms
+    readings = []
+    with tempfile.TemporaryDirectory() as directory:
+        for suffix in (".ogg", ".wav"):
+            started = time.perf_counter()
+            with SessionRecorder(Path(directory) / f"session{suffix}") as recorder:
+                for minute in range(minutes):
+                    for _ in range(chunks_per_minute):
+                        # Pace to the writer, as a real-time source would never outrun it
+                        while recorder.pending > 100:
+                            time.sleep(0.001)
+                        recorder.write(chunk)
+                    readings.append(_rss_bytes())
+            elapsed = time.perf_counter() - started
+            growth = readings[-1] - readings[-minutes]
+            print(
+                f"recording    {suffix + ':':6}{minutes * 60 / elapsed:8.0f}x real time"
+                f"  rss {readings[-minutes] / 2**20:6.1f} -> {readings[-1] / 2**20:6.1f} MB"
+            )
+            if growth > 8 * 2**20:
+                print(f"recording    FAIL: memory grew by {growth / 2**20:.1f} MB"
+                      f" over {minutes} minutes")
+                sys.exit(1)
+
+
+def bench_load(
+    sessions: int = None,
+    turns: int = 3,
+    speech_ms: int = 1200,
+    frame_ms: int = 20,
+    vad_silence_ms: int = 200
+) -> None:
+    """
+    Drive concurrent relay sessions against the fake Realtime server.
+
+    Each session streams real-time paced microphone audio, ``speech_ms`` of
+    tone followed by silence until the response is done, for ``turns``
+    turns. The relay runs in its own process so that its memory and CPU
+    are measured alone. The session count is read from LOAD_SESSIONS
+    (default 100).
+    """
+    import asyncio
+    import itertools
+    import json
+
+    import numpy as np
+    from websockets.asyncio.client import connect
+
+    from fake_realtime import FakeRealtimeServer
+    from metrics import LatencyHistogram
+    from utils import audio_frame_to_pcm_views, get_blank_audio_frame, pcm_audio_to_audio_frame
+
+    sessions = sessions or int(os.environ.get("LOAD_SESSIONS", 100))
+    audio_format = dict(format="s16", layout="mono", sample_rate=24000)
+    samples = audio_format["sample_rate"] * frame_ms // 1000
+    phase = np.arange(samples) * 2 * np.pi * 220 / audio_format["sample_rate"]
+    tone = (np.sin(phase) * 8000).astype(np.int16)
+    speech_frame = pcm_audio_to_audio_frame(tone.tobytes(), **audio_format)
+    speech = bytes(audio_frame_to_pcm_views(speech_frame)[0])
+    silence_frame = get_blank_audio_frame(samples=samples, **audio_format)
+    silence = bytes(audio_frame_to_pcm_views(silence_frame)[0])
+
+    connect_ms = LatencyHistogram()
+    first_audio_ms = LatencyHistogram()
+    turn_ms = LatencyHistogram()
+    totals = {"turns": 0, "bytes_sent": 0, "bytes_received": 0}
+
+    async def stream_microphone(page, speech_end: list) -> None:
+        # Scheduled against the start time so that pacing does not drift
+        started = time.perf_counter()
+        for index in itertools.count():
+            await asyncio.sleep(max(started + index * frame_ms / 1000 - time.perf_counter(), 0))
+            if index < speech_ms // frame_ms:
+                frame = speech
+            else:
+                if not speech_end:
+                    speech_end.append(time.perf_counter())
+                frame = silence
+            await page.send(frame)
+            totals["bytes_sent"] += len(frame)
+
+    async def run_session(url: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        started = time.perf_counter()
+        async with connect(url, max_size=None) as page:
+            await page.recv()
+            connect_ms.add((time.perf_counter() - started) * 1000)
+            session = {"turn_detection": {"type": "server_vad"}}
+            await page.send(json.dumps({"type": "session.update", "session": session}))
+            for _ in range(turns):
+                speech_end = []
+                first_audio = None
+                microphone = asyncio.create_task(stream_microphone(page, speech_end))
+                try:
+                    async for message in page:
+                        if isinstance(message, bytes):
+                            totals["bytes_received"] += len(message)
+                            if first_audio is None:
+                                first_audio = time.perf_counter()
+                        elif json.loads(message)["type"] == "response.done":
+                            break
+                finally:
+                    microphone.cancel()
+                if speech_end and first_audio:
+                    first_audio_ms.add((first_audio - speech_end[0]) * 1000)
+                    turn_ms.add((time.perf_counter() - speech_end[0]) * 1000)
+                totals["turns"] += 1
+
+    async def sample_relay(pid: int, peak: list) -> None:
+        while True:
+            peak[0] = max(peak[0], _rss_bytes(pid))
+            await asyncio.sleep(0.1)
+
+    async def run() -> None:
+        async with FakeRealtimeServer(vad_silence_ms=vad_silence_ms) as fake:
+            relay = await asyncio.create_subprocess_exec(
+                sys.executable, "relay.py", "--port", "0", "--url", fake.url,
+                cwd=Path(__file__).parent,
+                env={**os.environ, "OPENAI_API_KEY": "sk-benchmark"},
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                url = (await relay.stdout.readline()).decode().strip()
+                baseline = peak_rss = _rss_bytes(relay.pid)
+                peak = [peak_rss]
+                sampler = asyncio.create_task(sample_relay(relay.pid, peak))
+                cpu_before = _cpu_seconds(relay.pid)
+                driver_cpu_before = _cpu_seconds()
+                started = time.perf_counter()
+                # Ramp up over a second rather than opening every socket at once
+                results = await asyncio.gather(
+                    *(run_session(url, index / sessions) for index in range(sessions)),
+                    return_exceptions=True
+                )
+                elapsed = time.perf_counter() - started
+                cpu = _cpu_seconds(relay.pid) - cpu_before
+                driver_cpu = _cpu_seconds() - driver_cpu_before
+                sampler.cancel()
+                peak_rss = peak[0]
+            finally:
+                relay.terminate()
+                await relay.wait()
+
+        failures = [result for result in results if isinstance(result, BaseException)]
+        print(f"load         sessions:   {sessions:8d}"
+              f"  ({len(failures)} failed, {turns} turns each)")
+        audio_bytes = totals["bytes_sent"] + totals["bytes_received"]
+        print(f"load         throughput: {totals['turns'] / elapsed:8.1f} turns/s"
+              f"  {audio_bytes / elapsed / 2**20:6.2f} MB/s audio")
+        histograms = (("connect", connect_ms), ("first_audio", first_audio_ms), ("turn", turn_ms))
+        for name, histogram in histograms:
+            summary = histogram.summary()
+            print(f"load         {name + ':':12}" + "".join(
+                f"  {key} {summary[key]:7.1f} ms" for key in ("p50", "p95", "p99") if key in summary
+            ))
+        print(f"load         relay rss:  {(peak_rss - baseline) / sessions / 2**10:8.1f} KB/session"
+              f"  (baseline {baseline / 2**20:.1f} MB)")
+        print(f"load         relay cpu:  {cpu / elapsed * 100:8.1f} % of a core"
+              f"  ({cpu / elapsed / sessions * 1000:.2f} ms/s per session)")
+        # Latencies are only meaningful while the driver itself has CPU to spare
+        print(f"load         driver cpu: {driver_cpu / elapsed * 100:8.1f} % of a core"
+              "  (driver and fake server)")
+        print(f"load         first_audio includes the {vad_silence_ms} ms VAD silence window")
+        for failure in failures[:3]:
+            print(f"load         FAIL: {failure!r}")
+        if failures:
+            sys.exit(1)
+
+    asyncio.run(run())
+
+
+def bench_audio_profiles(seconds: int = 20) -> None:
+    """
+    Estimate the bytes per second sent with each WebRTC audio profile.
+
+    Encodes synthetic speech (one second of voiced noise, one second of
+    silence) with libopus at each profile's capture rate, bitrate and
+    packet time, and adds 50 bytes of IP/UDP/RTP/SRTP overhead per packet.
+    With DTX, WebRTC stops sending during silence apart from a comfort
+    noise update every 400 ms; that is modelled here, since FFmpeg's
+    libopus wrapper does not expose DTX.
+    """
+    from fractions import Fraction
+
+    import av
+    import numpy as np
+
+    from main import AUDIO_PROFILES
+    from utils import pcm_audio_to_audio_frame
+
+    packet_overhead = 50
+    # Chrome's Opus bitrate and packet time when the SDP does not set them
+    browser_bitrate = 32000
+    browser_ptime = 20
+    rng = np.random.default_rng(0)
+
+    for name, profile in AUDIO_PROFILES.items():
+        rate = profile["sample_rate"]
+        ptime = profile["ptime"] or browser_ptime
+        t = np.arange(rate * seconds) / rate
+        voiced = (
+            np.sin(2 * np.pi * 140 * t) * 4000
+            + np.sin(2 * np.pi * 700 * t) * 2000
+            + rng.normal(0, 800, t.size)
+        )
+        speech = (voiced * ((t % 2) < 1)).astype(np.int16)
+
+        codec = av.CodecContext.create("libopus", "w")
+        codec.sample_rate = rate
+        codec.layout = "mono"
+        codec.format = "s16"
+        codec.bit_rate = profile["max_average_bitrate"] or browser_bitrate
+        codec.options = {"frame_duration": str(ptime)}
+        codec.open()
+
+        samples = rate * ptime // 1000
+        payload = packets = 0
+        silent_ms = 0
+        for start in range(0, speech.size - samples + 1, samples):
+            chunk = speech[start:start + samples]
+            frame = pcm_audio_to_audio_frame(
+                chunk.tobytes(), format="s16", layout="mono", sample_rate=rate
+            )
+            frame.pts = start
+            frame.time_base = Fraction(1, rate)
+            for packet in codec.encode(frame):
+                if profile["dtx"] and not chunk.any():
+                    silent_ms += ptime
+                    if silent_ms < 400:
+                        continue
+                    silent_ms = 0
+                    payload += 3
+                else:
+                    silent_ms = 0
+                    payload += packet.size
+                packets += 1
+
+        wire = payload + packets * packet_overhead
+        print(
+            f"audio_profile {name + ':':15}{payload / seconds:8.0f} B/s payload"
+            f"  {wire / seconds:8.0f} B/s on the wire  {packets / seconds:5.1f} packets/s"
+        )
+
+
+def bench_preprocess(seconds: int = 120, frame_ms: int = 20) -> None:
+    """
+    Measure the throughput of the preprocessing stage in frames per CPU
+    second (one core), for 48 kHz stereo microphone frames going out as
+    24 kHz pcm16, and how much of a talk-and-pause stream is trimmed
+    """
+    import numpy as np
+
+    from preprocessing import AudioPreprocessor
+    from utils import AudioFramePool, pcm_audio_to_audio_frame
+
+    rate = 48000
+    samples = rate * frame_ms // 1000
+    t = np.arange(samples) / rate
+    # A 220 Hz tone with a 3 Hz syllable envelope
+    tone = 6000 * np.sin(2 * np.pi * 220 * t) * (1 + np.sin(2 * np.pi * 3 * t))
+    speech = np.repeat(tone.astype(np.int16), 2)
+    noise = np.repeat(np.random.default_rng(0).normal(0, 20, samples).astype(np.int16), 2)
+    # 2 s of speech, then 3 s of pause
+    cycle = 5000 // frame_ms
+    frames = [
+        pcm_audio_to_audio_frame(
+            (speech if i % cycle < 2000 // frame_ms else noise).tobytes(),
+            format="s16",
+            layout="stereo",
+            sample_rate=rate
+        )
+        for i in range(seconds * 1000 // frame_ms)
+    ]
+    bytes_in = len(frames) * (samples // 2) * 2
+
+    for mode, threshold_db in (("resample", None), ("resample+vad", -45.0)):
+        pool = AudioFramePool()
+        preprocessor = AudioPreprocessor(
+            input_rate=rate, output_rate=24000, threshold_db=threshold_db, pool=pool
+        )
+        started = time.thread_time()
+        for frame in frames:
+            for out in preprocessor.process(frame):
+                pool.release(out)
+        cpu = time.thread_time() - started
+        stats = preprocessor.stats
+        print(
+            f"preprocess {mode + ':':14}{len(frames) / cpu:9.0f} frames/s/core"
+            f"  ({len(frames) / cpu * frame_ms / 1000:5.0f}x real time)"
+            f"  sent {stats['bytes_out'] / bytes_in:6.1%} of 24 kHz audio"
+        )
+
+
+def _synthetic_session_events(minutes: int, seed: int = 0):
+    """
+    Generate the server events of a simulated voice session, turn by turn.
+
+    Users speak 2-8 s and the assistant answers for 3-12 s, at about 2.5
+    words per second, with a few seconds of pause between turns.
+
+    Yields:
+        dict: Realtime server event
+    """
+    import random
+
+    rng = random.Random(seed)
+    words = (
+        "the patient reports pain in the upper right abdomen"
+        " after taking herbal supplements for weeks"
+    ).split()
+    audio_ms = 0
+    turn = 0
+    while audio_ms < minutes * 60000:
+        turn += 1
+        user_id, assistant_id = f"item_user_{turn}", f"item_assistant_{turn}"
+        speech_ms = rng.randint(2000, 8000)
+        yield {
+            "type": "input_audio_buffer.speech_started",
+            "audio_start_ms": audio_ms,
+            "item_id": user_id,
+        }
+        audio_ms += speech_ms
+        yield {
+            "type": "input_audio_buffer.speech_stopped",
+            "audio_end_ms": audio_ms,
+            "item_id": user_id,
+        }
+        yield {
+            "type": "conversation.item.created",
+            "item": {
+                "id": user_id,
+                "type": "message",
+                "role": "user",
+                "content": [{"type": "input_audio", "transcript": None}],
+            },
+        }
+        yield {
+            "type": "conversation.item.input_audio_transcription.completed",
+            "item_id": user_id,
+            "transcript": " ".join(rng.choices(words, k=speech_ms * 25 // 10000)),
+        }
+        yield {
+            "type": "conversation.item.created",
+            "item": {"id": assistant_id, "type": "message", "role": "assistant", "content": []},
+        }
+        answer_ms = rng.randint(3000, 12000)
+        answer = " ".join(rng.choices(words, k=answer_ms * 25 // 10000))
+        yield {
+            "type": "response.done",
+            "response": {
+                "status": "completed",
+                "output": [{
+                    "id": assistant_id,
+                    "type": "message",
+                    "role": "assistant",
+                    "content": [{"type": "audio", "transcript": answer}],
+                }],
+                "usage": {"output_token_details": {"audio_tokens": answer_ms // 50}},
+            },
+        }
+        audio_ms += answer_ms + rng.randint(500, 4000)
+
+
+def bench_conversation(minutes: int = 60, token_budget: int = 16000) -> None:
+    """
+    Replay synthetic one-hour sessions through a ConversationStore, without
+    and with a token budget, against a simulated server conversation that
+    applies the delete and create events the store sends.
+
+    Fails if the context ends up over budget or the store and the server
+    disagree on the items.
+    """
+    from conversation import ConversationStore
+
+    events = list(_synthetic_session_events(minutes))
+    failures = []
+    for label, budget in (("unbounded", None), (f"budget {token_budget}", token_budget)):
+        store = ConversationStore(token_budget=budget)
+        # The server's view of the conversation: item ID -> tokens
+        server = {}
+        peak = handled = 0
+        tracemalloc.start()
+        started = time.perf_counter()
+        pending = list(events)
+        pending.reverse()
+        while pending:
+            event = pending.pop()
+            handled += 1
+            if event["type"] == "conversation.item.created":
+                server[event["item"]["id"]] = None
+            for client_event in store.handle_event(event):
+                # Answer like the server would, ahead of the next session event
+                if client_event["type"] == "conversation.item.delete":
+                    del server[client_event["item_id"]]
+                    pending.append({
+                        "type": "conversation.item.deleted",
+                        "item_id": client_event["item_id"],
+                    })
+                else:
+                    pending.append({
+                        "type": "conversation.item.created",
+                        "item": client_event["item"],
+                    })
+            peak = max(peak, store.tokens)
+        elapsed = time.perf_counter() - started
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        items = {item.item_id for item in store}
+        if store.summary:
+            items.add(store.summary.item_id)
+        if items != set(server):
+            failures.append(f"{label}: store has {len(items)} items, server has {len(server)}")
+        if budget is not None and store.tokens > budget:
+            failures.append(f"{label}: context ends at {store.tokens} tokens")
+        print(
+            f"conversation {label + ':':14}{store.stats['items_added']:5d} items"
+            f"  peak {peak:7d} tokens  final {store.tokens:7d} tokens in {len(store):3d} items"
+            f"  {store.stats['items_deleted']:4d} deleted"
+            f" in {store.stats['truncations']:3d} truncations"
+            f"  {elapsed / handled * 1e6:6.1f} us/event  {memory / 1024:6.0f} KiB"
+        )
+    for failure in failures:
+        print(f"conversation FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+class _SlowStream:
+    """Text sink that blocks on every write, like a backed-up log pipe"""
+
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay_s)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def bench_logging(events: int = 2000, sink_delay_us: int = 200) -> None:
+    """
+    Compare script-thread time spent logging a burst of session events
+    with a synchronous StreamHandler and with the queue-backed handler.
+
+    Each event logs what process_client_reports does for a turn report:
+    a DEBUG line and an INFO metric line.
+    """
+    import json
+    import logging
+
+    from st_utils import create_log_handler, set_correlation_id
+
+    set_correlation_id("bench")
+    event = {"metric": "turn", "status": "completed", "speech_ms": 1830, "response_latency_ms": 612}
+    sinks = {
+        "devnull": lambda: open(os.devnull, "w"),
+        f"slow {sink_delay_us}us": lambda: _SlowStream(sink_delay_us / 1e6),
+    }
+
+    for sink_name, open_sink in sinks.items():
+        for mode, use_queue in (("sync", False), ("queue", True)):
+            for json_format in (False, True):
+                handler = create_log_handler(
+                    open_sink(), use_queue=use_queue, json_format=json_format
+                )
+                logger = logging.getLogger(f"bench_logging.{mode}.{sink_name}.{json_format}")
+                logger.propagate = False
+                logger.setLevel(logging.DEBUG)
+                logger.addHandler(handler)
+
+                wall, cpu = time.perf_counter(), time.thread_time()
+                for i in range(events):
+                    logger.debug(f"Client report: {event}")
+                    logger.info(json.dumps({**event, "turn": i}))
+                wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+
+                logger.removeHandler(handler)
+                handler.close()
+                label = f"{mode} {'json' if json_format else 'text'} -> {sink_name}:"
+                print(
+                    f"logging {label:30}{wall / events * 1e6:8.1f} us/event wall"
+                    f"  {cpu / events * 1e6:6.1f} us/event cpu  on the script thread"
+                )
+
+
+def bench_transcripts(sessions: int = 20, messages: int = 200) -> None:
+    """
+    Compare script-thread time per stored transcript message with a
+    synchronous SQLite insert and commit and with the batching
+    TranscriptStore, then check the indexed per-session query.
+
+    Every third user message is reported twice, as when a late transcription
+    extends it. Fails if a session's transcript is not the latest version of
+    each message in order.
+    """
+    import sqlite3
+    import tempfile
+
+    from transcript_store import _SCHEMA, TranscriptStore
+
+    reports = []
+    for session in range(sessions):
+        for index in range(messages):
+            role = "user" if index % 2 == 0 else "assistant"
+            text = f"{role} message {index} " * 8
+            message = {"index": index, "role": role, "text": text, "time": str(index)}
+            reports.append((f"session{session}", message))
+            if role == "user" and index % 3 == 0:
+                reports.append((f"session{session}", {**message, "text": text + "and more"}))
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = TranscriptStore(Path(directory) / "batched.db")
+        connection = sqlite3.connect(Path(directory) / "sync.db")
+        connection.executescript(_SCHEMA)
+
+        def insert(session_id, message):
+            with connection:
+                connection.execute(
+                    "INSERT INTO transcript (session_id, page_id, entry_index, case_id,"
+                    " role, text, client_time, stored_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        session_id, "page", message["index"], None,
+                        message["role"], message["text"], message["time"], time.time(),
+                    )
+                )
+
+        def append(session_id, message):
+            store.append(session_id, "page", message)
+
+        store.start()
+        timings = {}
+        for mode, write in (("sync commit", insert), ("batched", append)):
+            started = time.perf_counter()
+            for session_id, message in reports:
+                write(session_id, message)
+            timings[mode] = time.perf_counter() - started
+        started = time.perf_counter()
+        store.flush()
+        drain = time.perf_counter() - started
+        connection.close()
+
+        for mode, elapsed in timings.items():
+            print(f"transcripts  {mode + ':':13}{elapsed / len(reports) * 1e6:8.1f} us/message"
+                  " on the script thread")
+        print(f"transcripts  writer drained the backlog {drain * 1e3:.0f} ms later"
+              f" in {store.batches_written} batches")
+
+        started = time.perf_counter()
+        transcript = store.get_transcript(f"session{sessions // 2}")
+        query_ms = (time.perf_counter() - started) * 1e3
+        store.close()
+
+    print(f"transcripts  query:       {query_ms:8.2f} ms for one session"
+          f" among {len(reports)} stored messages")
+    queried = f"session{sessions // 2}"
+    expected = [message for session_id, message in reports if session_id == queried]
+    latest = {message["index"]: message["text"] for message in expected}
+    if [(row["entry_index"], row["text"]) for row in transcript] != sorted(latest.items()):
+        print("transcripts  FAIL: query did not return the latest version of each message in order")
+        sys.exit(1)
+    if store.dropped_messages:
+        print(f"transcripts  FAIL: {store.dropped_messages} messages dropped")
+        sys.exit(1)
+
+
+def bench_client_replay(repeats: tuple = (10, 50)) -> None:
+    """
+    Replay the recorded fake session through the browser client in the
+    headless harness, as fast as possible, at two session lengths.
+
+    Fails if the client logs errors, does not report every transcript
+    message, or if its DOM grows with session length instead of staying
+    within the transcript window.
+    """
+    import shutil
+
+    from event_fixtures import read_fixture, replay_fixture
+    from main import build_client_config
+    from prompt_utils import get_default_instructions
+
+    if shutil.which("node") is None:
+        print("client_replay  skipped: needs Node.js")
+        return
+
+    fixture = Path(__file__).parent / "fixtures" / "fake_session.jsonl.gz"
+    turns = sum(event["type"] == "response.done" for _, event in read_fixture(fixture))
+    config = build_client_config(get_default_instructions(), "sk-benchmark")
+    failures = []
+    peaks = []
+    for repeat in repeats:
+        result = replay_fixture(fixture, config, repeat=repeat)
+        peaks.append(result["peak_dom_nodes"])
+        print(
+            f"client_replay  {repeat * turns:4d} turns: {result['events']:6d} events"
+            f"  {result['events_per_s']:8d} events/s"
+            f"  main thread {result['main_thread_ms']:7.1f} ms"
+            f"  longest task {result['max_task_ms']:5.2f} ms  {result['frames']:5d} frames"
+            f"  dom {result['dom_nodes']:4d} nodes (peak {result['peak_dom_nodes']})"
+        )
+        if result["errors"]:
+            failures.append(f"{repeat * turns} turns: client errors: {result['errors']}")
+        transcript_reports = result["reports"].get("transcript")
+        if transcript_reports != 2 * repeat * turns:
+            failures.append(f"{repeat * turns} turns: {transcript_reports} transcript reports")
+    if len(set(peaks)) > 1:
+        failures.append(f"DOM grows with session length: peak nodes {peaks}")
+    for failure in failures:
+        print(f"client_replay  FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+BENCHMARKS = {
+    "component_payload": bench_component_payload,
+    "silence": bench_silence,
+    "session_tokens": bench_session_tokens,
+    "import_time": bench_import_time,
+    "recording": bench_recording,
+    "load": bench_load,
+    "audio_profiles": bench_audio_profiles,
+    "logging": bench_logging,
+    "preprocess": bench_preprocess,
+    "conversation": bench_conversation,
+    "transcripts": bench_transcripts,
+    "client_replay": bench_client_replay,
+}
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,304 @@
+"""
+Server-side model of a Realtime conversation and its context budget.
+
+The Realtime API keeps every conversation item in the model context, so a
+long simulation gets slower and more expensive with every turn. A
+ConversationStore follows the items of one session from the server events
+(``conversation.item.*``, ``input_audio_buffer.speech_*`` and
+``response.done``) and estimates their tokens. When the context exceeds the
+token budget it returns the client events that bring it back under:
+``conversation.item.delete`` for the oldest items and, optionally, a
+``conversation.item.create`` with a rolling summary of what was deleted.
+Deleted items leave the store right away; the server's
+``conversation.item.deleted`` confirmations are then no-ops.
+"""
+from typing import Callable, Dict, Iterator, List, Optional
+
+from prompt_utils import count_tokens
+
+# Approximate audio token rates of the Realtime models
+INPUT_AUDIO_MS_PER_TOKEN = 100
+OUTPUT_AUDIO_MS_PER_TOKEN = 50
+
+SUMMARY_ITEM_PREFIX = "summary_"
+
+
+class ConversationItem:
+    """One conversation item and its estimated share of the context"""
+
+    __slots__ = ("item_id", "role", "type", "text", "audio_ms", "tokens")
+
+    def __init__(
+        self, item_id: str, role: Optional[str], type: str, text: str = "", audio_ms: int = 0
+    ):
+        self.item_id = item_id
+        self.role = role
+        self.type = type
+        self.text = text
+        self.audio_ms = audio_ms
+        self.tokens = 0
+        self.estimate_tokens()
+
+    def estimate_tokens(self) -> None:
+        """Recompute ``tokens`` from the text and audio duration"""
+        if self.role == "assistant":
+            ms_per_token = OUTPUT_AUDIO_MS_PER_TOKEN
+        else:
+            ms_per_token = INPUT_AUDIO_MS_PER_TOKEN
+        self.tokens = (count_tokens(self.text) if self.text else 0) + self.audio_ms // ms_per_token
+
+
+def extractive_summary(previous: str, items: List[ConversationItem], max_chars: int = 2000) -> str:
+    """
+    Summarize deleted items by keeping the start of each message.
+
+    Used when no model-based summarizer is configured. The newest lines are
+    kept when the summary outgrows ``max_chars``.
+
+    Args:
+        previous (str): Summary of items deleted earlier, if any
+        items (List[ConversationItem]): Items being deleted, oldest first
+        max_chars (int): Maximum summary length
+
+    Returns:
+        str: Summary text
+    """
+    lines = previous.splitlines()[1:] if previous else []
+    for item in items:
+        if item.text:
+            text = item.text
+            if len(text) > 200:
+                text = text[:200].rsplit(" ", 1)[0] + " ..."
+            lines.append(f"- {(item.role or 'system').capitalize()}: {text}")
+    while lines and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(["Summary of the earlier conversation:", *lines])
+
+
+class ConversationStore:
+    """
+    Conversation items of one Realtime session, oldest first.
+
+    Items live in a fixed-size ring buffer of ``capacity`` slots with an
+    index by item ID; items deleted out of order leave an empty slot that is
+    skipped. When more than ``capacity`` items are live, or the context
+    exceeds ``token_budget`` after a response, ``handle_event`` returns the
+    client events that delete the oldest items, down to ``target_ratio`` of
+    the budget but never the ``keep_last`` most recent ones.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int = 512,
+        token_budget: Optional[int] = None,
+        target_ratio: float = 0.75,
+        keep_last: int = 6,
+        summarize: Optional[Callable[[str, List[ConversationItem]], str]] = extractive_summary
+    ):
+        """
+        Args:
+            capacity (int): Maximum number of items tracked, and kept in the context
+            token_budget (int): Context tokens that trigger truncation; unlimited when None
+            target_ratio (float): Share of the budget that truncation brings the context down to
+            keep_last (int): Number of most recent items that are never deleted
+            summarize (Callable[[str, List[ConversationItem]], str]): Builds the summary item
+                from the previous summary and the deleted items; items are deleted without
+                a summary when None
+        """
+        if capacity <= keep_last:
+            raise ValueError("capacity must be larger than keep_last")
+        self.capacity = capacity
+        self.token_budget = token_budget
+        self.target_ratio = target_ratio
+        self.keep_last = keep_last
+        self.summarize = summarize
+        self.stats = {
+            "items_added": 0,
+            "items_deleted": 0,
+            "truncations": 0,
+        }
+        self.tokens = 0
+        self.summary: Optional[ConversationItem] = None
+        self._slots: List[Optional[ConversationItem]] = [None] * capacity
+        self._head = 0
+        self._end = 0
+        self._index: Dict[str, ConversationItem] = {}
+        self._summary_count = 0
+        # Speech start and duration of user audio items, by item ID; server
+        # VAD reports them before the item is created
+        self._speech_started: Dict[str, int] = {}
+        self._speech_ms: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[ConversationItem]:
+        for position in range(self._head, self._end):
+            item = self._slots[position % self.capacity]
+            if item is not None:
+                yield item
+
+    def get(self, item_id: str) -> Optional[ConversationItem]:
+        """
+        Args:
+            item_id (str): Conversation item ID
+
+        Returns:
+            ConversationItem: The item, or None if it is not in the conversation
+        """
+        return self._index.get(item_id)
+
+    def handle_event(self, event: dict) -> List[dict]:
+        """
+        Update the conversation from a server event.
+
+        Args:
+            event (dict): Realtime server event
+
+        Returns:
+            List[dict]: Client events to send upstream to stay within capacity and budget
+        """
+        event_type = event["type"]
+        if event_type == "conversation.item.created":
+            return self._add(event["item"])
+        if event_type == "conversation.item.deleted":
+            self._remove(event["item_id"])
+        elif event_type == "conversation.item.input_audio_transcription.completed":
+            self._update(event["item_id"], text=event.get("transcript") or "")
+        elif event_type == "conversation.item.truncated":
+            self._update(event["item_id"], audio_ms=event["audio_end_ms"])
+        elif event_type == "input_audio_buffer.speech_started":
+            self._speech_started[event["item_id"]] = event["audio_start_ms"]
+        elif event_type == "input_audio_buffer.speech_stopped":
+            started = self._speech_started.pop(event["item_id"], event["audio_end_ms"])
+            self._speech_ms[event["item_id"]] = event["audio_end_ms"] - started
+        elif event_type == "response.done":
+            return self._finish_response(event["response"])
+        return []
+
+    def _add(self, item: dict) -> List[dict]:
+        item_id = item["id"]
+        content = item.get("content") or ()
+        text = "".join(part.get("text") or part.get("transcript") or "" for part in content)
+        record = ConversationItem(
+            item_id,
+            item.get("role"),
+            item.get("type", "message"),
+            text,
+            self._speech_ms.pop(item_id, 0)
+        )
+        self.stats["items_added"] += 1
+        if item_id.startswith(SUMMARY_ITEM_PREFIX):
+            # Summaries sit at the root of the conversation, outside the ring
+            self.summary = record
+            self.tokens += record.tokens
+            return []
+
+        events = []
+        if self._end - self._head == self.capacity:
+            # Delete a batch, so that a full store does not resend the summary on every item
+            target = int(self.capacity * self.target_ratio)
+            events = self._delete_oldest(0, min_items=max(len(self) - target, 1))
+        self._slots[self._end % self.capacity] = record
+        self._end += 1
+        self._index[item_id] = record
+        self.tokens += record.tokens
+        return events
+
+    def _update(
+        self, item_id: str, *, text: Optional[str] = None, audio_ms: Optional[int] = None
+    ) -> None:
+        record = self._index.get(item_id)
+        if record is None and self.summary is not None and self.summary.item_id == item_id:
+            record = self.summary
+        if record is None:
+            return
+        if text is not None:
+            record.text = text
+        if audio_ms is not None:
+            record.audio_ms = audio_ms
+        self.tokens -= record.tokens
+        record.estimate_tokens()
+        self.tokens += record.tokens
+
+    def _remove(self, item_id: str) -> None:
+        if self.summary is not None and self.summary.item_id == item_id:
+            self.tokens -= self.summary.tokens
+            self.summary = None
+        else:
+            self._discard(item_id)
+
+    def _discard(self, item_id: str) -> None:
+        record = self._index.pop(item_id, None)
+        if record is None:
+            return
+        self.tokens -= record.tokens
+        for position in range(self._head, self._end):
+            if self._slots[position % self.capacity] is record:
+                self._slots[position % self.capacity] = None
+                break
+        # Advance past empty slots at the oldest end
+        while self._head < self._end and self._slots[self._head % self.capacity] is None:
+            self._head += 1
+
+    def _finish_response(self, response: dict) -> List[dict]:
+        # Output audio length is only known from the response's token usage
+        usage = response.get("usage") or {}
+        audio_tokens = (usage.get("output_token_details") or {}).get("audio_tokens", 0)
+        for output in response.get("output") or ():
+            record = self._index.get(output.get("id"))
+            if record is None:
+                continue
+            content = output.get("content") or ()
+            text = "".join(part.get("transcript") or part.get("text") or "" for part in content)
+            audio_ms = audio_tokens * OUTPUT_AUDIO_MS_PER_TOKEN
+            self._update(record.item_id, text=text, audio_ms=audio_ms)
+            audio_tokens = 0
+
+        if self.token_budget is None or self.tokens <= self.token_budget:
+            return []
+        events = self._delete_oldest(self.tokens - self.token_budget * self.target_ratio)
+        if events:
+            self.stats["truncations"] += 1
+        return events
+
+    def _delete_oldest(self, tokens: float, min_items: int = 0) -> List[dict]:
+        """Delete the oldest items until ``tokens`` are freed and at least ``min_items`` are gone"""
+        victims = []
+        freed = 0
+        for item in list(self)[:len(self) - self.keep_last]:
+            if freed >= tokens and len(victims) >= min_items:
+                break
+            victims.append(item)
+            freed += item.tokens
+        if not victims:
+            return []
+
+        events = [{"type": "conversation.item.delete", "item_id": item.item_id} for item in victims]
+        for item in victims:
+            self._discard(item.item_id)
+        self.stats["items_deleted"] += len(victims)
+        if self.summarize is not None:
+            events.extend(self._replace_summary(victims))
+        return events
+
+    def _replace_summary(self, deleted: List[ConversationItem]) -> List[dict]:
+        previous = self.summary
+        text = self.summarize(previous.text if previous else "", deleted)
+        self._summary_count += 1
+        events = []
+        if previous is not None:
+            events.append({"type": "conversation.item.delete", "item_id": previous.item_id})
+            self._remove(previous.item_id)
+        events.append({
+            "type": "conversation.item.create",
+            "previous_item_id": "root",
+            "item": {
+                "id": f"{SUMMARY_ITEM_PREFIX}{self._summary_count}",
+                "type": "message",
+                "role": "system",
+                "content": [{"type": "input_text", "text": text}],
+            },
+        })
+        return events
@@ -0,0 +1,299 @@
+"""
+Realtime server event streams recorded as replayable fixtures.
+
+A fixture is a JSON lines file, gzip-compressed when its name ends in
+``.gz``. The first line is a header; every other line is one server event
+as ``[offset_ms, event]``, timed from the first event. Audio deltas are most
+of a session's bytes, but the client only counts their audio, so their
+base64 payload is stored as its decoded length and replayed as silence.
+
+EventRecorder writes fixtures, from the relay (``EVENT_FIXTURE_DIR``) or
+from record_fake_session, which drives FakeRealtimeServer without network
+access. replay_fixture feeds a fixture through the browser client
+headlessly: ``frontend/replay/harness.js`` runs the client under Node.js
+with a minimal DOM and a fake peer connection whose data channel delivers
+the events, and reports the client's throughput, main-thread time and DOM
+size.
+"""
+import base64
+import gzip
+import json
+import subprocess
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+from background_writer import BackgroundWriter
+
+FIXTURE_FORMAT = "realtime-events"
+FIXTURE_VERSION = 1
+AUDIO_DELTA_TYPE = "response.audio.delta"
+HARNESS = Path(__file__).parent / "frontend" / "replay" / "harness.js"
+
+
+def _open(path: Path, mode: str):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class EventRecorder(BackgroundWriter):
+    """
+    Writes the server events of one session to a fixture file as they arrive.
+
+    A background writer thread compacts, serializes and compresses the
+    events, so ``write`` never blocks the relay's event loop. Events are
+    dropped and counted in ``dropped_events`` when the thread falls more
+    than ``max_pending`` events behind.
+    """
+
+    thread_name = "events"
+    item_name = "events"
+
+    def __init__(self, path: Union[str, Path], *, max_pending: int = 10000):
+        """
+        Args:
+            path (Union[str, Path]): Fixture file to write; gzip-compressed if it ends in .gz
+            max_pending (int): Events queued before new ones are dropped
+        """
+        super().__init__(path, max_pending=max_pending)
+        self.events = 0
+        self._started_at = None
+
+    def write(self, event: dict) -> bool:
+        """
+        Queue a server event for writing, timed from the first one.
+
+        Args:
+            event (dict): Realtime server event; must not be modified afterwards
+
+        Returns:
+            bool: False if the event was dropped because the writer is behind
+        """
+        now = time.monotonic()
+        if self._started_at is None:
+            self._started_at = now
+        return self._put((round((now - self._started_at) * 1000, 1), event))
+
+    @property
+    def dropped_events(self) -> int:
+        """
+        Returns:
+            int: Events dropped because the writer was behind
+        """
+        return self.dropped
+
+    def _write(self) -> None:
+        # Opened by the writer thread, so that start does not wait on disk
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _open(self.path, "w") as file:
+            file.write(json.dumps({"fixture": FIXTURE_FORMAT, "version": FIXTURE_VERSION}) + "\n")
+            for offset_ms, event in self._items():
+                if event["type"] == AUDIO_DELTA_TYPE and isinstance(event.get("delta"), str):
+                    event = {**event, "delta": len(base64.b64decode(event["delta"]))}
+                file.write(json.dumps([offset_ms, event], separators=(",", ":")) + "\n")
+                self.events += 1
+
+
+def open_event_recorder(directory: Union[str, Path], session_id: str) -> EventRecorder:
+    """
+    Start a fixture recorder for a session under a fixtures directory.
+
+    Args:
+        directory (Union[str, Path]): Fixtures directory, created if missing
+        session_id (str): Session identifier used in the file name
+
+    Returns:
+        EventRecorder: Started recorder
+    """
+    return EventRecorder(Path(directory) / f"{session_id}-events.jsonl.gz").start()
+
+
+def read_fixture(path: Union[str, Path]) -> Iterator[Tuple[float, dict]]:
+    """
+    Iterate over the events of a fixture.
+
+    Args:
+        path (Union[str, Path]): Fixture file
+
+    Yields:
+        Tuple[float, dict]: Offset in ms and the event, with audio deltas still compacted
+    """
+    with _open(Path(path), "r") as file:
+        header = json.loads(file.readline() or "{}")
+        if header.get("fixture") != FIXTURE_FORMAT or header.get("version") != FIXTURE_VERSION:
+            raise ValueError(f"{path} is not a version {FIXTURE_VERSION} {FIXTURE_FORMAT} fixture")
+        for line in file:
+            offset_ms, event = json.loads(line)
+            yield offset_ms, event
+
+
+@lru_cache(maxsize=32)
+def _silent_delta(size: int) -> str:
+    return base64.b64encode(bytes(size)).decode("ascii")
+
+
+def encode_event(event: dict) -> str:
+    """
+    Serialize an event the way the Realtime API sends it.
+
+    Compacted audio deltas get a silent payload of the recorded length.
+
+    Args:
+        event (dict): Event from read_fixture
+
+    Returns:
+        str: Compact JSON message, with the type first
+    """
+    if event["type"] == AUDIO_DELTA_TYPE and isinstance(event.get("delta"), int):
+        event = {**event, "delta": _silent_delta(event["delta"])}
+    return json.dumps(event, separators=(",", ":"))
+
+
+def record_fake_session(
+    path: Union[str, Path],
+    *,
+    turns: int = 10,
+    speech_ms: int = 1500,
+    frame_ms: int = 20,
+    vad_silence_ms: int = 500,
+    response_delay_ms: int = 400,
+    response_audio_ms: int = 3000
+) -> int:
+    """
+    Record a fixture of a conversation with FakeRealtimeServer.
+
+    The session streams real-time paced microphone audio, ``speech_ms`` of
+    speech followed by silence until the response is done, for ``turns``
+    turns, so recording takes about as long as the conversation.
+
+    Args:
+        path (Union[str, Path]): Fixture file to write
+        turns (int): Number of user turns
+        speech_ms (int): Speech duration per turn
+        frame_ms (int): Duration of each appended audio chunk
+        vad_silence_ms (int): Silence that ends a turn in the fake server VAD
+        response_delay_ms (int): Fake model latency before the response audio
+        response_audio_ms (int): Audio duration of each response
+
+    Returns:
+        int: Number of events recorded
+    """
+    import asyncio
+
+    from websockets.asyncio.client import connect
+
+    from fake_realtime import FakeRealtimeServer
+
+    samples = 24000 * frame_ms // 1000
+    speech = base64.b64encode(b"\x00\x10" * samples).decode("ascii")
+    silence = base64.b64encode(bytes(samples * 2)).decode("ascii")
+
+    async def converse(recorder: EventRecorder) -> None:
+        fake = FakeRealtimeServer(
+            vad_silence_ms=vad_silence_ms,
+            response_delay_ms=response_delay_ms,
+            response_audio_ms=response_audio_ms,
+            delta_ms=100
+        )
+        async with fake, connect(fake.url, max_size=None) as websocket:
+            responses = asyncio.Queue()
+
+            async def receive():
+                async for message in websocket:
+                    event = json.loads(message)
+                    recorder.write(event)
+                    if event["type"] == "response.done":
+                        responses.put_nowait(event)
+
+            receiver = asyncio.create_task(receive())
+            await websocket.send(json.dumps({"type": "session.update", "session": {}}))
+            for _ in range(turns):
+                for _ in range(speech_ms // frame_ms):
+                    await websocket.send(
+                        json.dumps({"type": "input_audio_buffer.append", "audio": speech})
+                    )
+                    await asyncio.sleep(frame_ms / 1000)
+                while responses.empty():
+                    await websocket.send(
+                        json.dumps({"type": "input_audio_buffer.append", "audio": silence})
+                    )
+                    await asyncio.sleep(frame_ms / 1000)
+                await responses.get()
+            receiver.cancel()
+
+    with EventRecorder(path) as recorder:
+        asyncio.run(converse(recorder))
+    return recorder.events
+
+
+def replay_fixture(
+    path: Union[str, Path],
+    config: dict,
+    *,
+    speed: Optional[float] = None,
+    repeat: int = 1,
+    node: str = "node"
+) -> dict:
+    """
+    Replay a fixture through the browser client in the headless harness.
+
+    Args:
+        path (Union[str, Path]): Fixture file
+        config (dict): Client settings, as built by main.build_client_config
+        speed (float): Multiple of real time to pace the replay at; as fast as possible when None
+        repeat (int): Number of times to play the fixture back to back
+        node (str): Node.js executable
+
+    Returns:
+        dict: Harness results: events, wall_ms, main_thread_ms, events_per_s, max_task_ms,
+            frames, dom_nodes, peak_dom_nodes, chat_nodes, client_messages, reports,
+            warnings and errors
+    """
+    events: List[list] = [
+        [offset_ms, encode_event(event)] for offset_ms, event in read_fixture(path)
+    ]
+    request = {"config": config, "events": events, "speed": speed, "repeat": repeat}
+    try:
+        result = subprocess.run(
+            [node, str(HARNESS)],
+            input=json.dumps(request),
+            capture_output=True,
+            text=True
+        )
+    except FileNotFoundError:
+        raise RuntimeError(f"Replaying fixtures needs Node.js ({node} not found)") from None
+    if result.returncode:
+        raise RuntimeError(f"Replay harness failed: {result.stderr.strip()}")
+    return json.loads(result.stdout)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record and replay Realtime event fixtures")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser(
+        "record-fake", help="Record a conversation with the local fake Realtime server"
+    )
+    record.add_argument("fixture")
+    record.add_argument("--turns", type=int, default=10)
+    replay = commands.add_parser("replay", help="Replay a fixture through the headless client")
+    replay.add_argument("fixture")
+    replay.add_argument(
+        "--speed", type=float, default=None, help="Pace to this multiple of real time"
+    )
+    replay.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == "record-fake":
+        recorded = record_fake_session(args.fixture, turns=args.turns)
+        print(f"Recorded {recorded} events to {args.fixture}")
+    else:
+        from main import build_client_config
+        from prompt_utils import get_default_instructions
+
+        config = build_client_config(get_default_instructions(), "sk-replay")
+        result = replay_fixture(args.fixture, config, speed=args.speed, repeat=args.repeat)
+        print(json.dumps(result, indent=2))
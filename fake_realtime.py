@@ -0,0 +1,292 @@
+"""
+Local stand-ins for the OpenAI Realtime endpoints.
+
+Used to exercise the relay, token minting and benchmarks without network
+access or API spend. FakeRealtimeServer answers ``session.update`` and
+``response.create`` with a short scripted response made of silent pcm16
+audio deltas and a transcript, and can stand in for server VAD (and input
+audio transcription) by detecting speech in the appended input audio;
+FakeSessionEndpoint mints fake client secrets.
+"""
+import asyncio
+import base64
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+FAKE_TRANSCRIPT = "I have really bad stomach pain."
+FAKE_USER_TRANSCRIPT = "Hello, what brings you in today?"
+
+
+class FakeRealtimeServer:
+    """
+    Scripted Realtime server listening on localhost.
+
+    Use as an async context manager; ``url`` is set once it is listening.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_key: str = None,
+        host: str = "localhost",
+        port: int = 0,
+        response_audio_ms: int = 200,
+        delta_ms: int = 50,
+        sample_rate: int = 24000,
+        vad_silence_ms: int = None,
+        response_delay_ms: int = 0
+    ):
+        """
+        Args:
+            api_key (str): Expected bearer token; any token is accepted when None
+            host (str): Interface to listen on
+            port (int): Port to listen on (0 picks a free port)
+            response_audio_ms (int): Audio duration of each scripted response
+            delta_ms (int): Audio duration of each response.audio.delta
+            sample_rate (int): Sample rate of the pcm16 audio deltas
+            vad_silence_ms (int): Simulate server VAD: any non-zero input audio is speech,
+                and this much silence after it ends the turn, transcribes it as
+                FAKE_USER_TRANSCRIPT and triggers a response
+            response_delay_ms (int): Delay before the first audio delta, to mimic model latency
+        """
+        self.api_key = api_key
+        self.host = host
+        self.port = port
+        self.response_audio_ms = response_audio_ms
+        self.delta_ms = delta_ms
+        self.sample_rate = sample_rate
+        self.vad_silence_ms = vad_silence_ms
+        self.response_delay_ms = response_delay_ms
+        self.url = None
+        self.received_events: List[dict] = []
+        self.received_audio_bytes = 0
+        self._server = None
+
+    async def __aenter__(self) -> "FakeRealtimeServer":
+        self._server = await serve(self._handle, self.host, self.port, max_size=None)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.url = f"ws://{self.host}:{self.port}"
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, connection) -> None:
+        authorization = connection.request.headers.get("Authorization")
+        if self.api_key is not None and authorization != f"Bearer {self.api_key}":
+            await connection.close(4001, "invalid_api_key")
+            return
+
+        try:
+            await self._send(connection, {"type": "session.created", "session": {}})
+            await self._serve_session(connection)
+        except ConnectionClosed:
+            # Closed tabs and load test drivers drop the socket mid-response
+            pass
+
+    async def _serve_session(self, connection) -> None:
+        audio_ms = 0.0
+        speech_item = None
+        silence_ms = 0.0
+        async for message in connection:
+            event = json.loads(message)
+            self.received_events.append(event)
+            if event["type"] == "session.update":
+                await self._send(
+                    connection, {"type": "session.updated", "session": event["session"]}
+                )
+            elif event["type"] == "input_audio_buffer.append":
+                audio = base64.b64decode(event["audio"])
+                self.received_audio_bytes += len(audio)
+                chunk_ms = len(audio) / 2 / self.sample_rate * 1000
+                audio_ms += chunk_ms
+                if self.vad_silence_ms is None:
+                    continue
+                if audio.count(0) < len(audio):
+                    silence_ms = 0.0
+                    if speech_item is None:
+                        speech_item = f"item_input_{len(self.received_events)}"
+                        await self._send(connection, {
+                            "type": "input_audio_buffer.speech_started",
+                            "audio_start_ms": round(audio_ms - chunk_ms),
+                            "item_id": speech_item,
+                        })
+                elif speech_item is not None:
+                    silence_ms += chunk_ms
+                    if silence_ms >= self.vad_silence_ms:
+                        await self._send(connection, {
+                            "type": "input_audio_buffer.speech_stopped",
+                            "audio_end_ms": round(audio_ms),
+                            "item_id": speech_item,
+                        })
+                        await self._send(connection, {
+                            "type": "input_audio_buffer.committed",
+                            "item_id": speech_item,
+                        })
+                        await self._send(connection, {
+                            "type": "conversation.item.created",
+                            "item": {
+                                "id": speech_item,
+                                "type": "message",
+                                "role": "user",
+                                "content": [{"type": "input_audio", "transcript": None}],
+                            },
+                        })
+                        await self._send(connection, {
+                            "type": "conversation.item.input_audio_transcription.completed",
+                            "item_id": speech_item,
+                            "content_index": 0,
+                            "transcript": FAKE_USER_TRANSCRIPT,
+                        })
+                        speech_item = None
+                        await self._respond(connection)
+            elif event["type"] == "response.create":
+                await self._respond(connection)
+            elif event["type"] == "conversation.item.create":
+                await self._send(
+                    connection, {"type": "conversation.item.created", "item": event["item"]}
+                )
+            elif event["type"] == "conversation.item.delete":
+                await self._send(
+                    connection, {"type": "conversation.item.deleted", "item_id": event["item_id"]}
+                )
+
+    async def _respond(self, connection) -> None:
+        response_id = f"resp_{len(self.received_events)}"
+        await self._send(connection, {"type": "response.created", "response": {"id": response_id}})
+        if self.response_delay_ms:
+            await asyncio.sleep(self.response_delay_ms / 1000)
+
+        item_id = f"item_{response_id}"
+        await self._send(connection, {
+            "type": "conversation.item.created",
+            "item": {"id": item_id, "type": "message", "role": "assistant", "content": []},
+        })
+        words = FAKE_TRANSCRIPT.split(" ")
+        delta_bytes = self.sample_rate * self.delta_ms // 1000 * 2
+        delta = base64.b64encode(bytes(delta_bytes)).decode("ascii")
+        for i in range(self.response_audio_ms // self.delta_ms):
+            await self._send(connection, {
+                "type": "response.audio.delta",
+                "response_id": response_id,
+                "item_id": item_id,
+                "output_index": 0,
+                "content_index": 0,
+                "delta": delta,
+            })
+            if i < len(words):
+                await self._send(connection, {
+                    "type": "response.audio_transcript.delta",
+                    "response_id": response_id,
+                    "item_id": item_id,
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": words[i] if i == 0 else f" {words[i]}",
+                })
+            await asyncio.sleep(0)
+
+        await self._send(connection, {
+            "type": "response.done",
+            "response": {
+                "id": response_id,
+                "status": "completed",
+                "output": [{
+                    "id": item_id,
+                    "type": "message",
+                    "role": "assistant",
+                    "content": [{"type": "audio", "transcript": FAKE_TRANSCRIPT}],
+                }],
+                "usage": {
+                    "output_token_details": {
+                        "audio_tokens": self.response_audio_ms // 50,
+                        "text_tokens": len(words),
+                    },
+                },
+            },
+        })
+
+    @staticmethod
+    async def _send(connection, event: dict) -> None:
+        await connection.send(json.dumps(event))
+
+
+class FakeSessionEndpoint:
+    """
+    Mock of the Realtime sessions endpoint that mints fake client secrets.
+
+    Use as a context manager; ``url`` is set once it is listening.
+    """
+
+    def __init__(
+        self,
+        *,
+        api_key: str = None,
+        host: str = "localhost",
+        port: int = 0,
+        latency: float = 0.0,
+        token_ttl: float = 60.0
+    ):
+        """
+        Args:
+            api_key (str): Expected bearer token; any token is accepted when None
+            host (str): Interface to listen on
+            port (int): Port to listen on (0 picks a free port)
+            latency (float): Seconds to wait before answering, to mimic the real round trip
+            token_ttl (float): Lifetime of minted tokens in seconds
+        """
+        self.api_key = api_key
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.minted = 0
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}/v1/realtime/sessions"
+
+    def __enter__(self) -> "FakeSessionEndpoint":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                authorization = self.headers.get("Authorization")
+                if endpoint.api_key is not None and authorization != f"Bearer {endpoint.api_key}":
+                    self._respond(401, {"error": {"message": "invalid_api_key"}})
+                    return
+                time.sleep(endpoint.latency)
+                endpoint.minted += 1
+                self._respond(200, {
+                    "object": "realtime.session",
+                    "client_secret": {
+                        "value": f"ek_{uuid.uuid4().hex}",
+                        "expires_at": int(time.time() + endpoint.token_ttl),
+                    },
+                })
+
+            def _respond(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
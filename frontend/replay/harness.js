@@ -0,0 +1,370 @@
+// Headless replay of a Realtime event fixture through the browser client.
+//
+// Reads a request from stdin: { config, events: [[offset_ms, message], ...],
+// speed, repeat }. Loads ../src/realtime_voice.js against a minimal DOM and
+// a fake RTCPeerConnection, starts a conversation and delivers each message
+// on the fake peer's data channel. Time is virtual: performance.now(),
+// timers and animation frames (every 16.7 ms) follow the fixture offsets,
+// so a replay is deterministic. With a speed, steps are also paced to that
+// multiple of real time; without one they run back to back.
+//
+// Prints { events, wall_ms, main_thread_ms, events_per_s, max_task_ms,
+// frames, dom_nodes, peak_dom_nodes, chat_nodes, client_messages, reports,
+// warnings, errors } as JSON on stdout. main_thread_ms is the time spent
+// in the client's message handler, animation frames and timers.
+'use strict';
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+const { performance: realPerformance } = require('perf_hooks');
+
+const FRAME_MS = 1000 / 60;
+const REPEAT_GAP_MS = 1000;
+const CLIENT_SOURCE = path.join(__dirname, '..', 'src', 'realtime_voice.js');
+
+// --- Minimal DOM -------------------------------------------------------------
+
+class Element {
+    constructor(tagName) {
+        this.tagName = tagName.toUpperCase();
+        this.children = [];
+        this.parentNode = null;
+        this.style = {};
+        this.className = '';
+        this.disabled = false;
+        this.scrollTop = 0;
+        this.clientHeight = 500;
+        this._text = '';
+        this._listeners = {};
+    }
+
+    get scrollHeight() {
+        return this.children.length * 50;
+    }
+
+    get lastChild() {
+        return this.children[this.children.length - 1] || null;
+    }
+
+    get textContent() {
+        return this.children.length ? this.children.map(child => child.textContent).join('') : this._text;
+    }
+
+    set textContent(text) {
+        this.replaceChildren();
+        this._text = String(text);
+    }
+
+    appendChild(child) {
+        const nodes = child.isFragment ? child.children.splice(0) : [child];
+        nodes.forEach(node => {
+            node.remove();
+            node.parentNode = this;
+            this.children.push(node);
+        });
+        return child;
+    }
+
+    replaceChildren(...nodes) {
+        this.children.forEach(child => { child.parentNode = null; });
+        this.children = [];
+        nodes.forEach(node => this.appendChild(node));
+    }
+
+    remove() {
+        if (this.parentNode) {
+            const siblings = this.parentNode.children;
+            siblings.splice(siblings.indexOf(this), 1);
+            this.parentNode = null;
+        }
+    }
+
+    addEventListener(type, listener) {
+        (this._listeners[type] = this._listeners[type] || []).push(listener);
+    }
+
+    dispatch(type, event) {
+        (this._listeners[type] || []).forEach(listener => listener(event || {}));
+    }
+
+    click() {
+        this.dispatch('click');
+    }
+}
+
+function countNodes(element) {
+    return element.children.reduce((total, child) => total + countNodes(child), 1);
+}
+
+// --- Virtual clock -------------------------------------------------------------
+
+let now = 0;
+let nextTimerId = 1;
+const timers = new Map();
+let frameCallbacks = [];
+let nextFrameAt = FRAME_MS;
+
+const stats = { busy: 0, maxTask: 0, frames: 0, peakNodes: 0 };
+
+function runTask(callback) {
+    const started = realPerformance.now();
+    try {
+        callback();
+    } finally {
+        const elapsed = realPerformance.now() - started;
+        stats.busy += elapsed;
+        stats.maxTask = Math.max(stats.maxTask, elapsed);
+    }
+}
+
+function addTimer(callback, delay, interval) {
+    const id = nextTimerId++;
+    timers.set(id, { at: now + Math.max(Number(delay) || 0, 0), callback, interval });
+    return id;
+}
+
+function nextTimer() {
+    let next = null;
+    for (const [id, timer] of timers) {
+        if (!next || timer.at < next[1].at) {
+            next = [id, timer];
+        }
+    }
+    return next;
+}
+
+function runFrame() {
+    const callbacks = frameCallbacks;
+    frameCallbacks = [];
+    runTask(() => callbacks.forEach(callback => callback(now)));
+    stats.frames++;
+    stats.peakNodes = Math.max(stats.peakNodes, countNodes(document.body));
+}
+
+// Run the timers and animation frames due up to `until`, in time order
+async function advanceTo(until) {
+    for (;;) {
+        const timer = nextTimer();
+        const frameAt = frameCallbacks.length ? nextFrameAt : Infinity;
+        if ((!timer || timer[1].at > until) && frameAt > until) {
+            break;
+        }
+        if (timer && timer[1].at <= frameAt) {
+            const [id, { at, callback, interval }] = timer;
+            now = Math.max(now, at);
+            if (interval) {
+                timer[1].at = now + Math.max(interval, 1);
+            } else {
+                timers.delete(id);
+            }
+            runTask(callback);
+            // Let promise chains started by the timer settle
+            await new Promise(resolve => setImmediate(resolve));
+        } else {
+            now = Math.max(now, frameAt);
+            runFrame();
+        }
+    }
+    now = Math.max(now, until);
+    nextFrameAt = Math.max(nextFrameAt, Math.floor(now / FRAME_MS) * FRAME_MS + FRAME_MS);
+}
+
+// --- Page and fake peer ----------------------------------------------------------
+
+const body = new Element('body');
+const elementsById = {};
+const document = {
+    body,
+    getElementById(id) {
+        if (!elementsById[id]) {
+            elementsById[id] = new Element('div');
+            body.appendChild(elementsById[id]);
+        }
+        return elementsById[id];
+    },
+    createElement: tagName => new Element(tagName),
+    createDocumentFragment() {
+        const fragment = new Element('#fragment');
+        fragment.isFragment = true;
+        return fragment;
+    },
+    addEventListener() {},
+};
+
+const reports = {};
+let reportsSeen = 0;
+const parentWindow = {
+    postMessage(message) {
+        if (message.type !== 'streamlit:setComponentValue') {
+            return;
+        }
+        // Each value carries the recent reports; count the new ones
+        message.value.reports.forEach(report => {
+            if (report.id >= reportsSeen) {
+                reports[report.kind] = (reports[report.kind] || 0) + 1;
+                reportsSeen = report.id + 1;
+            }
+        });
+    },
+};
+
+let dataChannel = null;
+let clientMessages = 0;
+
+class FakeDataChannel {
+    constructor() {
+        this.readyState = 'connecting';
+    }
+
+    send() {
+        clientMessages++;
+    }
+
+    close() {
+        this.readyState = 'closed';
+    }
+}
+
+class FakePeerConnection {
+    constructor() {
+        this.connectionState = 'new';
+    }
+
+    createDataChannel() {
+        dataChannel = new FakeDataChannel();
+        return dataChannel;
+    }
+
+    addTrack() {}
+
+    async createOffer() {
+        return { type: 'offer', sdp: 'v=0\r\nm=audio 9 UDP/TLS/RTP/SAVPF 111\r\na=rtpmap:111 opus/48000/2\r\n' };
+    }
+
+    async setLocalDescription() {}
+
+    async setRemoteDescription() {
+        this.connectionState = 'connected';
+    }
+
+    async getStats() {
+        return new Map();
+    }
+
+    close() {
+        this.connectionState = 'closed';
+    }
+}
+
+const pageConsole = { warnings: [], errors: [] };
+const window = {
+    parent: parentWindow,
+    location: { reload() {} },
+    addEventListener(type, listener) {
+        if (type === 'message') {
+            window.onmessage = listener;
+        }
+    },
+};
+Object.assign(window, {
+    window,
+    document,
+    navigator: {
+        mediaDevices: { getUserMedia: async () => ({ getTracks: () => [{ stop() {} }] }) },
+    },
+    console: {
+        debug() {},
+        info() {},
+        log() {},
+        warn: (...args) => pageConsole.warnings.push(args.join(' ')),
+        error: (...args) => pageConsole.errors.push(args.join(' ')),
+    },
+    performance: { now: () => now },
+    setTimeout: (callback, delay) => addTimer(callback, delay, 0),
+    setInterval: (callback, delay) => addTimer(callback, delay, delay),
+    clearTimeout: id => timers.delete(id),
+    clearInterval: id => timers.delete(id),
+    requestAnimationFrame(callback) {
+        frameCallbacks.push(callback);
+        return frameCallbacks.length;
+    },
+    fetch: async () => ({ ok: true, status: 200, text: async () => 'v=0\r\n', json: async () => ({ value: 'ek_replay' }) }),
+    RTCPeerConnection: FakePeerConnection,
+    WebSocket: { OPEN: 1 },
+    Blob: class {},
+    URL: { createObjectURL: () => 'blob:replay', revokeObjectURL() {} },
+});
+
+// --- Replay ----------------------------------------------------------------------
+
+async function settle() {
+    for (let i = 0; i < 20; i++) {
+        await new Promise(resolve => setImmediate(resolve));
+    }
+}
+
+async function replay(request) {
+    vm.createContext(window);
+    vm.runInContext(fs.readFileSync(CLIENT_SOURCE, 'utf8'), window, { filename: CLIENT_SOURCE });
+    window.onmessage({ source: parentWindow, data: { type: 'streamlit:render', args: { config: request.config } } });
+
+    runTask(() => document.getElementById('startButton').click());
+    await settle();
+    if (!dataChannel) {
+        throw new Error('Client did not open a data channel: ' + pageConsole.errors.join('; '));
+    }
+    dataChannel.readyState = 'open';
+    runTask(() => dataChannel.onopen());
+    await settle();
+
+    const events = request.events;
+    const duration = events.length ? events[events.length - 1][0] : 0;
+    const startedAt = realPerformance.now();
+    let delivered = 0;
+    for (let round = 0; round < (request.repeat || 1); round++) {
+        const offset = round * (duration + REPEAT_GAP_MS);
+        for (const [at, message] of events) {
+            const time = offset + at;
+            if (request.speed) {
+                const wait = time / request.speed - (realPerformance.now() - startedAt);
+                if (wait > 0) {
+                    await new Promise(resolve => setTimeout(resolve, wait));
+                }
+            }
+            await advanceTo(time);
+            runTask(() => dataChannel.onmessage({ data: message }));
+            delivered++;
+        }
+    }
+    await advanceTo(now + FRAME_MS);
+    const wallMs = realPerformance.now() - startedAt;
+
+    return {
+        events: delivered,
+        wall_ms: round(wallMs),
+        main_thread_ms: round(stats.busy),
+        events_per_s: Math.round(delivered / (stats.busy / 1000)),
+        max_task_ms: round(stats.maxTask),
+        frames: stats.frames,
+        dom_nodes: countNodes(body),
+        peak_dom_nodes: Math.max(stats.peakNodes, countNodes(body)),
+        chat_nodes: countNodes(document.getElementById('chat-container')) - 1,
+        client_messages: clientMessages,
+        reports,
+        warnings: pageConsole.warnings.length,
+        errors: pageConsole.errors.slice(0, 10),
+    };
+}
+
+function round(value) {
+    return Math.round(value * 1000) / 1000;
+}
+
+const request = JSON.parse(fs.readFileSync(0, 'utf8'));
+replay(request).then(result => {
+    process.stdout.write(JSON.stringify(result) + '\n');
+    process.exit(0);
+}, error => {
+    process.stderr.write((error.stack || String(error)) + '\n');
+    process.exit(1);
+});
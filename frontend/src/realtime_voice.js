@@ -0,0 +1,1114 @@
+// Browser client of the realtime_voice Streamlit component. Streamlit
+// serves this file as a static, content-hashed bundle (see
+// realtime_component.py); the session settings arrive as component args
+// (see build_client_config in main.py), and reports go back to Python as
+// the component value.
+(function () {
+    // Reports get increasing ids per page instance, so Python can skip the
+    // ones it has already seen
+    const MAX_REPORTS = 50;
+    const pageId = Math.random().toString(36).slice(2);
+    let nextReportId = 0;
+    let reports = [];
+    let configKey = null;
+    // Session credential for the relay and token endpoints; refreshed on rerun
+    let pageCredential = null;
+
+    function sendToStreamlit(type, data) {
+        window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type: type }, data), '*');
+    }
+
+    function reportToPython(report) {
+        reports.push(Object.assign({ id: nextReportId++ }, report));
+        reports = reports.slice(-MAX_REPORTS);
+        sendToStreamlit('streamlit:setComponentValue', {
+            value: { page: pageId, reports: reports },
+            dataType: 'json'
+        });
+    }
+
+    window.addEventListener('message', (event) => {
+        if (event.source !== window.parent || event.data?.type !== 'streamlit:render') {
+            return;
+        }
+        const args = event.data.args;
+        pageCredential = args.credential;
+        // Reruns with unchanged settings only resend the args; new settings
+        // (e.g. another case) start over with a fresh page
+        const key = JSON.stringify(args.config);
+        if (configKey === null) {
+            configKey = key;
+            startClient(args.config);
+        } else if (key !== configKey) {
+            window.location.reload();
+            return;
+        }
+        sendToStreamlit('streamlit:setFrameHeight', { height: args.height });
+    });
+
+    sendToStreamlit('streamlit:componentReady', { apiVersion: 1 });
+
+    function startClient(config) {
+        // Console logging is filtered by level, and per-message logs are
+        // sampled, so DevTools does not retain every event of a long session
+        const CLIENT_LOG = config.client_log;
+        const TRANSCRIPT_WINDOW = config.transcript_window;
+        const LOG_LEVELS = { debug: 10, info: 20, warning: 30, error: 40, off: 100 };
+        const logThreshold = LOG_LEVELS[CLIENT_LOG.level] ?? LOG_LEVELS.warning;
+        const log = {
+            debug: (...args) => logThreshold <= LOG_LEVELS.debug && console.debug(...args),
+            info: (...args) => logThreshold <= LOG_LEVELS.info && console.info(...args),
+            warning: (...args) => logThreshold <= LOG_LEVELS.warning && console.warn(...args),
+            error: (...args) => logThreshold <= LOG_LEVELS.error && console.error(...args),
+        };
+        let messagesSeen = 0;
+
+        function logMessage(direction, message) {
+            // Log one in every CLIENT_LOG.sample_every data-channel messages
+            if (logThreshold <= LOG_LEVELS.debug && messagesSeen++ % CLIENT_LOG.sample_every === 0) {
+                log.debug(direction + ' message:', message);
+            }
+        }
+
+        log.info("Script loaded");
+
+        // Add debug logging for audio context
+        navigator.mediaDevices.getUserMedia({ audio: true })
+            .then(() => log.info("Microphone permission granted"))
+            .catch(err => log.error("Microphone error:", err));
+
+        const startButton = document.getElementById('startButton');
+        const stopButton = document.getElementById('stopButton');
+        const statusDiv = document.getElementById('status');
+        const errorDiv = document.getElementById('error');
+
+        let peerConnection = null;
+        let audioStream = null;
+        let audioElement = null;
+        let dataChannel = null;
+        let relaySocket = null;
+        let audioContext = null;
+        let playbackTime = 0;
+
+        // Connection setup phase marks, in ms since Start was clicked
+        let connectStartedAt = 0;
+        let phaseMarks = [];
+        let phasesReported = true;
+
+        // Latency of the turn in progress, from user speech to response.done
+        let currentTurn = null;
+
+        const INITIAL_INSTRUCTIONS = config.instructions;
+        const API_KEY = config.api_key;
+        const MODEL = config.model;
+        const VOICE = config.voice;
+        const TURN_DETECTION = config.turn_detection;
+        const ADAPTIVE_TURN_DETECTION = config.adaptive_turn_detection;
+        const RELAY_URL = config.relay_url;
+        const TOKEN_URL = config.token_url;
+        const AUDIO_PROFILE = config.audio_profile;
+        const RECONNECT = config.reconnect;
+        // ICE often recovers from a short 'disconnected' state by itself
+        const DISCONNECT_GRACE_MS = 3000;
+        const RELAY_SAMPLE_RATE = 24000;
+        const AUDIO_STATS_INTERVAL_MS = 10000;
+
+        // Previous WebRTC byte counters, to report the rate since then
+        let lastAudioStats = null;
+        let audioStatsTimer = null;
+
+        // A conversation is running (as opposed to stopped by the user), and
+        // the state of reconnecting it after the connection dropped
+        let sessionActive = false;
+        let resuming = false;
+        let reconnectAttempts = 0;
+        let reconnectTimer = null;
+        let disconnectedAt = null;
+
+        // Silence window currently configured for server VAD, and the user's
+        // recent mid-turn pauses that adaptive turn detection sizes it from
+        let silenceDurationMs = TURN_DETECTION?.silence_duration_ms ?? null;
+        const recentPauses = [];
+
+        // Converts microphone audio to 20 ms pcm16 chunks for the relay
+        const PCM16_CAPTURE_WORKLET = `
+            class Pcm16Capture extends AudioWorkletProcessor {
+                constructor() {
+                    super();
+                    this.chunk = new Int16Array(480);
+                    this.length = 0;
+                }
+                process(inputs) {
+                    const samples = inputs[0][0];
+                    if (samples) {
+                        for (let i = 0; i < samples.length; i++) {
+                            const s = Math.max(-1, Math.min(1, samples[i]));
+                            this.chunk[this.length++] = s < 0 ? s * 0x8000 : s * 0x7fff;
+                            if (this.length === this.chunk.length) {
+                                this.port.postMessage(this.chunk.buffer, [this.chunk.buffer]);
+                                this.chunk = new Int16Array(480);
+                                this.length = 0;
+                            }
+                        }
+                    }
+                    return true;
+                }
+            }
+            registerProcessor('pcm16-capture', Pcm16Capture);
+        `;
+
+        // Add event listeners
+        startButton.addEventListener('click', init);
+        stopButton.addEventListener('click', stopRecording);
+
+        async function init() {
+            startButton.disabled = true;
+            connectStartedAt = performance.now();
+            phaseMarks = [];
+            phasesReported = false;
+            resuming = false;
+            reconnectAttempts = 0;
+            try {
+                updateStatus('Initializing...');
+
+                if (RELAY_URL) {
+                    await connectRelay();
+                } else {
+                    await connectWebRTC();
+                }
+
+                sessionActive = true;
+                // Lets Python keep this tab's session slot while the conversation runs
+                reportToPython({ kind: 'conversation', state: 'started' });
+                updateStatus('Connected');
+                stopButton.disabled = false;
+                hideError();
+
+            } catch (error) {
+                markPhase('failed');
+                reportPhases();
+                startButton.disabled = false;
+                stopButton.disabled = true;
+                showError('Error: ' + error.message);
+                log.error('Initialization error:', error);
+                updateStatus('Failed to connect');
+            }
+        }
+
+        async function connectWebRTC() {
+            // Connect directly to OpenAI's API
+            const clientKey = getClientKey();
+            // A reconnect keeps the microphone stream and audio element
+            if (!audioStream) {
+                await setupAudio();
+                markPhase('get_user_media');
+            }
+            createPeerConnection();
+            setupDataChannel();
+
+            // Opus parameters in an SDP describe what its author wants to
+            // receive: the munged offer shapes the audio we receive and the
+            // answer, munged the same way, shapes the audio we send
+            const offer = await peerConnection.createOffer();
+            const localOffer = { type: offer.type, sdp: applyAudioProfile(offer.sdp) };
+            markPhase('create_offer');
+            await peerConnection.setLocalDescription(localOffer);
+            markPhase('set_local_description');
+
+            const sdpResponse = await fetch(`https://api.openai.com/v1/realtime?model=${MODEL}`, {
+                method: "POST",
+                body: localOffer.sdp,
+                headers: {
+                    Authorization: `Bearer ${await clientKey}`,
+                    "Content-Type": "application/sdp",
+                    "OpenAI-Beta": "realtime=v1"
+                },
+            });
+
+            if (!sdpResponse.ok) {
+                throw new Error(`OpenAI API error: ${sdpResponse.status}`);
+            }
+
+            const answer = {
+                type: "answer",
+                sdp: applyAudioProfile(await sdpResponse.text()),
+            };
+            markPhase('sdp_post');
+            await peerConnection.setRemoteDescription(answer);
+            markPhase('set_remote_description');
+
+            lastAudioStats = null;
+            sampleAudioStats(peerConnection);
+            clearInterval(audioStatsTimer);
+            audioStatsTimer = setInterval(() => {
+                if (peerConnection) {
+                    sampleAudioStats(peerConnection);
+                }
+            }, AUDIO_STATS_INTERVAL_MS);
+        }
+
+        function applyAudioProfile(sdp) {
+            // Rewrite the Opus format parameters and packet time of the audio section
+            const opus = sdp.match(/a=rtpmap:(\d+) opus\/48000/i);
+            if (!opus) {
+                return sdp;
+            }
+            const payloadType = opus[1];
+            const params = {};
+            if (AUDIO_PROFILE.max_average_bitrate) {
+                params.maxaveragebitrate = AUDIO_PROFILE.max_average_bitrate;
+            }
+            if (AUDIO_PROFILE.sample_rate < 48000) {
+                params.maxplaybackrate = AUDIO_PROFILE.sample_rate;
+                params['sprop-maxcapturerate'] = AUDIO_PROFILE.sample_rate;
+            }
+            if (AUDIO_PROFILE.dtx) {
+                params.usedtx = 1;
+            }
+            if (!Object.keys(params).length && !AUDIO_PROFILE.ptime) {
+                return sdp;
+            }
+
+            const lines = sdp.split('\r\n');
+            const fmtpPrefix = `a=fmtp:${payloadType} `;
+            let fmtpIndex = lines.findIndex(line => line.startsWith(fmtpPrefix));
+            if (fmtpIndex === -1) {
+                fmtpIndex = lines.findIndex(line => line.startsWith(`a=rtpmap:${payloadType} `)) + 1;
+                lines.splice(fmtpIndex, 0, fmtpPrefix);
+            }
+            const merged = {};
+            lines[fmtpIndex].slice(fmtpPrefix.length).split(';').forEach(param => {
+                const [key, value] = param.trim().split('=');
+                if (key) {
+                    merged[key] = value;
+                }
+            });
+            Object.assign(merged, params);
+            lines[fmtpIndex] = fmtpPrefix + Object.entries(merged).map(([key, value]) => `${key}=${value}`).join(';');
+
+            if (AUDIO_PROFILE.ptime) {
+                // Replace any packet time in the audio section only
+                const audioStart = lines.findIndex(line => line.startsWith('m=audio'));
+                let audioEnd = lines.findIndex((line, i) => i > audioStart && line.startsWith('m='));
+                if (audioEnd === -1) {
+                    audioEnd = lines.length;
+                }
+                for (let i = audioEnd - 1; i > audioStart; i--) {
+                    if (lines[i].startsWith('a=ptime:')) {
+                        lines.splice(i, 1);
+                        if (i < fmtpIndex) {
+                            fmtpIndex--;
+                        }
+                    }
+                }
+                lines.splice(fmtpIndex + 1, 0, `a=ptime:${AUDIO_PROFILE.ptime}`);
+            }
+            return lines.join('\r\n');
+        }
+
+        async function sampleAudioStats(connection) {
+            // Bytes on the wire, RTP headers included, for audio sent and received
+            const totals = { at: performance.now(), sent: 0, received: 0 };
+            try {
+                (await connection.getStats()).forEach(stat => {
+                    if (stat.kind !== 'audio') {
+                        return;
+                    }
+                    if (stat.type === 'outbound-rtp') {
+                        totals.sent += stat.bytesSent + (stat.headerBytesSent || 0);
+                    } else if (stat.type === 'inbound-rtp') {
+                        totals.received += stat.bytesReceived + (stat.headerBytesReceived || 0);
+                    }
+                });
+            } catch (error) {
+                log.warning('Failed to read audio stats:', error);
+                return;
+            }
+
+            const previous = lastAudioStats;
+            lastAudioStats = totals;
+            const seconds = previous ? (totals.at - previous.at) / 1000 : 0;
+            if (seconds > 1) {
+                reportToPython({
+                    kind: 'audio',
+                    profile: AUDIO_PROFILE.name,
+                    sent_bytes_per_s: Math.round((totals.sent - previous.sent) / seconds),
+                    received_bytes_per_s: Math.round((totals.received - previous.received) / seconds)
+                });
+            }
+        }
+
+        async function getClientKey() {
+            // Prefer a short-lived token from the server over an embedded key
+            if (!TOKEN_URL) {
+                return API_KEY;
+            }
+            const response = await fetch(TOKEN_URL, {
+                cache: "no-store",
+                headers: { "X-Session-Credential": pageCredential }
+            });
+            if (!response.ok) {
+                throw new Error(`Session token error: ${response.status}`);
+            }
+            return (await response.json()).value;
+        }
+
+        async function connectRelay() {
+            // Connect through the server-side relay, which holds the API key
+            const relayUrl = new URL(RELAY_URL);
+            relayUrl.searchParams.set('credential', pageCredential);
+            const socket = new WebSocket(relayUrl);
+            relaySocket = socket;
+            socket.binaryType = 'arraybuffer';
+            await new Promise((resolve, reject) => {
+                socket.onopen = resolve;
+                socket.onerror = () => reject(new Error('Relay connection failed'));
+            });
+            markPhase('relay_connect');
+            socket.onerror = () => log.error('Relay connection error');
+            socket.onclose = () => {
+                if (socket === relaySocket) {
+                    handleConnectionLost('Relay connection closed');
+                }
+            };
+            relaySocket.onmessage = (event) => {
+                if (typeof event.data === 'string') {
+                    handleMessage(event);
+                } else {
+                    playPcm16(event.data);
+                }
+            };
+
+            // A reconnect keeps the audio graph, which sends to whichever socket is current
+            if (!audioContext) {
+                await setupRelayAudio();
+                markPhase('get_user_media');
+            }
+            onDataChannelOpen();
+        }
+
+        async function setupRelayAudio() {
+            audioContext = new AudioContext({ sampleRate: RELAY_SAMPLE_RATE });
+            playbackTime = 0;
+
+            audioStream = await navigator.mediaDevices.getUserMedia({
+                audio: {
+                    echoCancellation: true,
+                    noiseSuppression: true,
+                    channelCount: 1
+                }
+            });
+
+            const workletUrl = URL.createObjectURL(
+                new Blob([PCM16_CAPTURE_WORKLET], { type: 'application/javascript' })
+            );
+            await audioContext.audioWorklet.addModule(workletUrl);
+            URL.revokeObjectURL(workletUrl);
+
+            const captureNode = new AudioWorkletNode(audioContext, 'pcm16-capture');
+            captureNode.port.onmessage = (event) => {
+                if (relaySocket?.readyState === WebSocket.OPEN) {
+                    relaySocket.send(event.data);
+                }
+            };
+            audioContext.createMediaStreamSource(audioStream).connect(captureNode);
+            captureNode.connect(audioContext.destination);
+            log.info("Relay audio setup completed");
+        }
+
+        function playPcm16(data) {
+            onAudioReceived(data.byteLength);
+            const samples = new Int16Array(data);
+            const buffer = audioContext.createBuffer(1, samples.length, RELAY_SAMPLE_RATE);
+            const channel = buffer.getChannelData(0);
+            for (let i = 0; i < samples.length; i++) {
+                channel[i] = samples[i] / 0x8000;
+            }
+
+            const source = audioContext.createBufferSource();
+            source.buffer = buffer;
+            source.connect(audioContext.destination);
+            playbackTime = Math.max(playbackTime, audioContext.currentTime);
+            source.start(playbackTime);
+            playbackTime += buffer.duration;
+        }
+
+        async function setupAudio() {
+            try {
+                audioElement = document.createElement("audio");
+                audioElement.autoplay = true;
+                document.body.appendChild(audioElement);
+
+                audioStream = await navigator.mediaDevices.getUserMedia({
+                    audio: {
+                        echoCancellation: true,
+                        noiseSuppression: true,
+                        sampleRate: AUDIO_PROFILE.sample_rate,
+                        channelCount: 1
+                    }
+                });
+
+                log.info("Audio setup completed");
+            } catch (error) {
+                log.error("Error setting up audio:", error);
+                throw error;
+            }
+        }
+
+        function createPeerConnection() {
+            const connection = new RTCPeerConnection();
+            peerConnection = connection;
+            connection.ontrack = (event) => {
+                log.info("Received audio track");
+                audioElement.srcObject = event.streams[0];
+            };
+            audioStream.getTracks().forEach(track => {
+                connection.addTrack(track, audioStream);
+            });
+            connection.onconnectionstatechange = () => {
+                if (connection !== peerConnection) {
+                    return;
+                }
+                if (connection.connectionState === 'failed') {
+                    handleConnectionLost('Peer connection failed');
+                } else if (connection.connectionState === 'disconnected') {
+                    setTimeout(() => {
+                        if (connection === peerConnection && connection.connectionState === 'disconnected') {
+                            handleConnectionLost('Peer connection lost');
+                        }
+                    }, DISCONNECT_GRACE_MS);
+                }
+            };
+        }
+
+        function setupDataChannel() {
+            const channel = peerConnection.createDataChannel("oai-events");
+            dataChannel = channel;
+            channel.onopen = onDataChannelOpen;
+            channel.onmessage = handleMessage;
+            channel.onerror = (error) => {
+                log.error("DataChannel error:", error);
+                if (channel === dataChannel) {
+                    handleConnectionLost("DataChannel error: " + error.message);
+                }
+            };
+            channel.onclose = () => {
+                if (channel === dataChannel) {
+                    handleConnectionLost("DataChannel closed");
+                }
+            };
+            log.info("DataChannel setup completed");
+        }
+
+        function handleConnectionLost(reason) {
+            if (!sessionActive || reconnectTimer) {
+                return;
+            }
+            log.warning(reason);
+            disconnectedAt = disconnectedAt ?? performance.now();
+            closeConnection();
+            scheduleReconnect();
+        }
+
+        function scheduleReconnect() {
+            if (reconnectTimer) {
+                return;
+            }
+            if (reconnectAttempts >= RECONNECT.max_attempts) {
+                stopRecording();
+                showError('Connection lost. Click Start Conversation to try again.');
+                return;
+            }
+            // Exponential backoff with jitter, so that many clients do not retry in lockstep
+            const backoff = Math.min(RECONNECT.max_delay_ms, RECONNECT.initial_delay_ms * 2 ** reconnectAttempts);
+            reconnectAttempts++;
+            updateStatus(`Connection lost, reconnecting (attempt ${reconnectAttempts} of ${RECONNECT.max_attempts})...`);
+            reconnectTimer = setTimeout(reconnect, backoff * (0.8 + Math.random() * 0.4));
+        }
+
+        async function reconnect() {
+            reconnectTimer = null;
+            if (!sessionActive) {
+                return;
+            }
+            resuming = true;
+            phaseMarks = [];
+            try {
+                if (RELAY_URL) {
+                    await connectRelay();
+                } else {
+                    await connectWebRTC();
+                }
+            } catch (error) {
+                log.warning('Reconnect failed:', error);
+                closeConnection();
+                if (sessionActive) {
+                    scheduleReconnect();
+                }
+            }
+        }
+
+        function resumeConversation() {
+            // Replay the recent messages so the new session picks up where the old one stopped
+            resuming = false;
+            const items = transcript.filter(entry => entry.text).slice(-RECONNECT.replay_items);
+            items.forEach(entry => sendMessage({
+                "type": "conversation.item.create",
+                "item": {
+                    "type": "message",
+                    "role": entry.role,
+                    "content": [{ "type": entry.role === 'user' ? 'input_text' : 'text', "text": entry.text }]
+                }
+            }));
+            reportToPython({
+                kind: 'reconnect',
+                transport: RELAY_URL ? 'relay' : 'webrtc',
+                attempts: reconnectAttempts,
+                downtime_ms: Math.round(performance.now() - disconnectedAt),
+                replayed_items: items.length
+            });
+            reconnectAttempts = 0;
+            disconnectedAt = null;
+            updateStatus('Connected');
+            hideError();
+        }
+
+        const AUDIO_DELTA_PREFIX = '{"type":"response.audio.delta"';
+
+        function handleMessage(event) {
+            try {
+                // Audio deltas are the bulk of the traffic and their payload is
+                // not needed here, so skip parsing them when the type comes first
+                if (event.data.startsWith(AUDIO_DELTA_PREFIX)) {
+                    handleRawAudioDelta(event.data);
+                    return;
+                }
+
+                const message = JSON.parse(event.data);
+                logMessage('Received', message);
+
+                switch (message.type) {
+                    case "response.done":
+                        reportPhases();
+                        finishTurn(message);
+                        handleTranscript(message);
+                        break;
+                    case "output_audio_buffer.started":
+                        // WebRTC audio arrives on the media track, so its bytes are not counted here
+                        onAudioReceived(null);
+                        break;
+                    case "response.audio.delta":
+                        handleAudioDelta(message);
+                        break;
+                    case "input_audio_buffer.speech_started":
+                        log.debug("Speech started");
+                        recordCutOffPause();
+                        startTurn();
+                        createUserMessageContainer();
+                        break;
+                    case "input_audio_buffer.speech_stopped":
+                    case "input_audio_buffer.speech_ended":
+                        log.debug("Speech ended");
+                        if (currentTurn && !currentTurn.speechStoppedAt) {
+                            currentTurn.speechStoppedAt = performance.now();
+                        }
+                        break;
+                    case "response.audio_transcript.delta":
+                    case "response.text.delta":
+                        handleTranscriptDelta(message);
+                        break;
+                    case "response.audio_transcript.done":
+                    case "response.text.done":
+                        handleTranscriptDone(message);
+                        break;
+                    case "conversation.item.input_audio_transcription.completed":
+                        handleUserTranscript(message);
+                        break;
+                    case "error":
+                        log.error("Error from API:", message.error);
+                        showError(message.error.message);
+                        break;
+                    default:
+                        break;
+                }
+            } catch (error) {
+                log.error('Error processing message:', error);
+                showError('Error processing message: ' + error.message);
+            }
+        }
+
+        // Transcript model: the full history stays in `transcript`, while at
+        // most TRANSCRIPT_WINDOW consecutive entries have DOM nodes
+        const chatContainer = document.getElementById('chat-container');
+        const earlierButton = document.getElementById('earlierButton');
+        const latestButton = document.getElementById('latestButton');
+        const transcript = [];
+        let windowStart = 0;
+        let stickToBottom = true;
+        let framePending = false;
+        const dirtyEntries = new Set();
+        let currentUserEntry = null;
+
+        earlierButton.addEventListener('click', showEarlierMessages);
+        latestButton.addEventListener('click', showLatestMessages);
+        document.getElementById('exportButton').addEventListener('click', exportTranscript);
+        chatContainer.addEventListener('scroll', () => {
+            stickToBottom = chatContainer.scrollHeight - chatContainer.scrollTop - chatContainer.clientHeight < 40;
+        }, { passive: true });
+
+        function isShowingLatest() {
+            return windowStart + TRANSCRIPT_WINDOW >= transcript.length;
+        }
+
+        function addTranscriptEntry(role, text) {
+            const showingLatest = isShowingLatest();
+            const entry = { index: transcript.length, role: role, text: text, time: new Date().toISOString(), node: null };
+            transcript.push(entry);
+
+            if (showingLatest) {
+                entry.node = createMessageNode(entry);
+                chatContainer.appendChild(entry.node);
+                if (transcript.length - windowStart > TRANSCRIPT_WINDOW) {
+                    const oldest = transcript[windowStart++];
+                    oldest.node.remove();
+                    oldest.node = null;
+                }
+                scheduleTranscriptFrame();
+            }
+            updateWindowControls();
+            return entry;
+        }
+
+        function updateTranscriptEntry(entry, text) {
+            entry.text = text;
+            if (entry.node) {
+                dirtyEntries.add(entry);
+                scheduleTranscriptFrame();
+            }
+        }
+
+        // Finished messages go to Python for storage; a message reported
+        // again (a later user transcription) replaces the earlier version
+        function reportTranscript(entry) {
+            reportToPython({
+                kind: 'transcript',
+                index: entry.index,
+                role: entry.role,
+                text: entry.text,
+                time: entry.time
+            });
+        }
+
+        function createMessageNode(entry) {
+            const node = document.createElement('div');
+            node.className = entry.role === 'user' ? 'message user-message' : 'message bot-message';
+
+            const label = document.createElement('div');
+            label.className = 'message-label';
+            label.textContent = entry.role === 'user' ? 'You' : 'Assistant';
+
+            const content = document.createElement('div');
+            content.className = 'message-content';
+            content.textContent = entry.text;
+
+            node.appendChild(label);
+            node.appendChild(content);
+            return node;
+        }
+
+        function renderTranscriptWindow() {
+            for (const entry of transcript) {
+                entry.node = null;
+            }
+            const fragment = document.createDocumentFragment();
+            for (const entry of transcript.slice(windowStart, windowStart + TRANSCRIPT_WINDOW)) {
+                entry.node = createMessageNode(entry);
+                fragment.appendChild(entry.node);
+            }
+            chatContainer.replaceChildren(fragment);
+            updateWindowControls();
+        }
+
+        function updateWindowControls() {
+            earlierButton.style.display = windowStart > 0 ? 'inline-block' : 'none';
+            earlierButton.textContent = `Show earlier messages (${windowStart})`;
+            latestButton.style.display = isShowingLatest() ? 'none' : 'inline-block';
+        }
+
+        function showEarlierMessages() {
+            windowStart = Math.max(0, windowStart - TRANSCRIPT_WINDOW);
+            stickToBottom = false;
+            renderTranscriptWindow();
+            chatContainer.scrollTop = 0;
+        }
+
+        function showLatestMessages() {
+            windowStart = Math.max(0, transcript.length - TRANSCRIPT_WINDOW);
+            stickToBottom = true;
+            renderTranscriptWindow();
+            scheduleTranscriptFrame();
+        }
+
+        function scheduleTranscriptFrame() {
+            // Coalesce text updates and scrolling (and the layout it forces)
+            // to once per frame, however many deltas arrive in between
+            if (framePending) {
+                return;
+            }
+            framePending = true;
+            requestAnimationFrame(() => {
+                framePending = false;
+                for (const entry of dirtyEntries) {
+                    if (entry.node) {
+                        entry.node.lastChild.textContent = entry.text;
+                    }
+                }
+                dirtyEntries.clear();
+                if (stickToBottom) {
+                    chatContainer.scrollTop = chatContainer.scrollHeight;
+                }
+            });
+        }
+
+        function exportTranscript() {
+            const lines = transcript.map(entry =>
+                `[${entry.time}] ${entry.role === 'user' ? 'You' : 'Assistant'}: ${entry.text}`
+            );
+            const url = URL.createObjectURL(new Blob([lines.join('\n') + '\n'], { type: 'text/plain' }));
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = 'transcript.txt';
+            link.click();
+            URL.revokeObjectURL(url);
+        }
+
+        function createUserMessageContainer() {
+            currentUserEntry = addTranscriptEntry('user', '');
+        }
+
+        function handleUserTranscript(message) {
+            if (currentUserEntry && message.transcript) {
+                if (currentUserEntry.text) {
+                    updateTranscriptEntry(currentUserEntry, currentUserEntry.text + " " + message.transcript);
+                } else {
+                    updateTranscriptEntry(currentUserEntry, message.transcript);
+                }
+                reportTranscript(currentUserEntry);
+            }
+        }
+
+        function handleAudioDelta(message) {
+            if (message.delta) {
+                onAudioReceived(base64DecodedLength(message.delta, 0, message.delta.length));
+            }
+        }
+
+        function handleRawAudioDelta(data) {
+            // Locate the base64 payload in the raw JSON without copying it
+            const start = data.indexOf('"delta":"');
+            if (start !== -1) {
+                const from = start + 9;
+                onAudioReceived(base64DecodedLength(data, from, data.indexOf('"', from)));
+            }
+        }
+
+        function base64DecodedLength(text, from, to) {
+            const padding = text[to - 1] !== '=' ? 0 : text[to - 2] === '=' ? 2 : 1;
+            return (to - from) / 4 * 3 - padding;
+        }
+
+        // Assistant bubbles being streamed, keyed by output item id. Each
+        // keeps its content parts so deltas for any part land in place.
+        const streamingItems = new Map();
+
+        function getStreamingItem(itemId) {
+            let item = streamingItems.get(itemId);
+            if (!item) {
+                item = { entry: addTranscriptEntry('assistant', ''), parts: [] };
+                streamingItems.set(itemId, item);
+            }
+            return item;
+        }
+
+        function setStreamingPart(itemId, contentIndex, text) {
+            const item = getStreamingItem(itemId);
+            item.parts[contentIndex] = text;
+            updateTranscriptEntry(item.entry, joinParts(item.parts));
+        }
+
+        function joinParts(parts) {
+            return parts.filter(part => part).join(' ');
+        }
+
+        function handleTranscriptDelta(message) {
+            const item = getStreamingItem(message.item_id);
+            const index = message.content_index ?? 0;
+            setStreamingPart(message.item_id, index, (item.parts[index] || '') + message.delta);
+        }
+
+        function handleTranscriptDone(message) {
+            setStreamingPart(message.item_id, message.content_index ?? 0, message.transcript ?? message.text);
+        }
+
+        function handleTranscript(message) {
+            // Reconcile the streamed bubbles with the final output, which is
+            // authoritative, and add bubbles for items that had no deltas
+            const output = message.response?.output || [];
+            output.forEach((outputItem, index) => {
+                if (outputItem.type && outputItem.type !== 'message') {
+                    return;
+                }
+                const itemId = outputItem.id ?? `${message.response.id}:${index}`;
+                const text = joinParts((outputItem.content || []).map(part => part.transcript ?? part.text));
+                const streamed = streamingItems.get(itemId);
+                if (streamed) {
+                    if (text && text !== streamed.entry.text) {
+                        updateTranscriptEntry(streamed.entry, text);
+                    }
+                    streamingItems.delete(itemId);
+                    if (streamed.entry.text) {
+                        reportTranscript(streamed.entry);
+                    }
+                } else if (text) {
+                    reportTranscript(addTranscriptEntry('assistant', text));
+                }
+            });
+        }
+
+        function sendSessionUpdate() {
+            const sessionUpdateEvent = {
+                "type": "session.update",
+                "session": {
+                    "instructions": INITIAL_INSTRUCTIONS,
+                    "modalities": ["text", "audio"],
+                    "voice": VOICE,
+                    "input_audio_format": "pcm16",
+                    "output_audio_format": "pcm16",
+                    "input_audio_transcription": {
+                        "model": "whisper-1",
+                    },
+                    "turn_detection": getTurnDetection()
+                }
+            };
+            sendMessage(sessionUpdateEvent);
+        }
+
+        function sendMessage(message) {
+            if (dataChannel?.readyState === "open") {
+                dataChannel.send(JSON.stringify(message));
+                logMessage('Sent', message);
+            } else if (relaySocket?.readyState === WebSocket.OPEN) {
+                relaySocket.send(JSON.stringify(message));
+                logMessage('Sent', message);
+            }
+        }
+
+        function onDataChannelOpen() {
+            markPhase('data_channel_open');
+            sendSessionUpdate();
+            if (resuming) {
+                resumeConversation();
+            } else {
+                sendResponseCreate();
+            }
+        }
+
+        function sendResponseCreate() {
+            sendMessage({ "type": "response.create" });
+        }
+
+        function closeConnection() {
+            // Close the transport but keep the microphone and playback for a reconnect
+            if (audioStatsTimer) {
+                clearInterval(audioStatsTimer);
+                audioStatsTimer = null;
+            }
+            if (dataChannel) {
+                const channel = dataChannel;
+                dataChannel = null;
+                channel.close();
+            }
+            if (peerConnection) {
+                const connection = peerConnection;
+                peerConnection = null;
+                connection.close();
+            }
+            if (relaySocket) {
+                const socket = relaySocket;
+                relaySocket = null;
+                socket.close();
+            }
+            currentTurn = null;
+            streamingItems.clear();
+        }
+
+        function stopRecording() {
+            if (sessionActive) {
+                reportToPython({ kind: 'conversation', state: 'stopped' });
+            }
+            sessionActive = false;
+            resuming = false;
+            if (reconnectTimer) {
+                clearTimeout(reconnectTimer);
+                reconnectTimer = null;
+            }
+            if (peerConnection) {
+                // Report the last stats interval before closing the connection
+                const connection = peerConnection;
+                peerConnection = null;
+                sampleAudioStats(connection).finally(() => connection.close());
+            }
+            closeConnection();
+            if (audioStream) {
+                audioStream.getTracks().forEach(track => track.stop());
+                audioStream = null;
+            }
+            if (audioElement) {
+                audioElement.remove();
+                audioElement = null;
+            }
+            if (audioContext) {
+                audioContext.close();
+                audioContext = null;
+            }
+            startButton.disabled = false;
+            stopButton.disabled = true;
+            updateStatus('Ready to start');
+        }
+
+        function markPhase(name) {
+            phaseMarks.push([name, Math.round(performance.now() - connectStartedAt)]);
+        }
+
+        function onAudioReceived(byteCount) {
+            // byteCount is null when the audio is not measured (WebRTC)
+            if (!phasesReported) {
+                markPhase('first_audio_delta');
+                reportPhases();
+            }
+            if (currentTurn && currentTurn.speechStoppedAt) {
+                currentTurn.firstAudioAt = currentTurn.firstAudioAt || performance.now();
+                if (byteCount !== null) {
+                    currentTurn.audioBytes = (currentTurn.audioBytes ?? 0) + byteCount;
+                }
+            }
+        }
+
+        function startTurn() {
+            currentTurn = {
+                speechStartedAt: performance.now(),
+                speechStoppedAt: null,
+                firstAudioAt: null,
+                audioBytes: null,
+                silenceDurationMs: silenceDurationMs
+            };
+        }
+
+        function recordCutOffPause() {
+            // The user spoke again shortly after VAD ended their turn and
+            // before any response audio, so they only paused for the silence
+            // window plus the gap since speech_stopped
+            const turn = currentTurn;
+            if (!ADAPTIVE_TURN_DETECTION || !turn || !turn.speechStoppedAt || turn.firstAudioAt ||
+                turn.silenceDurationMs === null) {
+                return;
+            }
+            const gapMs = performance.now() - turn.speechStoppedAt;
+            if (gapMs >= ADAPTIVE_TURN_DETECTION.resume_window_ms) {
+                return;
+            }
+            recentPauses.push(turn.silenceDurationMs + gapMs);
+            if (recentPauses.length > ADAPTIVE_TURN_DETECTION.pause_history) {
+                recentPauses.shift();
+            }
+            adaptSilenceDuration();
+        }
+
+        function getTurnDetection() {
+            if (silenceDurationMs === null) {
+                return TURN_DETECTION;
+            }
+            return { ...TURN_DETECTION, "silence_duration_ms": silenceDurationMs };
+        }
+
+        function adaptSilenceDuration() {
+            if (!ADAPTIVE_TURN_DETECTION || silenceDurationMs === null) {
+                return;
+            }
+            // Stay margin_ms above the longest recent pause; without any, the
+            // user has not been cut off, so approach the minimum
+            const target = recentPauses.length
+                ? Math.max(...recentPauses) + ADAPTIVE_TURN_DETECTION.margin_ms
+                : ADAPTIVE_TURN_DETECTION.min_silence_duration_ms;
+            const step = target > silenceDurationMs
+                ? target - silenceDurationMs
+                : (target - silenceDurationMs) * ADAPTIVE_TURN_DETECTION.convergence;
+            // Rounded to 10 ms so converging does not send an update every turn
+            const next = Math.min(
+                ADAPTIVE_TURN_DETECTION.max_silence_duration_ms,
+                Math.max(ADAPTIVE_TURN_DETECTION.min_silence_duration_ms, Math.round((silenceDurationMs + step) / 10) * 10)
+            );
+            if (next === silenceDurationMs) {
+                return;
+            }
+            silenceDurationMs = next;
+            sendMessage({ "type": "session.update", "session": { "turn_detection": getTurnDetection() } });
+            log.info('Silence duration set to', next, 'ms');
+        }
+
+        function finishTurn(message) {
+            const turn = currentTurn;
+            if (!turn || !turn.speechStoppedAt) {
+                return;
+            }
+            currentTurn = null;
+
+            const doneAt = performance.now();
+            const span = (from, to) => (from && to) ? Math.round(to - from) : null;
+            const responseLatency = span(turn.speechStoppedAt, turn.firstAudioAt);
+            reportToPython({
+                kind: 'turn',
+                status: message.response?.status ?? null,
+                speech_ms: span(turn.speechStartedAt, turn.speechStoppedAt),
+                response_latency_ms: responseLatency,
+                // speech_stopped only arrives once the silence window has passed
+                end_of_speech_ms: (responseLatency !== null && turn.silenceDurationMs !== null)
+                    ? responseLatency + turn.silenceDurationMs : null,
+                response_duration_ms: span(turn.firstAudioAt, doneAt),
+                turn_ms: span(turn.speechStoppedAt, doneAt),
+                audio_bytes: turn.audioBytes,
+                silence_duration_ms: turn.silenceDurationMs,
+                adaptive: Boolean(ADAPTIVE_TURN_DETECTION)
+            });
+
+            if (ADAPTIVE_TURN_DETECTION && turn.firstAudioAt && message.response?.status === 'completed') {
+                adaptSilenceDuration();
+            }
+        }
+
+        function reportPhases() {
+            if (phasesReported) {
+                return;
+            }
+            phasesReported = true;
+            reportToPython({
+                kind: 'connection',
+                transport: RELAY_URL ? 'relay' : 'webrtc',
+                marks: phaseMarks
+            });
+        }
+
+        function updateStatus(message) {
+            statusDiv.textContent = message;
+        }
+
+        function showError(message) {
+            errorDiv.style.display = 'block';
+            errorDiv.textContent = message;
+        }
+
+        function hideError() {
+            errorDiv.style.display = 'none';
+        }
+    }
+})();
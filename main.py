@@ -1,423 +1,600 @@
 import json
+import sys
+import time
+
 import streamlit as st
-from prompt_utils import get_default_instructions
-from st_utils import get_logger
+from metrics import get_audio_metrics, get_connection_metrics, get_turn_metrics
+from prompt_utils import DEFAULT_CASE_ID, get_case_prompt, get_case_registry
+from realtime_component import realtime_voice
+from session_credentials import SAME_HOST, SessionCredentials
+from session_manager import get_session_id, get_session_manager
+from st_utils import get_logger, set_correlation_id
+from transcript_store import get_transcript_store
 
 st.set_page_config(
     page_title="OpenAI Realtime Voice Chat",
-    page_icon="🎤",
+    # A Material icon avoids loading Streamlit's ~100 ms emoji table at startup
+    page_icon=":material/mic:",
     layout="wide"
 )
 
 # Configure logger
 logger = get_logger(__name__)
 
+# Realtime session defaults
+DEFAULT_MODEL = "gpt-4o-realtime-preview-2024-10-01"
+DEFAULT_VOICE = "alloy"
+DEFAULT_TURN_DETECTION = {
+    "type": "server_vad",
+    "threshold": 0.5,
+    "prefix_padding_ms": 300,
+    "silence_duration_ms": 800,
+}
+
+# Adaptive turn detection (opt-in per case) measures the user's pauses. When
+# the user resumes speaking within resume_window_ms of VAD ending their turn,
+# before the response started (a turn cut off mid-thought), the pause was the
+# silence window plus the gap between speech_stopped and speech_started.
+# After such a cut-off the window grows at once to margin_ms above the longest
+# of the last pause_history pauses. After every answered turn it closes half
+# the distance to that level (the convergence share), or to the minimum if
+# the user was never cut off. The window stays within the min/max bounds
+DEFAULT_ADAPTIVE_TURN_DETECTION = {
+    "min_silence_duration_ms": 300,
+    "max_silence_duration_ms": 1200,
+    "margin_ms": 150,
+    "pause_history": 8,
+    "convergence": 0.5,
+    "resume_window_ms": 2000,
+}
+
+# Browser console logging: level is one of debug/info/warning/error/off, and
+# at debug level only one in every sample_every data-channel messages is logged
+DEFAULT_CLIENT_LOG = {
+    "level": "warning",
+    "sample_every": 100,
+}
+
+# Microphone and Opus settings for the WebRTC transport, selectable per
+# session. sample_rate is the capture rate; max_average_bitrate (bits/s),
+# ptime (ms) and dtx are written into the Opus parameters of the SDP, and
+# None/False leaves the browser default in place
+AUDIO_PROFILES = {
+    "low_bandwidth": {
+        "sample_rate": 16000, "max_average_bitrate": 16000, "ptime": 60, "dtx": True
+    },
+    "default": {
+        "sample_rate": 48000, "max_average_bitrate": None, "ptime": None, "dtx": False
+    },
+    "high_fidelity": {
+        "sample_rate": 48000, "max_average_bitrate": 64000, "ptime": 20, "dtx": False
+    },
+}
+DEFAULT_AUDIO_PROFILE = "default"
+
+# Reconnection after the connection drops: attempts back off exponentially
+# from initial_delay_ms to max_delay_ms, and the last replay_items transcript
+# messages are replayed into the new session
+DEFAULT_RECONNECT = {
+    "max_attempts": 5,
+    "initial_delay_ms": 500,
+    "max_delay_ms": 8000,
+    "replay_items": 20,
+}
+
+# Maximum number of transcript messages rendered at once; older ones stay in
+# memory and can be paged back in or downloaded
+DEFAULT_TRANSCRIPT_WINDOW = 50
+
+# How often a queued session checks whether a slot has freed up
+QUEUE_POLL_SECONDS = 2
+
+# Seconds an admitted tab may sit outside a conversation before its slot is freed
+DEFAULT_SESSION_IDLE_TIMEOUT = 300
+
+def build_client_config(
+    instructions: str,
+    api_key: str,
+    *,
+    model: str = DEFAULT_MODEL,
+    voice: str = DEFAULT_VOICE,
+    turn_detection: dict = None,
+    adaptive_turn_detection: dict = None,
+    relay_url: str = None,
+    token_url: str = None,
+    client_log: dict = None,
+    transcript_window: int = DEFAULT_TRANSCRIPT_WINDOW,
+    audio_profile: str = DEFAULT_AUDIO_PROFILE,
+    reconnect: dict = None
+) -> dict:
+    """
+    Assemble the settings passed to the browser client as component args.
+
+    The client itself is a static bundle (see realtime_component.py), so a
+    rerun only sends these settings to the browser.
+
+    Args:
+        instructions (str): Session instructions for the assistant
+        api_key (str): OpenAI API key used by the browser client (None in relay mode)
+        model (str): Realtime model name
+        voice (str): Assistant voice
+        turn_detection (dict): Turn detection settings (default: DEFAULT_TURN_DETECTION)
+        adaptive_turn_detection (dict): Adaptive silence tuning settings; fixed when None
+        relay_url (str): WebSocket URL of the server-side relay; connects directly when None
+        token_url (str): URL serving ephemeral session tokens; uses api_key when None
+        client_log (dict): Browser console logging settings (default: DEFAULT_CLIENT_LOG)
+        transcript_window (int): Maximum number of transcript messages kept in the DOM
+        audio_profile (str): Name of the AUDIO_PROFILES entry used for WebRTC audio
+        reconnect (dict): Reconnection settings (default: DEFAULT_RECONNECT)
+
+    Returns:
+        dict: JSON-serializable client settings
+    """
+    return {
+        "instructions": instructions,
+        "api_key": api_key,
+        "model": model,
+        "voice": voice,
+        "turn_detection": DEFAULT_TURN_DETECTION if turn_detection is None else turn_detection,
+        "adaptive_turn_detection": adaptive_turn_detection,
+        "relay_url": relay_url,
+        "token_url": token_url,
+        "client_log": DEFAULT_CLIENT_LOG if client_log is None else client_log,
+        "transcript_window": transcript_window,
+        "audio_profile": {"name": audio_profile, **AUDIO_PROFILES[audio_profile]},
+        "reconnect": DEFAULT_RECONNECT if reconnect is None else reconnect,
+    }
+
+@st.cache_resource
+def get_session_credentials(secret: str = None) -> SessionCredentials:
+    """
+    Return the process-wide issuer of page credentials
 
-def set_page_style():
-    """Set up the page layout with custom styles"""
-    st.markdown("""
-        <style>
-            .chat-container {
-                margin: 20px 0;
-                padding: 20px;
-                border-radius: 10px;
-                background-color: #f8f9fa;
-            }
-            .webrtc-container {
-                margin: 20px 0;
-                text-align: center;
-            }
-            footer {
-                visibility: hidden;
-            }
-        </style>
-    """, unsafe_allow_html=True)
-
-def get_js_code():
-    """Return the JavaScript code for WebRTC implementation"""
-    return """
-        document.addEventListener('DOMContentLoaded', function() {
-            console.log("Script loaded");
-
-            // Add debug logging for audio context
-            navigator.mediaDevices.getUserMedia({ audio: true })
-                .then(() => console.log("Microphone permission granted"))
-                .catch(err => console.error("Microphone error:", err));
-
-            const startButton = document.getElementById('startButton');
-            const stopButton = document.getElementById('stopButton');
-            const statusDiv = document.getElementById('status');
-            const errorDiv = document.getElementById('error');
-
-            let peerConnection = null;
-            let audioStream = null;
-            let dataChannel = null;
-
-            const INITIAL_INSTRUCTIONS = INSTRUCTIONS_PLACEHOLDER;
-            const API_KEY = API_KEY_PLACEHOLDER;
-
-            // Add event listeners
-            startButton.addEventListener('click', init);
-            stopButton.addEventListener('click', stopRecording);
-
-            async function init() {
-                startButton.disabled = true;
-                try {
-                    updateStatus('Initializing...');
-
-                    // Connect directly to OpenAI's API
-                    peerConnection = new RTCPeerConnection();
-                    await setupAudio();
-                    setupDataChannel();
-
-                    const offer = await peerConnection.createOffer();
-                    await peerConnection.setLocalDescription(offer);
-
-                    const sdpResponse = await fetch(`https://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-10-01`, {
-                        method: "POST",
-                        body: offer.sdp,
-                        headers: {
-                            Authorization: `Bearer ${API_KEY}`,
-                            "Content-Type": "application/sdp",
-                            "OpenAI-Beta": "realtime=v1"
-                        },
-                    });
-
-                    if (!sdpResponse.ok) {
-                        throw new Error(`OpenAI API error: ${sdpResponse.status}`);
-                    }
-
-                    const answer = {
-                        type: "answer",
-                        sdp: await sdpResponse.text(),
-                    };
-                    await peerConnection.setRemoteDescription(answer);
-
-                    updateStatus('Connected');
-                    stopButton.disabled = false;
-                    hideError();
-
-                } catch (error) {
-                    startButton.disabled = false;
-                    stopButton.disabled = true;
-                    showError('Error: ' + error.message);
-                    console.error('Initialization error:', error);
-                    updateStatus('Failed to connect');
-                }
-            }
-
-            async function setupAudio() {
-                try {
-                    const audioEl = document.createElement("audio");
-                    audioEl.autoplay = true;
-                    document.body.appendChild(audioEl);
-
-                    audioStream = await navigator.mediaDevices.getUserMedia({
-                        audio: {
-                            echoCancellation: true,
-                            noiseSuppression: true,
-                            sampleRate: 48000,
-                            channelCount: 1
-                        }
-                    });
-
-                    peerConnection.ontrack = (event) => {
-                        console.log("Received audio track");
-                        audioEl.srcObject = event.streams[0];
-                    };
-
-                    audioStream.getTracks().forEach(track => {
-                        peerConnection.addTrack(track, audioStream);
-                    });
-
-                    console.log("Audio setup completed");
-                } catch (error) {
-                    console.error("Error setting up audio:", error);
-                    throw error;
-                }
-            }
-
-            function setupDataChannel() {
-                dataChannel = peerConnection.createDataChannel("oai-events");
-                dataChannel.onopen = onDataChannelOpen;
-                dataChannel.onmessage = handleMessage;
-                dataChannel.onerror = (error) => {
-                    console.error("DataChannel error:", error);
-                    showError("DataChannel error: " + error.message);
-                };
-                console.log("DataChannel setup completed");
-            }
-
-            function handleMessage(event) {
-                try {
-                    const message = JSON.parse(event.data);
-                    console.log('Received message:', message);
-
-                    switch (message.type) {
-                        case "response.done":
-                            handleTranscript(message);
-                            break;
-                        case "response.audio.delta":
-                            handleAudioDelta(message);
-                            break;
-                        case "input_audio_buffer.speech_started":
-                            console.log("Speech started");
-                            createUserMessageContainer();
-                            break;
-                        case "input_audio_buffer.speech_ended":
-                            console.log("Speech ended");
-                            break;
-                        case "conversation.item.input_audio_transcription.completed":
-                            handleUserTranscript(message);
-                            break;
-                        case "error":
-                            console.error("Error from API:", message.error);
-                            showError(message.error.message);
-                            break;
-                        default:
-                            console.log('Message type:', message.type);
-                    }
-                } catch (error) {
-                    console.error('Error processing message:', error);
-                    showError('Error processing message: ' + error.message);
-                }
-            }
-
-            let currentUserMessage = null;
-
-            function createUserMessageContainer() {
-                const chatContainer = document.getElementById('chat-container');
-                currentUserMessage = document.createElement('div');
-                currentUserMessage.className = 'message user-message';
-
-                const label = document.createElement('div');
-                label.className = 'message-label';
-                label.textContent = 'You';
-
-                const content = document.createElement('div');
-                content.className = 'message-content';
-
-                currentUserMessage.appendChild(label);
-                currentUserMessage.appendChild(content);
-                chatContainer.appendChild(currentUserMessage);
-                chatContainer.scrollTop = chatContainer.scrollHeight;
-            }
-
-            function handleUserTranscript(message) {
-                if (currentUserMessage && message.transcript) {
-                    const content = currentUserMessage.querySelector('.message-content');
-                    if (content.textContent) {
-                        content.textContent = content.textContent + " " + message.transcript;
-                    } else {
-                        content.textContent = message.transcript;
-                    }
-                    const chatContainer = document.getElementById('chat-container');
-                    chatContainer.scrollTop = chatContainer.scrollHeight;
-                }
-            }
-
-            function handleAudioDelta(message) {
-                if (message.delta) {
-                    console.log("Received audio data");
-                }
-            }
-
-            function handleTranscript(message) {
-                const chatContainer = document.getElementById('chat-container');
-
-                if (message.response?.output?.[0]?.content?.[0]?.transcript) {
-                    const transcript = message.response.output[0].content[0].transcript;
-
-                    const botMessage = document.createElement('div');
-                    botMessage.className = 'message bot-message';
-
-                    const label = document.createElement('div');
-                    label.className = 'message-label';
-                    label.textContent = 'Assistant';
-
-                    const content = document.createElement('div');
-                    content.className = 'message-content';
-                    content.textContent = transcript;
-
-                    botMessage.appendChild(label);
-                    botMessage.appendChild(content);
-                    chatContainer.appendChild(botMessage);
-                    chatContainer.scrollTop = chatContainer.scrollHeight;
-                }
-            }
-
-            function sendSessionUpdate() {
-                const sessionUpdateEvent = {
-                    "type": "session.update",
-                    "session": {
-                        "instructions": INITIAL_INSTRUCTIONS,
-                        "modalities": ["text", "audio"],
-                        "voice": "alloy",
-                        "input_audio_format": "pcm16",
-                        "output_audio_format": "pcm16",
-                        "input_audio_transcription": {
-                            "model": "whisper-1",
-                        },
-                        "turn_detection": {
-                            "type": "server_vad",
-                            "threshold": 0.5,
-                            "prefix_padding_ms": 300,
-                            "silence_duration_ms": 800,
-                        }
-                    }
-                };
-                sendMessage(sessionUpdateEvent);
-            }
-
-            function sendMessage(message) {
-                if (dataChannel?.readyState === "open") {
-                    dataChannel.send(JSON.stringify(message));
-                    console.log('Sent message:', message);
-                }
-            }
-
-            function onDataChannelOpen() {
-                sendSessionUpdate();
-                sendResponseCreate();
-            }
-
-            function sendResponseCreate() {
-                sendMessage({ "type": "response.create" });
-            }
-
-            function stopRecording() {
-                if (peerConnection) {
-                    peerConnection.close();
-                    peerConnection = null;
-                }
-                if (audioStream) {
-                    audioStream.getTracks().forEach(track => track.stop());
-                    audioStream = null;
-                }
-                if (dataChannel) {
-                    dataChannel.close();
-                    dataChannel = null;
-                }
-                startButton.disabled = false;
-                stopButton.disabled = true;
-                updateStatus('Ready to start');
-            }
-
-            function updateStatus(message) {
-                statusDiv.textContent = message;
-            }
-
-            function showError(message) {
-                errorDiv.style.display = 'block';
-                errorDiv.textContent = message;
-            }
-
-            function hideError() {
-                errorDiv.style.display = 'none';
-            }
-        });
-    """
-
-def get_webrtc_html():
-    """Generate the HTML for WebRTC interface"""
-    instructions = get_default_instructions()
-    api_key = st.secrets["OPENAI_API_KEY"]
-
-    js_code = get_js_code()
-    js_code = js_code.replace('INSTRUCTIONS_PLACEHOLDER', json.dumps(instructions))
-    js_code = js_code.replace('API_KEY_PLACEHOLDER', f'"{api_key}"')
-
-    return '''
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Voice Chat</title>
-        <style>
-            .container {
-                max-width: 800px;
-                margin: 0 auto;
-                padding: 20px;
-            }
-            .controls {
-                text-align: center;
-                margin: 20px 0;
-            }
-            .chat-container {
-                margin: 20px 0;
-                padding: 15px;
-                border: 1px solid #ddd;
-                border-radius: 5px;
-                min-height: 300px;
-                max-height: 500px;
-                overflow-y: auto;
-            }
-            .message {
-                margin: 10px 0;
-                padding: 10px;
-                border-radius: 8px;
-                max-width: 80%;
-            }
-            .user-message {
-                background-color: #e3f2fd;
-                margin-left: auto;
-                margin-right: 20px;
-            }
-            .bot-message {
-                background-color: #f5f5f5;
-                margin-left: 20px;
-                margin-right: auto;
-            }
-            .message-label {
-                font-size: 0.8em;
-                color: #666;
-                margin-bottom: 4px;
-            }
-            .status {
-                text-align: center;
-                margin: 10px 0;
-                font-style: italic;
-            }
-            .error {
-                color: red;
-                display: none;
-                margin: 10px 0;
-            }
-            button {
-                padding: 10px 20px;
-                margin: 0 10px;
-                border-radius: 5px;
-                border: none;
-                background-color: #0066cc;
-                color: white;
-                cursor: pointer;
-            }
-            button:disabled {
-                background-color: #cccccc;
-                cursor: not-allowed;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="controls">
-                <button id="startButton">Start Conversation</button>
-                <button id="stopButton" disabled>End Conversation</button>
-            </div>
-            <div id="chat-container" class="chat-container"></div>
-            <div id="status" class="status">Ready to start</div>
-            <div id="error" class="error"></div>
-        </div>
-        <script>
-            JAVASCRIPT_CODE_PLACEHOLDER
-        </script>
-    </body>
-    </html>
-    '''.replace('JAVASCRIPT_CODE_PLACEHOLDER', js_code)
+    Args:
+        secret (str): Signing secret shared with standalone servers; random per process when None
+    """
+    return SessionCredentials(secret)
+
+def get_page_credential() -> str:
+    """
+    Return this session's credential for the relay and token endpoints
+
+    The credential travels in the component args but not in the client
+    config, so reissuing it does not reload the page. It is reissued once
+    half its lifetime is gone. ``CREDENTIAL_SECRET`` in secrets.toml sets
+    the signing secret, e.g. to share it with a standalone relay.
+    """
+    credentials = get_session_credentials(st.secrets.get("CREDENTIAL_SECRET"))
+    credential = st.session_state.get("page_credential")
+    if credential is None or credentials.expires_at(credential) - time.time() < credentials.ttl / 2:
+        credential = st.session_state["page_credential"] = credentials.issue(get_session_id())
+    return credential
+
+def get_allowed_origins():
+    """
+    Return the page origins allowed to use the relay and token endpoints
+
+    ``ALLOWED_ORIGINS`` in secrets.toml lists them. By default each request
+    is checked on its own: the page must come from the hostname the request
+    was sent to (session_credentials.SAME_HOST). The result only depends on
+    the configuration, so it is safe to freeze into the process-wide servers.
+    """
+    origins = st.secrets.get("ALLOWED_ORIGINS")
+    return list(origins) if origins else [SAME_HOST]
+
+@st.cache_resource
+def get_relay_server(
+    api_key: str,
+    model: str,
+    host: str,
+    port: int,
+    recording_dir: str = None,
+    silence_threshold_db: float = None,
+    context_token_budget: int = None,
+    event_fixture_dir: str = None,
+    _credentials: SessionCredentials = None,
+    _allowed_origins: list = None
+):
+    """
+    Start the process-wide Realtime relay server in a background thread
+
+    Args:
+        api_key (str): OpenAI API key
+        model (str): Realtime model name
+        host (str): Interface to listen on
+        port (int): Port to listen on
+        recording_dir (str): Directory to record session audio to, if any
+        silence_threshold_db (float): Level in dBFS below which microphone audio is trimmed, if any
+        context_token_budget (int): Conversation tokens above which old items are deleted, if any
+        event_fixture_dir (str): Directory to record session server events to as fixtures, if any
+        _credentials (SessionCredentials): Verifies the credentials of connecting pages
+        _allowed_origins (list): Origins pages may connect from, see get_allowed_origins()
+
+    Returns:
+        relay.RelayServer: Running relay server
+    """
+    from relay import RelayServer
+
+    return RelayServer(
+        api_key,
+        model=model,
+        host=host,
+        port=port,
+        recording_dir=recording_dir,
+        silence_threshold_db=silence_threshold_db,
+        context_token_budget=context_token_budget,
+        event_fixture_dir=event_fixture_dir,
+        credentials=_credentials,
+        allowed_origins=_allowed_origins
+    ).start_in_thread()
+
+def get_relay_url():
+    """
+    Return the browser-facing relay URL, or None when relay mode is disabled
+
+    Relay mode is enabled with ``REALTIME_RELAY = true`` in secrets.toml.
+    ``RELAY_HOST``/``RELAY_PORT`` choose where the relay listens and
+    ``RELAY_PUBLIC_URL`` overrides the URL the browser connects to (e.g. a
+    wss:// URL behind a reverse proxy). ``RECORDING_DIR`` records the audio
+    of every relayed session to that directory. ``SILENCE_THRESHOLD_DB``
+    trims microphone audio quieter than that level instead of sending it.
+    ``CONTEXT_TOKEN_BUDGET`` deletes and summarizes the oldest conversation
+    items once a session's conversation grows past that many tokens.
+    ``EVENT_FIXTURE_DIR`` records the server events of every relayed session
+    as replayable fixtures (see event_fixtures.py). Pages must come from
+    get_allowed_origins() and present their get_page_credential().
+    """
+    if not st.secrets.get("REALTIME_RELAY", False):
+        return None
+
+    host = st.secrets.get("RELAY_HOST", "localhost")
+    port = int(st.secrets.get("RELAY_PORT", 8765))
+    server = get_relay_server(
+        st.secrets["OPENAI_API_KEY"],
+        DEFAULT_MODEL,
+        host,
+        port,
+        st.secrets.get("RECORDING_DIR"),
+        st.secrets.get("SILENCE_THRESHOLD_DB"),
+        st.secrets.get("CONTEXT_TOKEN_BUDGET"),
+        st.secrets.get("EVENT_FIXTURE_DIR"),
+        get_session_credentials(st.secrets.get("CREDENTIAL_SECRET")),
+        get_allowed_origins()
+    )
+    return st.secrets.get("RELAY_PUBLIC_URL", f"ws://{server.host}:{server.port}")
+
+@st.cache_resource
+def get_token_server(
+    api_key: str,
+    model: str,
+    voice: str,
+    host: str,
+    port: int,
+    _credentials: SessionCredentials = None,
+    _allowed_origins: list = None
+):
+    """
+    Start the process-wide pre-warmed session token pool and its HTTP endpoint
+
+    Args:
+        api_key (str): OpenAI API key
+        model (str): Realtime model name
+        voice (str): Assistant voice
+        host (str): Interface to listen on
+        port (int): Port to listen on
+        _credentials (SessionCredentials): Verifies the credentials of requesting pages
+        _allowed_origins (list): Origins pages may request tokens from, see get_allowed_origins()
+
+    Returns:
+        http.server.ThreadingHTTPServer: Running token server
+    """
+    from session_tokens import SessionTokenPool, serve_session_tokens
+
+    pool = SessionTokenPool(api_key, model=model, voice=voice).start()
+    return serve_session_tokens(
+        pool, _credentials, allowed_origins=_allowed_origins, host=host, port=port
+    )
+
+def get_token_url():
+    """
+    Return the browser-facing session token URL, or None when ephemeral tokens are disabled
+
+    Ephemeral tokens are enabled with ``EPHEMERAL_TOKENS = true`` in
+    secrets.toml. ``TOKEN_SERVER_HOST``/``TOKEN_SERVER_PORT`` choose where
+    the token endpoint listens and ``TOKEN_PUBLIC_URL`` overrides the URL
+    the browser fetches tokens from. Like the relay, the endpoint only
+    serves get_allowed_origins() and pages with a valid get_page_credential().
+    """
+    if not st.secrets.get("EPHEMERAL_TOKENS", False):
+        return None
+
+    host = st.secrets.get("TOKEN_SERVER_HOST", "localhost")
+    port = int(st.secrets.get("TOKEN_SERVER_PORT", 8766))
+    server = get_token_server(
+        st.secrets["OPENAI_API_KEY"],
+        DEFAULT_MODEL,
+        DEFAULT_VOICE,
+        host,
+        port,
+        get_session_credentials(st.secrets.get("CREDENTIAL_SECRET")),
+        get_allowed_origins()
+    )
+    return st.secrets.get("TOKEN_PUBLIC_URL", f"http://{host}:{server.server_address[1]}/session-token")
+
+def get_client_log_config():
+    """
+    Return the browser console logging settings
+
+    ``CLIENT_LOG_LEVEL`` and ``CLIENT_LOG_SAMPLE_EVERY`` in secrets.toml
+    override DEFAULT_CLIENT_LOG.
+    """
+    sample_every = st.secrets.get("CLIENT_LOG_SAMPLE_EVERY", DEFAULT_CLIENT_LOG["sample_every"])
+    return {
+        "level": st.secrets.get("CLIENT_LOG_LEVEL", DEFAULT_CLIENT_LOG["level"]),
+        "sample_every": max(int(sample_every), 1),
+    }
+
+def get_turn_detection_config(case_id: str = DEFAULT_CASE_ID):
+    """
+    Return the turn detection settings of a case and its adaptive tuning settings
+
+    A case's ``turn_detection`` settings (see prompt_utils) are merged over
+    DEFAULT_TURN_DETECTION for server VAD, or used as they are for other
+    types. Their ``adaptive`` key is not sent to the API: true enables
+    adaptive silence tuning with DEFAULT_ADAPTIVE_TURN_DETECTION, and a dict
+    overrides parts of it. Adaptive tuning only applies to server VAD.
+
+    Args:
+        case_id (str): ID of the simulation case
+
+    Returns:
+        tuple: (turn_detection, adaptive_turn_detection or None)
+    """
+    settings = dict(get_case_prompt(case_id).turn_detection or {})
+    adaptive = settings.pop("adaptive", False)
+    if settings.get("type", "server_vad") != "server_vad":
+        return settings, None
+
+    turn_detection = {**DEFAULT_TURN_DETECTION, **settings}
+    if not adaptive:
+        return turn_detection, None
+    overrides = adaptive if isinstance(adaptive, dict) else {}
+    return turn_detection, {**DEFAULT_ADAPTIVE_TURN_DETECTION, **overrides}
+
+def select_case() -> str:
+    """
+    Let the user pick a simulation case; ``?case=<id>`` preselects one
+
+    Returns:
+        str: Selected case ID
+    """
+    registry = get_case_registry()
+    case_ids = list(registry)
+    requested = st.query_params.get("case", DEFAULT_CASE_ID)
+    if requested not in registry:
+        requested = DEFAULT_CASE_ID
+    return st.sidebar.selectbox(
+        "Case",
+        case_ids,
+        index=case_ids.index(requested),
+        format_func=lambda case_id: registry[case_id].title
+    )
+
+def select_audio_profile() -> str:
+    """
+    Let the user pick an audio profile; ``?audio=<name>`` preselects one
+
+    ``AUDIO_PROFILE`` in secrets.toml overrides DEFAULT_AUDIO_PROFILE.
+
+    Returns:
+        str: Selected AUDIO_PROFILES name
+    """
+    names = list(AUDIO_PROFILES)
+    default = st.secrets.get("AUDIO_PROFILE", DEFAULT_AUDIO_PROFILE)
+    requested = st.query_params.get("audio", default)
+    if requested not in AUDIO_PROFILES:
+        requested = DEFAULT_AUDIO_PROFILE
+    return st.sidebar.selectbox(
+        "Audio quality",
+        names,
+        index=names.index(requested),
+        format_func=lambda name: name.replace("_", " ").capitalize()
+    )
+
+def get_client_config(case_id: str = DEFAULT_CASE_ID, audio_profile: str = DEFAULT_AUDIO_PROFILE):
+    """
+    Return the browser client settings for a case
+
+    Args:
+        case_id (str): ID of the simulation case whose instructions to use
+        audio_profile (str): Name of the AUDIO_PROFILES entry to use
+    """
+    relay_url = get_relay_url()
+    token_url = None if relay_url else get_token_url()
+    # With the relay or ephemeral tokens the API key stays on the server
+    api_key = None if relay_url or token_url else st.secrets["OPENAI_API_KEY"]
+    turn_detection, adaptive_turn_detection = get_turn_detection_config(case_id)
+    return build_client_config(
+        get_case_prompt(case_id).instructions,
+        api_key,
+        turn_detection=turn_detection,
+        adaptive_turn_detection=adaptive_turn_detection,
+        relay_url=relay_url,
+        token_url=token_url,
+        client_log=get_client_log_config(),
+        audio_profile=audio_profile
+    )
+
+def get_transcripts():
+    """
+    Return the transcript store, or None when transcripts are not stored
+
+    ``TRANSCRIPT_DB`` in secrets.toml names the SQLite file that keeps the
+    transcript of every session.
+    """
+    path = st.secrets.get("TRANSCRIPT_DB")
+    return get_transcript_store(path) if path else None
+
+def process_client_reports(value: dict, case_id: str = None) -> None:
+    """
+    Record reports from the client that have not been processed yet
+
+    Reruns the script when a finished conversation gave this tab's slot to
+    a queued one, so the tab shows the waiting room right away.
+
+    Args:
+        value (dict): Component value with the page id and its recent reports
+        case_id (str): Simulation case the reports belong to
+    """
+    if not value:
+        return
+
+    seen = st.session_state.setdefault("client_reports_seen", {})
+    last_id = seen.get(value["page"], -1)
+    released = False
+    for report in value["reports"]:
+        if report["id"] <= last_id:
+            continue
+        if report["kind"] == "connection":
+            get_connection_metrics().record(report["marks"])
+            logger.debug(f"Connection setup ({report['transport']}): {report['marks']}")
+        elif report["kind"] == "turn":
+            get_turn_metrics().record(report, page=value["page"])
+        elif report["kind"] == "audio":
+            get_audio_metrics().record(report)
+        elif report["kind"] == "reconnect":
+            logger.info(json.dumps({"metric": "reconnect", "page": value["page"], **report}))
+        elif report["kind"] == "conversation":
+            if get_sessions().set_conversation(get_session_id(), report["state"] == "started"):
+                released = True
+        elif report["kind"] == "transcript":
+            transcripts = get_transcripts()
+            if transcripts is not None:
+                transcripts.append(get_session_id(), value["page"], report, case_id)
+        last_id = report["id"]
+    seen[value["page"]] = last_id
+    if released:
+        # Show the queue position now instead of the finished conversation
+        st.rerun()
+
+def get_sessions():
+    """
+    Return the process-wide session manager configured from secrets
+
+    ``MAX_ACTIVE_SESSIONS`` in secrets.toml caps how many tabs this process
+    serves at once; it is unlimited when unset. ``SESSION_IDLE_TIMEOUT``
+    sets the seconds a tab may stay admitted outside a conversation.
+    """
+    max_active = st.secrets.get("MAX_ACTIVE_SESSIONS")
+    idle_timeout = float(st.secrets.get("SESSION_IDLE_TIMEOUT", DEFAULT_SESSION_IDLE_TIMEOUT))
+    return get_session_manager(int(max_active) if max_active else None, idle_timeout)
+
+def admit_session() -> bool:
+    """
+    Take a session slot for this tab, or show the waiting room while queued
+
+    Returns:
+        bool: Whether the session was admitted
+    """
+    manager = get_sessions()
+    session_id = get_session_id()
+    if manager.acquire(session_id) == 0:
+        return True
+
+    @st.fragment(run_every=QUEUE_POLL_SECONDS)
+    def waiting_room():
+        position = manager.acquire(session_id)
+        if position == 0:
+            st.rerun()
+        st.info(
+            f"All {manager.max_active} simulation slots are in use. You are number {position} "
+            "in the queue; the simulation will open here automatically."
+        )
+
+    waiting_room()
+    return False
+
+def get_shared_asset_stats():
+    """
+    Return the sizes and hit rates of the process-wide caches shared by all sessions
+    """
+    rows = [
+        {
+            "asset": "case prompts",
+            "entries": len(get_case_registry()),
+            "hits": None,
+            "misses": None,
+        },
+    ]
+    # Audio helpers are only loaded by server-side audio features
+    utils = sys.modules.get("utils")
+    if utils is not None:
+        silence = utils._get_silence_bytes.cache_info()
+        rows.append({
+            "asset": "silence buffers",
+            "entries": silence.currsize,
+            "hits": silence.hits,
+            "misses": silence.misses,
+        })
+    return rows
+
+def show_diagnostics():
+    """
+    Show live sessions, shared caches and the latency and bitrate percentiles
+    aggregated across sessions
+    """
+    st.subheader("Sessions")
+    stats = get_sessions().stats()
+    active, queued, admitted = st.columns(3)
+    if stats["max_active"] is None:
+        active.metric("Active", stats["active"])
+    else:
+        active.metric("Active", f"{stats['active']} / {stats['max_active']}")
+    queued.metric("Queued", stats["queued"])
+    admitted.metric("Admitted since start", stats["admitted"])
+    st.table(get_shared_asset_stats())
+    transcripts = get_transcripts()
+    if transcripts is not None:
+        st.caption(
+            f"Transcript store: {transcripts.batches_written} batches written, "
+            f"{transcripts.dropped_messages} messages dropped. "
+            f"This session's transcript is stored as session `{get_session_id()}`."
+        )
+        sessions = transcripts.list_sessions(since=time.time() - 24 * 3600)
+        if sessions:
+            for row in sessions:
+                for column in ("started_at", "last_stored_at"):
+                    row[column] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row[column]))
+            st.caption("Stored transcripts of the last 24 hours")
+            st.dataframe(sessions, hide_index=True)
+
+    st.subheader("Connection diagnostics")
+    rows = get_connection_metrics().summary()
+    if rows:
+        st.table(rows)
+    else:
+        st.caption("No connections recorded yet.")
+
+    st.subheader("Turn latency")
+    rows = get_turn_metrics().summary()
+    if rows:
+        st.table(rows)
+    else:
+        st.caption("No turns recorded yet.")
+
+    st.subheader("Audio bitrate")
+    rows = get_audio_metrics().summary()
+    if rows:
+        st.table(rows)
+    else:
+        st.caption("No WebRTC audio stats recorded yet.")
 
 def main():
-    set_page_style()
+    # Tag this session's log lines so interleaved sessions can be told apart
+    set_correlation_id(get_session_id()[:8])
+    case_id = select_case()
+    audio_profile = select_audio_profile()
+    diagnostics = st.sidebar.toggle("Show diagnostics")
 
     st.title("🎤 OpenAI Realtime Voice Chat")
     st.markdown("""
@@ -425,12 +602,19 @@ def main():
     Click the 'Start Conversation' button and start speaking with the AI assistant.
     """)
 
+    if not admit_session():
+        return
+
     # Create WebRTC container
     with st.container():
-        st.components.v1.html(
-            get_webrtc_html(),
-            height=600
+        value = realtime_voice(
+            config=get_client_config(case_id, audio_profile),
+            credential=get_page_credential(),
+            height=600,
+            key="realtime_voice",
+            default=None
         )
+    process_client_reports(value, case_id)
 
     st.markdown("""
     ### How it works
@@ -440,5 +624,8 @@ def main():
     4. Click 'End Conversation' to stop the session
     """)
 
+    if diagnostics:
+        show_diagnostics()
+
 if __name__ == '__main__':
     main()
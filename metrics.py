@@ -0,0 +1,255 @@
+"""
+Latency metrics reported by the browser client and aggregated per process.
+"""
+import json
+import math
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Sequence
+
+import streamlit as st
+from st_utils import get_logger
+
+logger = get_logger(__name__)
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def _nearest_rank(ordered: Sequence[float], q: float) -> float:
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+class LatencyHistogram:
+    """
+    Bounded window of latency samples with percentile summaries.
+
+    Only the most recent ``max_samples`` samples are kept, so memory stays
+    constant however long the process runs.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        """
+        Args:
+            max_samples (int): Number of most recent samples to keep
+        """
+        self._samples = deque(maxlen=max_samples)
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        """
+        Args:
+            value (float): Latency sample in milliseconds
+        """
+        self._samples.append(value)
+        self.count += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        Return the nearest-rank percentile of the kept samples.
+
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            float: Percentile value, or NaN when there are no samples
+        """
+        if not self._samples:
+            return math.nan
+        return _nearest_rank(sorted(self._samples), q)
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dict[str, float]: Total sample count and p50/p95/p99 of the kept samples
+        """
+        summary = {"count": self.count}
+        if self._samples:
+            ordered = sorted(self._samples)
+            for q in PERCENTILES:
+                summary[f"p{round(q * 100)}"] = _nearest_rank(ordered, q)
+        return summary
+
+
+class ConnectionMetrics:
+    """
+    Per-phase connection setup latency, aggregated across sessions.
+
+    The client reports cumulative marks (milliseconds since Start was
+    clicked) in the order the phases finished; each phase's duration is the
+    gap to the previous mark.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        """
+        Args:
+            max_samples (int): Samples kept per phase
+        """
+        self.max_samples = max_samples
+        self._phases: Dict[str, LatencyHistogram] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, marks: Sequence[Sequence]) -> None:
+        """
+        Record one connection attempt.
+
+        Args:
+            marks (Sequence[Sequence]): ``[phase, ms_since_start]`` pairs in completion order
+        """
+        with self._lock:
+            previous = 0.0
+            for phase, elapsed in marks:
+                histogram = self._phases.get(phase)
+                if histogram is None:
+                    histogram = self._phases[phase] = LatencyHistogram(self.max_samples)
+                histogram.add(elapsed - previous)
+                previous = elapsed
+            if marks:
+                self._phases.setdefault("total", LatencyHistogram(self.max_samples)).add(previous)
+                self._phases.move_to_end("total")
+
+    def summary(self) -> List[dict]:
+        """
+        Returns:
+            List[dict]: One row per phase with count and p50/p95/p99 durations in ms
+        """
+        with self._lock:
+            return [
+                {"phase": phase, **histogram.summary()}
+                for phase, histogram in self._phases.items()
+            ]
+
+
+class TurnMetrics:
+    """
+    Per-turn latency collector.
+
+    Each turn runs from the end of user speech to ``response.done``;
+    ``end_of_speech_ms`` adds the VAD silence window in effect for the turn
+    to the response latency, which starts when VAD reports the end. Turns
+    are logged as one JSON line each (the structured metrics feed) and
+    aggregated into bounded histograms per field.
+    """
+
+    FIELDS = (
+        "speech_ms",
+        "response_latency_ms",
+        "end_of_speech_ms",
+        "response_duration_ms",
+        "turn_ms",
+        "audio_bytes",
+        "silence_duration_ms",
+    )
+
+    def __init__(self, max_samples: int = 1000):
+        """
+        Args:
+            max_samples (int): Samples kept per field
+        """
+        self._fields = {field: LatencyHistogram(max_samples) for field in self.FIELDS}
+        self._lock = threading.Lock()
+
+    def record(self, turn: dict, **context) -> None:
+        """
+        Record one completed turn.
+
+        Args:
+            turn (dict): Turn report from the client; fields may be None when not observed
+            **context: Extra fields for the log line, e.g. the page id
+        """
+        logger.info(json.dumps({"metric": "turn", **context, **turn}))
+        with self._lock:
+            for field, histogram in self._fields.items():
+                if turn.get(field) is not None:
+                    histogram.add(turn[field])
+
+    def summary(self) -> List[dict]:
+        """
+        Returns:
+            List[dict]: One row per field with count and p50/p95/p99
+        """
+        with self._lock:
+            return [
+                {"field": field, **histogram.summary()}
+                for field, histogram in self._fields.items()
+                if histogram.count
+            ]
+
+
+class AudioMetrics:
+    """
+    WebRTC audio bytes per second on the wire, per audio profile.
+
+    The client samples its RTP byte counters periodically; each report is
+    the average rate over one sampling interval.
+    """
+
+    FIELDS = ("sent_bytes_per_s", "received_bytes_per_s")
+
+    def __init__(self, max_samples: int = 1000):
+        """
+        Args:
+            max_samples (int): Samples kept per profile and field
+        """
+        self.max_samples = max_samples
+        self._profiles: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, report: dict) -> None:
+        """
+        Record one sampling interval.
+
+        Args:
+            report (dict): Audio report from the client with the profile name and byte rates
+        """
+        with self._lock:
+            fields = self._profiles.get(report["profile"])
+            if fields is None:
+                fields = self._profiles[report["profile"]] = {
+                    field: LatencyHistogram(self.max_samples) for field in self.FIELDS
+                }
+            for field, histogram in fields.items():
+                histogram.add(report[field])
+
+    def summary(self) -> List[dict]:
+        """
+        Returns:
+            List[dict]: One row per profile and field with count and p50/p95/p99 in bytes/s
+        """
+        with self._lock:
+            return [
+                {"profile": profile, "field": field, **histogram.summary()}
+                for profile, fields in self._profiles.items()
+                for field, histogram in fields.items()
+            ]
+
+@st.cache_resource
+def get_connection_metrics() -> ConnectionMetrics:
+    """
+    Return the process-wide connection metrics, shared by all sessions
+
+    Returns:
+        ConnectionMetrics: Connection setup metrics
+    """
+    return ConnectionMetrics()
+
+
+@st.cache_resource
+def get_turn_metrics() -> TurnMetrics:
+    """
+    Return the process-wide turn latency metrics, shared by all sessions
+
+    Returns:
+        TurnMetrics: Turn latency metrics
+    """
+    return TurnMetrics()
+
+
+@st.cache_resource
+def get_audio_metrics() -> AudioMetrics:
+    """
+    Return the process-wide WebRTC audio bitrate metrics, shared by all sessions
+
+    Returns:
+        AudioMetrics: Audio bitrate metrics
+    """
+    return AudioMetrics()
@@ -0,0 +1,203 @@
+"""
+Audio preprocessing before audio goes upstream.
+
+AudioPreprocessor turns a stream of AudioFrames of any sample format and
+layout into pcm16 mono frames at the Realtime API rate. It downmixes,
+resamples by an integer factor with a windowed-sinc low-pass FIR, and
+gates frames with an energy-based VAD. Silence is trimmed: only a short
+pre-roll before speech and a hangover after it are passed on, enough for
+server-side VAD to see where speech starts and stops. Every step works on
+whole frames with NumPy.
+"""
+from collections import deque
+from fractions import Fraction
+from typing import Iterable, Iterator, List, Optional
+
+import av
+import numpy as np
+
+from utils import AudioFramePool, audio_frame_to_pcm_views, frame_geometry, pcm_audio_to_audio_frame
+
+# Full scale of pcm16, in the float32 units the pipeline works in
+_FULL_SCALE = 32768.0
+
+
+def design_lowpass(factor: int, taps_per_phase: int = 16) -> np.ndarray:
+    """
+    Design the anti-aliasing filter for decimation by ``factor``.
+
+    Args:
+        factor (int): Decimation factor
+        taps_per_phase (int): Filter length per output sample phase
+
+    Returns:
+        np.ndarray: Hamming-windowed sinc taps with unity DC gain
+    """
+    ntaps = taps_per_phase * factor + 1
+    # Pass up to 90% of the output Nyquist frequency
+    cutoff = 0.45 / factor
+    n = np.arange(ntaps) - (ntaps - 1) / 2
+    taps = np.sinc(2 * cutoff * n) * np.hamming(ntaps)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+class AudioPreprocessor:
+    """
+    Resamples, gates and trims one audio stream.
+
+    Feed frames in order to ``process``; it returns the frames to send,
+    which is none at all while the stream is silent. The filter history
+    carries over between frames, so frame boundaries do not click.
+    """
+
+    def __init__(
+        self,
+        *,
+        input_rate: int = 48000,
+        output_rate: int = 24000,
+        threshold_db: Optional[float] = -45.0,
+        preroll_ms: int = 300,
+        hangover_ms: int = 1000,
+        pool: Optional[AudioFramePool] = None
+    ):
+        """
+        Args:
+            input_rate (int): Sample rate of the incoming frames
+            output_rate (int): Sample rate of the outgoing pcm16 frames; must divide input_rate
+            threshold_db (float): Frame RMS level in dBFS above which a frame counts as speech;
+                no gating when None
+            preroll_ms (int): Silence kept before speech starts
+            hangover_ms (int): Silence kept after speech stops; keep it above the server VAD
+                silence window
+            pool (AudioFramePool): Pool to take the outgoing frames from
+        """
+        if input_rate % output_rate:
+            raise ValueError(
+                f"Cannot resample {input_rate} Hz to {output_rate} Hz by an integer factor"
+            )
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.factor = input_rate // output_rate
+        self.threshold = None if threshold_db is None else _FULL_SCALE * 10 ** (threshold_db / 20)
+        self.preroll_ms = preroll_ms
+        self.hangover_ms = hangover_ms
+        self.pool = pool
+        self.stats = {
+            "frames_in": 0,
+            "frames_out": 0,
+            "frames_dropped": 0,
+            "bytes_out": 0,
+        }
+        self._taps = design_lowpass(self.factor) if self.factor > 1 else None
+        self._history = np.zeros(0 if self._taps is None else len(self._taps) - 1, np.float32)
+        self._phase = 0
+        self._pts = 0
+        # Silent output chunks kept as pre-roll, and ms of silence since speech
+        self._preroll = deque()
+        self._preroll_ms = 0.0
+        self._silence_ms = None
+
+    def process(self, frame: av.AudioFrame) -> List[av.AudioFrame]:
+        """
+        Run one frame through the pipeline.
+
+        Args:
+            frame (av.AudioFrame): Input frame at input_rate; any layout and signed or float
+                sample format
+
+        Returns:
+            List[av.AudioFrame]: pcm16 mono frames at output_rate to send, possibly none
+        """
+        self.stats["frames_in"] += 1
+        samples = self._resample(self._to_mono(frame))
+        pts = self._pts
+        self._pts += len(samples)
+        if not len(samples):
+            return []
+
+        pcm_audio = np.clip(samples, -_FULL_SCALE, _FULL_SCALE - 1).astype(np.int16)
+        duration_ms = len(pcm_audio) * 1000 / self.output_rate
+        if self.threshold is None:
+            return [self._make_frame(pcm_audio, pts)]
+
+        rms = np.sqrt(np.dot(samples, samples) / len(samples))
+        if rms >= self.threshold:
+            # Speech: flush the pre-roll ahead of this chunk
+            self._silence_ms = 0.0
+            chunks = list(self._preroll) + [(pcm_audio, pts)]
+            self._preroll.clear()
+            self._preroll_ms = 0.0
+            return [self._make_frame(chunk, chunk_pts) for chunk, chunk_pts in chunks]
+
+        if self._silence_ms is not None and self._silence_ms < self.hangover_ms:
+            # Trailing silence that server VAD needs to end the turn
+            self._silence_ms += duration_ms
+            return [self._make_frame(pcm_audio, pts)]
+
+        self._silence_ms = None
+        self._preroll.append((pcm_audio, pts))
+        self._preroll_ms += duration_ms
+        while self._preroll and self._preroll_ms > self.preroll_ms:
+            self._preroll_ms -= len(self._preroll.popleft()[0]) * 1000 / self.output_rate
+            self.stats["frames_dropped"] += 1
+        return []
+
+    def process_stream(self, frames: Iterable[av.AudioFrame]) -> Iterator[av.AudioFrame]:
+        """
+        Run a stream of frames through the pipeline.
+
+        Args:
+            frames (Iterable[av.AudioFrame]): Input frames in order
+
+        Yields:
+            av.AudioFrame: pcm16 mono frames at output_rate to send
+        """
+        for frame in frames:
+            yield from self.process(frame)
+
+    def _to_mono(self, frame: av.AudioFrame) -> np.ndarray:
+        if frame.sample_rate != self.input_rate:
+            raise ValueError(f"Expected {self.input_rate} Hz audio, got {frame.sample_rate} Hz")
+        dtype, is_planar, channels = frame_geometry(frame.format.name, frame.layout.name)
+        planes = [np.frombuffer(view, dtype) for view in audio_frame_to_pcm_views(frame)]
+        if is_planar:
+            channel_samples = planes
+        else:
+            interleaved = planes[0].reshape(-1, channels)
+            channel_samples = [interleaved[:, channel] for channel in range(channels)]
+
+        mono = channel_samples[0].astype(np.float32)
+        for samples in channel_samples[1:]:
+            mono += samples
+        if np.issubdtype(dtype, np.floating):
+            scale = _FULL_SCALE
+        else:
+            scale = _FULL_SCALE / (np.iinfo(dtype).max + 1)
+        mono *= scale / channels
+        return mono
+
+    def _resample(self, samples: np.ndarray) -> np.ndarray:
+        if self._taps is None:
+            return samples
+        # Filter with the tail of the previous frame in front, then keep every
+        # factor-th output, continuing the phase where the last frame ended
+        buffer = np.concatenate((self._history, samples))
+        filtered = np.convolve(buffer, self._taps, mode="valid")
+        out = filtered[self._phase::self.factor]
+        self._phase = (self._phase - len(filtered)) % self.factor
+        self._history = buffer[len(buffer) - len(self._history):]
+        return out
+
+    def _make_frame(self, pcm_audio: np.ndarray, pts: int) -> av.AudioFrame:
+        frame = pcm_audio_to_audio_frame(
+            pcm_audio.tobytes(),
+            format="s16",
+            layout="mono",
+            sample_rate=self.output_rate,
+            pool=self.pool
+        )
+        frame.pts = pts
+        frame.time_base = Fraction(1, self.output_rate)
+        self.stats["frames_out"] += 1
+        self.stats["bytes_out"] += pcm_audio.nbytes
+        return frame
@@ -1,109 +1,156 @@
-def get_default_instructions():
+import functools
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+# Case prompts live in this directory, one file per case; the file stem is the case ID.
+# An optional JSON file with the same stem holds session settings for the case
+PROMPTS_DIR = Path(__file__).parent / "prompts"
+PROMPT_SUFFIXES = (".md", ".txt")
+DEFAULT_CASE_ID = "acupuncture_liver_injury"
+
+# Markdown headings ("# Patient Profile") and numbered headings ("1. Patient Profile")
+_HEADING_RE = re.compile(r"^(#+\s+\S|\d+\.\s+\S)")
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class CasePrompt(NamedTuple):
+    """A normalized case prompt with its token count, content hash and session settings"""
+    case_id: str
+    title: str
+    instructions: str
+    tokens: int
+    content_hash: str
+    turn_detection: Optional[dict] = None
+
+
+def _contains_run(lines: Sequence[str], run: Sequence[str]) -> bool:
+    """Return whether ``run`` appears as a contiguous run inside ``lines``"""
+    size = len(run)
+    return any(tuple(lines[i:i + size]) == tuple(run) for i in range(len(lines) - size + 1))
+
+def normalize_instructions(text: str) -> str:
     """
-    Return the default instructions for the AI assistant as a string
+    Normalize prompt text to save input tokens without changing its meaning.
+
+    Runs of spaces and tabs are collapsed, lines are stripped, consecutive
+    blank lines are merged, and any section (a heading and the lines up to
+    the next heading) whose body already appears verbatim in an earlier
+    section is dropped.
+
+    Args:
+        text (str): Raw prompt text
+
+    Returns:
+        str: Normalized prompt text
+    """
+    sections = []
+    for line in text.splitlines():
+        line = re.sub(r"[ \t]+", " ", line).strip()
+        if _HEADING_RE.match(line) or not sections:
+            sections.append([line])
+        else:
+            sections[-1].append(line)
+
+    kept = []
+    seen_bodies = []
+    for heading, *body in sections:
+        content = [line for line in body if line]
+        if content and any(_contains_run(seen, content) for seen in seen_bodies):
+            continue
+        seen_bodies.append(content)
+        kept.extend([heading, *body])
+
+    normalized = re.sub(r"\n{3,}", "\n\n", "\n".join(kept))
+    return normalized.strip()
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding():
+    """Return the tiktoken encoding, or None when tiktoken is not installed (looked up once)"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("o200k_base")
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a prompt.
+
+    Uses tiktoken when it is installed, otherwise estimates from word and
+    punctuation counts, which is close enough for budgeting.
+
+    Args:
+        text (str): Prompt text
+
+    Returns:
+        int: Token count
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(_TOKEN_RE.findall(text))
+    return len(encoding.encode(text))
+
+def load_case_prompt(path: Path) -> CasePrompt:
     """
-    return (
-        """
-        You play the role of a 58-year-old woman with acupuncture-induced liver injury in a clinical simulation. You should strive for realistic patient behavior, emotional responses, and medical history recall. Here are the details of the case: 
-
-# Patient Profile
-Name: Susan Li (or another culturally appropriate name)
-Age: 58
-Gender: Female
-Occupation: Retired teacher
-Living Situation: Lives alone, visits an acupuncturist regularly for stress relief and digestive issues.
-Health History: No major past medical issues; no history of surgery or bleeding disorders.
-Acupuncture History: Has received acupuncture 5–6 times before, never had issues.
-
-# Chief Complaint & Emotional State
-Initial Presentation (Emergency Department Triage)
-Opening Statement (Unprompted)
-"I have really bad stomach pain. It started a few hours ago and just keeps getting worse."
-
-Tone & Emotion
-Pained, distressed, slightly anxious.
-Moves slowly and cautiously due to severe abdominal pain.
-Speech is strained, occasionally wincing mid-sentence.
-Answers in short sentences due to discomfort.
-If Asked to Rate Pain (1-10 scale)
-"It's at least an 8 or 9… it hurts a lot when I move."
-
-
-Patient Behavior Guidance for Simulation (Actor or LLM)
-This document provides structured guidance for an actor or AI language model portraying a 58-year-old woman with acupuncture-induced liver injury in a clinical simulation. It ensures realistic patient behavior, emotional responses, and medical history recall.
-
-1. Patient Profile
-Name: Susan Li (or another culturally appropriate name)
-Age: 58
-Gender: Female
-Occupation: Retired teacher
-Living Situation: Lives alone, visits an acupuncturist regularly for stress relief and digestive issues.
-Health History: No major past medical issues; no history of surgery or bleeding disorders.
-Acupuncture History: Has received acupuncture 5–6 times before, never had issues.
-2. Chief Complaint & Emotional State
-Initial Presentation (Emergency Department Triage)
-Opening Statement (Unprompted)
-"I have really bad stomach pain. It started a few hours ago and just keeps getting worse."
-
-Tone & Emotion
-Pained, distressed, slightly anxious.
-Moves slowly and cautiously due to severe abdominal pain.
-Speech is strained, occasionally wincing mid-sentence.
-Answers in short sentences due to discomfort.
-If Asked to Rate Pain (1-10 scale)
-"It's at least an 8 or 9… it hurts a lot when I move."
-
-# Medical History Recall
-Pain & Symptom Progression
-"The pain started dull but now feels sharper, like it's deep inside."
-"I feel weak and a little lightheaded. My heart is racing too."
-"It hurts more when I take deep breaths."
-If asked about nausea/vomiting:
-"I feel a little nauseous, but I haven’t thrown up."
-Recent Events & Acupuncture
-"I had acupuncture yesterday, for stress and digestion. I’ve done it before, but never felt like this afterward."
-If asked about where the needles were placed:
-"On my stomach, right in the middle and lower part." (gestures toward epigastric region)
-If asked about bleeding/bruising after acupuncture:
-"No, I didn’t notice anything unusual."
-
-# Sample Questions & Expected Responses
-Clinical History & Symptom Questions
-Q: "When did the pain start?"
-A: "It started about 7 hours ago and got worse over time."
-
-Q: "Where exactly does it hurt?"
-A: "Mostly in the middle and upper right part of my stomach." (Gestures to upper abdomen.)
-
-Q: "How does the pain feel?"
-A: "It started as a dull ache, but now it's sharp and deep."
-
-Q: "Have you had any nausea or vomiting?"
-A: "A little nausea, but I haven’t thrown up."
-
-Q: "Have you noticed any bruising or swelling after the acupuncture?"
-A: "No, everything looked normal."
-
-Behavioral & Emotional Responses
-Q: "We need to do a CT scan to check for internal bleeding."
-A: (Mildly nervous, deep breath) "Okay… will it take long?"
-
-Q: "There is some internal bleeding from your liver. You may need surgery."
-A: (Eyes widen, some panic) "Surgery? Is it really that bad?"
-
-Q: "We’re preparing you for a blood transfusion and surgery."
-A: (Takes a deep breath, hesitates, then nods) "I guess I don’t have a choice…"
-
-# Additional Enhancements for Realism
-Use of pauses & hesitation ("Um... I don’t know if this is related, but…")
-Occasional eye-closing or wincing due to pain.
-Requests for clarification: "Could the acupuncture really have done this?"
-
-Importantly, you will NOT respond to inquiries about:
-- Physical Examination
-- Diagnosis. 
-
-The doctor should not reach those phases yet. If they try to do one of these things (e.g. "Let me touch your stomach and tell me if it hurts"), you should say something like "I'm not a doctor, but shouldn't we talk more about the symptoms first?"
-"""
+    Load and normalize a single case prompt file and its optional settings file.
 
+    Args:
+        path (Path): Prompt file
+
+    Returns:
+        CasePrompt: Normalized case prompt
+    """
+    instructions = normalize_instructions(path.read_text(encoding="utf-8"))
+    settings_path = path.with_suffix(".json")
+    settings = {}
+    if settings_path.exists():
+        settings = json.loads(settings_path.read_text(encoding="utf-8"))
+    return CasePrompt(
+        case_id=path.stem,
+        title=path.stem.replace("_", " ").title(),
+        instructions=instructions,
+        tokens=count_tokens(instructions),
+        content_hash=hashlib.sha256(instructions.encode("utf-8")).hexdigest(),
+        turn_detection=settings.get("turn_detection"),
     )
+
+@functools.lru_cache(maxsize=None)
+def get_case_registry(directory: Path = PROMPTS_DIR) -> Dict[str, CasePrompt]:
+    """
+    Load every case prompt in a directory once per process
+
+    Args:
+        directory (Path): Directory of prompt files (default: PROMPTS_DIR)
+
+    Returns:
+        Dict[str, CasePrompt]: Case prompts by case ID, in ID order
+    """
+    paths = sorted(p for p in directory.iterdir() if p.suffix in PROMPT_SUFFIXES)
+    return {path.stem: load_case_prompt(path) for path in paths}
+
+def list_case_ids() -> List[str]:
+    """
+    Return the IDs of all registered cases
+    """
+    return list(get_case_registry())
+
+def get_case_prompt(case_id: str = DEFAULT_CASE_ID) -> CasePrompt:
+    """
+    Return a registered case prompt by ID
+
+    Args:
+        case_id (str): Case ID (default: DEFAULT_CASE_ID)
+
+    Returns:
+        CasePrompt: Normalized case prompt
+    """
+    return get_case_registry()[case_id]
+
+def get_default_instructions():
+    """
+    Return the default instructions for the AI assistant as a string
+    """
+    return get_case_prompt(DEFAULT_CASE_ID).instructions
@@ -0,0 +1,87 @@
+"""
+Static build of the browser client served as the ``realtime_voice`` component.
+
+The client lives in ``frontend/src``. Building copies its JS and CSS to
+``frontend/build`` under content-hashed file names and points
+``index.html`` at them. Streamlit serves component assets other than HTML
+with ``Cache-Control: public``, so browsers keep each bundle until its
+content, and with it its name, changes. Only the small ``index.html`` is
+fetched again, and only the session settings travel with each rerun, as
+component args.
+
+The app builds on startup. Where the source tree is read-only, build at
+packaging time with ``python realtime_component.py``; a build that is up
+to date is not written again. Otherwise the app falls back to building
+under the system temporary directory.
+"""
+import hashlib
+import tempfile
+from pathlib import Path
+
+import streamlit.components.v1 as components
+
+from st_utils import get_logger
+
+logger = get_logger(__name__)
+
+FRONTEND_DIR = Path(__file__).parent / "frontend"
+SOURCE_DIR = FRONTEND_DIR / "src"
+BUILD_DIR = FRONTEND_DIR / "build"
+BUNDLES = ("realtime_voice.js", "realtime_voice.css")
+
+
+def _write_if_changed(path: Path, content: bytes) -> None:
+    if not path.exists() or path.read_bytes() != content:
+        path.write_bytes(content)
+
+
+def build_component(source_dir: Path = SOURCE_DIR, build_dir: Path = BUILD_DIR) -> Path:
+    """
+    Write the versioned bundles and their index.html to the build directory
+
+    Unchanged files are left alone, and bundles of earlier builds are removed.
+
+    Args:
+        source_dir (Path): Directory with index.html and the BUNDLES sources
+        build_dir (Path): Directory the component is served from
+
+    Returns:
+        Path: The build directory
+    """
+    build_dir.mkdir(parents=True, exist_ok=True)
+    index = (source_dir / "index.html").read_text()
+    current = {"index.html"}
+    for name in BUNDLES:
+        content = (source_dir / name).read_bytes()
+        stem, suffix = name.rsplit(".", 1)
+        versioned = f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}.{suffix}"
+        _write_if_changed(build_dir / versioned, content)
+        index = index.replace(f'"{name}"', f'"{versioned}"')
+        current.add(versioned)
+    _write_if_changed(build_dir / "index.html", index.encode())
+
+    for path in build_dir.iterdir():
+        if path.name not in current:
+            path.unlink()
+    return build_dir
+
+
+def _build_or_fall_back() -> Path:
+    try:
+        return build_component(SOURCE_DIR, BUILD_DIR)
+    except OSError as error:
+        # One directory per checkout, so apps of different versions do not share it
+        checkout = hashlib.sha256(str(FRONTEND_DIR.resolve()).encode()).hexdigest()[:12]
+        fallback = Path(tempfile.gettempdir()) / f"realtime_voice-{checkout}"
+        logger.warning(
+            f"Cannot write the component build to {BUILD_DIR} ({error}); building in {fallback}"
+        )
+        return build_component(build_dir=fallback)
+
+
+# Built once per process, when the app first imports this module
+realtime_voice = components.declare_component("realtime_voice", path=str(_build_or_fall_back()))
+
+
+if __name__ == '__main__':
+    print(f"Built the component in {build_component()}")
@@ -0,0 +1,133 @@
+"""
+Streaming session recorder.
+
+Audio chunks are handed over through a bounded queue to a background
+writer thread that encodes them with PyAV as they arrive, so a session is
+never buffered in memory as a whole. The codec follows the file suffix:
+``.ogg``/``.opus`` are encoded as Opus, ``.wav`` as 16-bit PCM.
+"""
+from fractions import Fraction
+from pathlib import Path
+from typing import Union
+
+import av
+
+from background_writer import BackgroundWriter
+from utils import AudioFramePool, pcm_audio_to_audio_frame
+
+CODECS = {
+    ".ogg": ("libopus", 48000),
+    ".opus": ("libopus", 48000),
+    ".wav": ("pcm_s16le", None),
+}
+
+
+class SessionRecorder(BackgroundWriter):
+    """
+    Records pcm16 audio chunks of one session to an audio file.
+
+    ``write`` never blocks the caller: when the writer falls more than
+    ``max_pending`` chunks behind, new chunks are dropped and counted in
+    ``dropped_chunks`` rather than growing memory.
+    """
+
+    thread_name = "recorder"
+    item_name = "audio"
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        *,
+        sample_rate: int = 24000,
+        layout: str = "mono",
+        bitrate: int = 32000,
+        max_pending: int = 250
+    ):
+        """
+        Args:
+            path (Union[str, Path]): Output file; the suffix selects the codec
+            sample_rate (int): Sample rate of the incoming pcm16 audio
+            layout (str): Channel layout of the incoming audio
+            bitrate (int): Target bitrate for Opus
+            max_pending (int): Chunks queued before new ones are dropped
+        """
+        super().__init__(path, max_pending=max_pending)
+        if self.path.suffix not in CODECS:
+            raise ValueError(f"Unsupported recording format: {self.path.suffix}")
+        self.sample_rate = sample_rate
+        self.layout = layout
+        self.bitrate = bitrate
+        self.samples_written = 0
+        # Frames for the encoder, used only by the writer thread
+        self.frame_pool = AudioFramePool(max_frames_per_key=4, max_frames=16)
+
+    def write(self, pcm_audio: bytes) -> bool:
+        """
+        Queue a chunk of pcm16 audio for writing.
+
+        Args:
+            pcm_audio (bytes): Interleaved pcm16 audio
+
+        Returns:
+            bool: False if the chunk was dropped because the writer is behind
+        """
+        return self._put(bytes(pcm_audio))
+
+    @property
+    def dropped_chunks(self) -> int:
+        """
+        Returns:
+            int: Chunks dropped because the writer was behind
+        """
+        return self.dropped
+
+    def _write(self) -> None:
+        codec, rate = CODECS[self.path.suffix]
+        time_base = Fraction(1, self.sample_rate)
+        with av.open(str(self.path), mode="w") as container:
+            stream = container.add_stream(codec, rate=rate or self.sample_rate, layout=self.layout)
+            if codec == "libopus":
+                stream.bit_rate = self.bitrate
+
+            for chunk in self._items():
+                frame = pcm_audio_to_audio_frame(
+                    chunk,
+                    format="s16",
+                    layout=self.layout,
+                    sample_rate=self.sample_rate,
+                    pool=self.frame_pool
+                )
+                frame.pts = self.samples_written
+                frame.time_base = time_base
+                self.samples_written += frame.samples
+                container.mux(stream.encode(frame))
+                self.frame_pool.release(frame)
+
+            container.mux(stream.encode(None))
+
+
+def open_session_recorder(
+    directory: Union[str, Path],
+    session_id: str,
+    track: str,
+    *,
+    suffix: str = ".ogg",
+    sample_rate: int = 24000
+) -> SessionRecorder:
+    """
+    Start a recorder for one track of a session under a recordings directory.
+
+    Args:
+        directory (Union[str, Path]): Recordings directory, created if missing
+        session_id (str): Session identifier used in the file name
+        track (str): Track name, e.g. "user" or "assistant"
+        suffix (str): File suffix selecting the codec
+        sample_rate (int): Sample rate of the incoming pcm16 audio
+
+    Returns:
+        SessionRecorder: Started recorder
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{session_id}-{track}{suffix}"
+    return SessionRecorder(path, sample_rate=sample_rate).start()
@@ -0,0 +1,486 @@
+"""
+Server-side relay between the browser page and the OpenAI Realtime API.
+
+In relay mode the browser never talks to OpenAI directly. It opens a
+WebSocket to the RelayServer and exchanges:
+
+- text messages: Realtime client/server events as JSON
+- binary messages: raw pcm16 mono audio at REALTIME_SAMPLE_RATE
+
+The relay owns the upstream connection and the API key, converts audio
+with the ``utils`` frame helpers and applies backpressure in both
+directions. Because it spends the server's API key, it only accepts pages
+from the allowed origins that present a valid session credential (see
+session_credentials.py) as the ``credential`` query parameter.
+"""
+import asyncio
+import base64
+import json
+import threading
+import time
+import uuid
+from http import HTTPStatus
+from pathlib import Path
+from typing import AsyncIterator, Optional, Sequence, Union
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+from session_credentials import SessionCredentials, is_origin_allowed
+from st_utils import get_logger, set_correlation_id
+from utils import AudioFramePool, audio_frame_to_pcm_views, pcm_audio_to_audio_frame
+
+logger = get_logger(__name__)
+
+REALTIME_URL = "wss://api.openai.com/v1/realtime"
+REALTIME_SAMPLE_RATE = 24000
+REALTIME_AUDIO_FORMAT = dict(format="s16", layout="mono", sample_rate=REALTIME_SAMPLE_RATE)
+# Silence the gate passes on beyond the server VAD silence window, so the
+# window always elapses and turns end
+VAD_HANGOVER_MARGIN_MS = 300
+# Close code for pages that send audio that is not pcm16 mono (RFC 6455 invalid payload data)
+INVALID_AUDIO_CLOSE_CODE = 1007
+
+
+class RealtimeRelay:
+    """
+    A single upstream Realtime session owned by the server.
+
+    Outbound audio goes through a bounded queue, so ``send_audio`` waits
+    when the upstream socket falls behind instead of buffering without limit.
+    If the upstream connection closes, the audio sender stops and
+    ``send_audio`` raises ConnectionError instead of waiting forever.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        model: str,
+        url: str = REALTIME_URL,
+        max_pending_audio: int = 50,
+        frame_pool: Optional[AudioFramePool] = None
+    ):
+        """
+        Args:
+            api_key (str): OpenAI API key
+            model (str): Realtime model name
+            url (str): Realtime WebSocket endpoint
+            max_pending_audio (int): Audio frames queued before send_audio blocks
+            frame_pool (AudioFramePool): Pool that sent frames are returned to
+        """
+        self.api_key = api_key
+        self.model = model
+        self.url = url
+        self.frame_pool = frame_pool
+        self.stats = {
+            "connect_ms": None,
+            "events_sent": 0,
+            "events_received": 0,
+            "audio_bytes_sent": 0,
+            "audio_bytes_received": 0,
+        }
+        self._audio_queue = asyncio.Queue(max_pending_audio)
+        self._websocket = None
+        self._sender = None
+
+    async def connect(self) -> None:
+        """Open the upstream connection and start the audio sender"""
+        started = time.perf_counter()
+        self._websocket = await connect(
+            f"{self.url}?model={self.model}",
+            additional_headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "OpenAI-Beta": "realtime=v1",
+            },
+            max_size=None,
+        )
+        self.stats["connect_ms"] = (time.perf_counter() - started) * 1000
+        self._sender = asyncio.create_task(self._send_audio_loop())
+
+    @property
+    def sender(self) -> Optional[asyncio.Task]:
+        """The audio sender task; it finishes when the upstream connection closes"""
+        return self._sender
+
+    async def close(self) -> None:
+        """Stop the audio sender and close the upstream connection"""
+        if self._sender:
+            self._sender.cancel()
+            self._sender = None
+        if self._websocket:
+            await self._websocket.close()
+            self._websocket = None
+
+    async def __aenter__(self) -> "RealtimeRelay":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def send_event(self, event: dict) -> None:
+        """
+        Send a client event upstream.
+
+        Args:
+            event (dict): Realtime client event
+        """
+        await self._websocket.send(json.dumps(event))
+        self.stats["events_sent"] += 1
+
+    async def send_audio(self, frame) -> None:
+        """
+        Queue an audio frame for upstream, waiting while the queue is full.
+
+        Args:
+            frame (av.AudioFrame): pcm16 mono frame at REALTIME_SAMPLE_RATE
+
+        Raises:
+            ConnectionError: The upstream connection is closed
+        """
+        if self._sender is None or self._sender.done():
+            raise ConnectionError("Upstream Realtime connection closed")
+        try:
+            self._audio_queue.put_nowait(frame)
+            return
+        except asyncio.QueueFull:
+            pass
+        # Wait for room, unless the sender stops while we wait
+        put = asyncio.ensure_future(self._audio_queue.put(frame))
+        await asyncio.wait((put, self._sender), return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            raise ConnectionError("Upstream Realtime connection closed")
+
+    async def _send_audio_loop(self) -> None:
+        try:
+            while True:
+                frame = await self._audio_queue.get()
+                pcm_audio = audio_frame_to_pcm_views(frame)[0]
+                await self.send_event({
+                    "type": "input_audio_buffer.append",
+                    "audio": base64.b64encode(pcm_audio).decode("ascii"),
+                })
+                self.stats["audio_bytes_sent"] += len(pcm_audio)
+                del pcm_audio
+                if self.frame_pool is not None:
+                    self.frame_pool.release(frame)
+        except ConnectionClosed as error:
+            logger.warning(f"Upstream connection closed while sending audio: {error}")
+
+    async def events(self) -> AsyncIterator[dict]:
+        """
+        Iterate over server events until the upstream connection closes.
+
+        Yields:
+            dict: Realtime server event
+        """
+        try:
+            async for message in self._websocket:
+                event = json.loads(message)
+                self.stats["events_received"] += 1
+                yield event
+        except ConnectionClosed:
+            return
+
+
+class RelayServer:
+    """
+    WebSocket server that bridges each browser page to its own RealtimeRelay.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        model: str,
+        host: str = "localhost",
+        port: int = 8765,
+        url: str = REALTIME_URL,
+        recording_dir: Optional[Union[str, Path]] = None,
+        silence_threshold_db: Optional[float] = None,
+        context_token_budget: Optional[int] = None,
+        event_fixture_dir: Optional[Union[str, Path]] = None,
+        credentials: Optional[SessionCredentials] = None,
+        allowed_origins: Optional[Sequence[str]] = None
+    ):
+        """
+        Args:
+            api_key (str): OpenAI API key
+            model (str): Realtime model name
+            host (str): Interface to listen on
+            port (int): Port to listen on (0 picks a free port)
+            url (str): Upstream Realtime WebSocket endpoint
+            recording_dir (Union[str, Path]): Directory to record session audio to, if any
+            silence_threshold_db (float): Level in dBFS below which microphone audio is
+                trimmed instead of sent upstream (see preprocessing.AudioPreprocessor);
+                sends everything when None
+            context_token_budget (int): Conversation tokens above which the oldest items are deleted
+                and summarized (see conversation.ConversationStore); unlimited when None
+            event_fixture_dir (Union[str, Path]): Directory to record each session's server events
+                to as a replayable fixture (see event_fixtures.py), if any
+            credentials (SessionCredentials): Verifies the credential each page must present;
+                pages are not authenticated when None, which is only safe on a private interface
+            allowed_origins (Sequence[str]): Origins pages may connect from, or
+                session_credentials.SAME_HOST; any origin when None
+        """
+        self.api_key = api_key
+        self.model = model
+        self.host = host
+        self.port = port
+        self.url = url
+        self.recording_dir = recording_dir
+        self.silence_threshold_db = silence_threshold_db
+        self.context_token_budget = context_token_budget
+        self.event_fixture_dir = event_fixture_dir
+        self.credentials = credentials
+        self.allowed_origins = allowed_origins
+        self.frame_pool = AudioFramePool()
+        self.active_sessions = 0
+        self._server = None
+
+    async def start(self) -> None:
+        """Start listening; the bound port is stored back on ``self.port``"""
+        self._server = await serve(
+            self._handle,
+            self.host,
+            self.port,
+            max_size=None,
+            process_request=self._authorize
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Realtime relay listening on ws://{self.host}:{self.port}")
+        if self.credentials is None:
+            logger.warning(
+                "Relay accepts pages without a session credential; do not expose it publicly"
+            )
+
+    async def stop(self) -> None:
+        """Stop listening and close all page connections"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def start_in_thread(self) -> "RelayServer":
+        """
+        Run the server on its own event loop in a daemon thread.
+
+        Returns:
+            RelayServer: This server, once it is listening
+        """
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="realtime-relay", daemon=True).start()
+        ready.wait()
+        return self
+
+    def _authorize(self, connection, request):
+        """Reject the handshake of pages from other origins or without a valid session credential"""
+        origin = request.headers.get("Origin")
+        if not is_origin_allowed(origin, request.headers.get("Host"), self.allowed_origins):
+            logger.warning(
+                f"Rejected relay connection from {connection.remote_address}: origin {origin}"
+            )
+            return connection.respond(HTTPStatus.FORBIDDEN, "Origin not allowed\n")
+        if self.credentials is None:
+            return None
+        credential = parse_qs(urlsplit(request.path).query).get("credential", [None])[0]
+        if self.credentials.verify(credential) is None:
+            logger.warning(
+                f"Rejected relay connection from {connection.remote_address}: invalid credential"
+            )
+            return connection.respond(
+                HTTPStatus.FORBIDDEN, "Invalid or expired session credential\n"
+            )
+        return None
+
+    async def _handle(self, page) -> None:
+        self.active_sessions += 1
+        session_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        set_correlation_id(session_id)
+        relay = RealtimeRelay(
+            self.api_key,
+            model=self.model,
+            url=self.url,
+            frame_pool=self.frame_pool
+        )
+        recorders = {}
+        if self.recording_dir is not None:
+            # Imported here so PyAV encoding is only loaded when recording
+            from recorder import open_session_recorder
+
+            for track in ("user", "assistant"):
+                recorders[track] = open_session_recorder(
+                    self.recording_dir,
+                    session_id,
+                    track,
+                    sample_rate=REALTIME_SAMPLE_RATE
+                )
+        if self.event_fixture_dir is not None:
+            from event_fixtures import open_event_recorder
+
+            recorders["events"] = open_event_recorder(self.event_fixture_dir, session_id)
+        try:
+            async with relay:
+                upstream = asyncio.create_task(
+                    self._forward_upstream(page, relay, recorders.get("user"))
+                )
+                downstream = asyncio.create_task(self._forward_downstream(
+                    page, relay, recorders.get("assistant"), recorders.get("events")
+                ))
+                # The session ends when the page leaves, the upstream closes
+                # or the audio sender dies
+                done, _ = await asyncio.wait(
+                    (upstream, downstream, relay.sender), return_when=asyncio.FIRST_COMPLETED
+                )
+                upstream.cancel()
+                downstream.cancel()
+                for task in done:
+                    if task is not relay.sender:
+                        task.result()
+                if relay.sender in done:
+                    logger.warning(
+                        f"Relay session {session_id} ended: upstream stopped accepting audio"
+                    )
+        except (ConnectionClosed, OSError) as error:
+            logger.warning(f"Relay session {session_id} ended: {error}")
+        finally:
+            self.active_sessions -= 1
+            for recorder in recorders.values():
+                await asyncio.to_thread(recorder.close)
+            logger.debug(f"Relay session {session_id} stats: {relay.stats}")
+
+    async def _forward_upstream(self, page, relay: RealtimeRelay, recorder=None) -> None:
+        preprocessor = None
+        if self.silence_threshold_db is not None:
+            # Imported here so the relay only needs NumPy filtering when gating
+            from preprocessing import AudioPreprocessor
+
+            preprocessor = AudioPreprocessor(
+                input_rate=REALTIME_SAMPLE_RATE,
+                output_rate=REALTIME_SAMPLE_RATE,
+                threshold_db=self.silence_threshold_db,
+                pool=self.frame_pool
+            )
+        async for message in page:
+            if isinstance(message, bytes):
+                if not message or len(message) % 2:
+                    logger.warning(
+                        f"Closing page that sent {len(message)} bytes of audio, not pcm16 samples"
+                    )
+                    await page.close(INVALID_AUDIO_CLOSE_CODE, "Audio must be pcm16 mono")
+                    break
+                if recorder is not None:
+                    recorder.write(message)
+                frame = pcm_audio_to_audio_frame(
+                    message, **REALTIME_AUDIO_FORMAT, pool=self.frame_pool
+                )
+                if preprocessor is None:
+                    await relay.send_audio(frame)
+                    continue
+                for gated in preprocessor.process(frame):
+                    await relay.send_audio(gated)
+                self.frame_pool.release(frame)
+            else:
+                event = json.loads(message)
+                if preprocessor is not None:
+                    self._follow_turn_detection(preprocessor, event)
+                await relay.send_event(event)
+        if preprocessor is not None:
+            relay.stats["audio_frames_trimmed"] = preprocessor.stats["frames_dropped"]
+        await relay.close()
+
+    @staticmethod
+    def _follow_turn_detection(preprocessor, event: dict) -> None:
+        """Keep the gate's hangover above the silence window the page configures for server VAD"""
+        if event.get("type") != "session.update":
+            return
+        turn_detection = (event.get("session") or {}).get("turn_detection") or {}
+        silence_ms = turn_detection.get("silence_duration_ms")
+        if isinstance(silence_ms, (int, float)):
+            preprocessor.hangover_ms = silence_ms + VAD_HANGOVER_MARGIN_MS
+
+    async def _forward_downstream(
+        self, page, relay: RealtimeRelay, recorder=None, event_recorder=None
+    ) -> None:
+        conversation = None
+        if self.context_token_budget is not None:
+            from conversation import ConversationStore
+
+            conversation = ConversationStore(token_budget=self.context_token_budget)
+        async for event in relay.events():
+            if event_recorder is not None:
+                event_recorder.write(event)
+            if event["type"] == "response.audio.delta":
+                pcm_audio = base64.b64decode(event["delta"])
+                relay.stats["audio_bytes_received"] += len(pcm_audio)
+                if recorder is not None:
+                    recorder.write(pcm_audio)
+                await page.send(pcm_audio)
+                continue
+
+            await page.send(json.dumps(event))
+            if conversation is not None:
+                for client_event in conversation.handle_event(event):
+                    await relay.send_event(client_event)
+                relay.stats["context_tokens"] = conversation.tokens
+                relay.stats["context_items_deleted"] = conversation.stats["items_deleted"]
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Run the Realtime relay as a standalone server")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default="gpt-4o-realtime-preview-2024-10-01")
+    parser.add_argument("--url", default=REALTIME_URL, help="Upstream Realtime WebSocket endpoint")
+    parser.add_argument("--recording-dir", default=None)
+    parser.add_argument("--silence-threshold-db", type=float, default=None,
+                        help="Trim microphone audio below this level (dBFS) instead of sending it")
+    parser.add_argument("--context-token-budget", type=int, default=None,
+                        help="Delete and summarize the oldest conversation items"
+                             " above this many tokens")
+    parser.add_argument("--allowed-origin", action="append", dest="allowed_origins",
+                        help="Origin pages may connect from (repeatable), or 'same-host' for pages "
+                             "served from the relay's hostname; any origin when omitted")
+    parser.add_argument("--event-fixture-dir", default=None,
+                        help="Record each session's server events to this directory "
+                             "as replayable fixtures")
+    args = parser.parse_args()
+
+    # Share CREDENTIAL_SECRET with the app so that its pages' credentials verify here
+    secret = os.environ.get("CREDENTIAL_SECRET")
+    credentials = SessionCredentials(secret) if secret else None
+
+    async def serve_forever():
+        server = RelayServer(
+            os.environ["OPENAI_API_KEY"],
+            model=args.model,
+            host=args.host,
+            port=args.port,
+            url=args.url,
+            recording_dir=args.recording_dir,
+            silence_threshold_db=args.silence_threshold_db,
+            context_token_budget=args.context_token_budget,
+            event_fixture_dir=args.event_fixture_dir,
+            credentials=credentials,
+            allowed_origins=args.allowed_origins
+        )
+        await server.start()
+        print(f"ws://{server.host}:{server.port}", flush=True)
+        await asyncio.Future()
+
+    asyncio.run(serve_forever())
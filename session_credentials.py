@@ -0,0 +1,111 @@
+"""
+Short-lived credentials that tie browser requests to a Streamlit session.
+
+The relay and the session token endpoint act with the server's API key, so
+they must only serve pages of this app. Every Streamlit session hands its
+page a credential through the component args. The credential names the
+session and its expiry and is signed with a secret, so a server can check
+it without sharing state with the Streamlit script.
+"""
+import hashlib
+import hmac
+import secrets
+import time
+from typing import Optional, Sequence, Union
+from urllib.parse import urlsplit
+
+# Allowed-origins entry that admits pages served from the host a request was sent to
+SAME_HOST = "same-host"
+
+
+class SessionCredentials:
+    """
+    Issues and verifies signed per-session credentials.
+
+    Processes that must accept each other's credentials, e.g. the app and
+    a standalone relay, need the same ``secret``.
+    """
+
+    def __init__(self, secret: Optional[Union[str, bytes]] = None, *, ttl: float = 3600.0):
+        """
+        Args:
+            secret (Union[str, bytes]): Signing secret; a random per-process secret when None
+            ttl (float): Seconds a credential stays valid
+        """
+        if isinstance(secret, str):
+            secret = secret.encode()
+        self.secret = secret or secrets.token_bytes(32)
+        self.ttl = ttl
+
+    def issue(self, session_id: str) -> str:
+        """
+        Issue a credential for a session.
+
+        Args:
+            session_id (str): Streamlit session ID
+
+        Returns:
+            str: Credential valid for ``ttl`` seconds
+        """
+        payload = f"{session_id}.{int(time.time() + self.ttl)}.{secrets.token_hex(8)}"
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, credential: Optional[str]) -> Optional[str]:
+        """
+        Check a credential's signature and expiry.
+
+        Args:
+            credential (str): Credential presented by a page
+
+        Returns:
+            str: ID of the session it was issued to, or None if it is invalid or expired
+        """
+        if not credential or credential.count(".") < 3:
+            return None
+        payload, signature = credential.rsplit(".", 1)
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        session_id, expires_at, _ = payload.rsplit(".", 2)
+        if not expires_at.isdigit() or int(expires_at) < time.time():
+            return None
+        return session_id
+
+    @staticmethod
+    def expires_at(credential: str) -> float:
+        """
+        Args:
+            credential (str): Credential issued by ``issue``
+
+        Returns:
+            float: Its expiry as a Unix timestamp
+        """
+        return float(credential.rsplit(".", 3)[1])
+
+    def _sign(self, payload: str) -> str:
+        return hmac.new(self.secret, payload.encode(), hashlib.sha256).hexdigest()
+
+
+def is_origin_allowed(
+    origin: Optional[str], host: Optional[str], allowed_origins: Optional[Sequence[str]]
+) -> bool:
+    """
+    Check a request's Origin header against an allowlist.
+
+    Args:
+        origin (str): Origin header of the request
+        host (str): Host header of the request
+        allowed_origins (Sequence[str]): Exact origins, or SAME_HOST for pages whose origin has
+            the hostname the request was sent to (on any port); any origin when None
+
+    Returns:
+        bool: Whether the request may proceed
+    """
+    if allowed_origins is None:
+        return True
+    if origin is None:
+        return False
+    if origin in allowed_origins:
+        return True
+    if SAME_HOST in allowed_origins and host:
+        return urlsplit(origin).hostname == urlsplit(f"//{host}").hostname
+    return False
@@ -0,0 +1,202 @@
+"""
+Process-wide registry of the browser sessions served by this Streamlit process.
+
+Every tab runs the script in its own session. The SessionManager, shared
+through ``st.cache_resource``, keeps track of which sessions are live and
+admits at most ``max_active`` of them at a time; the rest wait in a FIFO
+queue and are admitted as slots free up. An open tab that is not in a
+conversation does not keep its slot forever: it gives it up to a waiting
+session when its conversation stops, and after ``idle_timeout`` otherwise.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set
+
+import streamlit as st
+from st_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class SessionManager:
+    """
+    Tracks active and queued sessions and enforces a concurrency cap.
+
+    Active sessions keep their slot until they are released, ``is_alive``
+    reports them gone (e.g. the tab was closed), or they are idle: not in a
+    conversation (see ``set_conversation``) and not refreshed by
+    ``acquire`` for ``idle_timeout`` seconds. Queued sessions poll
+    ``acquire`` and lose their place if they stop polling for
+    ``queue_timeout`` seconds.
+    """
+
+    def __init__(
+        self,
+        max_active: Optional[int] = None,
+        *,
+        queue_timeout: float = 30.0,
+        idle_timeout: Optional[float] = None,
+        is_alive: Optional[Callable[[str], bool]] = None
+    ):
+        """
+        Args:
+            max_active (int): Maximum number of sessions admitted at once; unlimited when None
+            queue_timeout (float): Seconds after which a queued session that stopped polling
+                is dropped
+            idle_timeout (float): Seconds after which an active session outside a conversation
+                loses its slot; never when None
+            is_alive (Callable[[str], bool]): Returns whether a session is still connected
+        """
+        self.max_active = max_active
+        self.queue_timeout = queue_timeout
+        self.idle_timeout = idle_timeout
+        self.is_alive = is_alive
+        self.admitted = 0
+        self._active: Dict[str, float] = {}
+        self._queued: Dict[str, float] = OrderedDict()
+        self._conversing: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def acquire(self, session_id: str) -> int:
+        """
+        Admit a session if a slot is free, otherwise queue it.
+
+        Calling this again for an admitted or queued session is cheap and
+        refreshes it.
+
+        Args:
+            session_id (str): Streamlit session ID
+
+        Returns:
+            int: 0 once the session holds a slot, otherwise its 1-based queue position
+        """
+        now = time.monotonic()
+        with self._lock:
+            if session_id in self._active:
+                self._active[session_id] = now
+                return 0
+
+            self._prune(now)
+            self._queued[session_id] = now
+            if self.max_active is None:
+                free = len(self._queued)
+            else:
+                free = self.max_active - len(self._active)
+            position = list(self._queued).index(session_id)
+            if position < free:
+                del self._queued[session_id]
+                self._active[session_id] = now
+                self.admitted += 1
+                logger.debug(f"Session {session_id} admitted ({len(self._active)} active)")
+                return 0
+            return position + 1
+
+    def release(self, session_id: str) -> None:
+        """
+        Give up a session's slot or queue position.
+
+        Args:
+            session_id (str): Streamlit session ID
+        """
+        with self._lock:
+            self._active.pop(session_id, None)
+            self._queued.pop(session_id, None)
+            self._conversing.discard(session_id)
+
+    def set_conversation(self, session_id: str, running: bool) -> bool:
+        """
+        Record that an active session started or stopped a conversation.
+
+        A session in a conversation never goes idle. When it stops one
+        while other sessions are queued, its slot goes to the first of
+        them right away; otherwise it becomes idle from now.
+
+        Args:
+            session_id (str): Streamlit session ID
+            running (bool): Whether a conversation is now running
+
+        Returns:
+            bool: Whether the session gave up its slot
+        """
+        now = time.monotonic()
+        with self._lock:
+            if session_id not in self._active:
+                return False
+            self._active[session_id] = now
+            if running:
+                self._conversing.add(session_id)
+                return False
+            self._conversing.discard(session_id)
+            self._prune(now)
+            if not self._queued:
+                return False
+            del self._active[session_id]
+            logger.debug(f"Session {session_id} stopped its conversation and gave up its slot")
+            return True
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Active and queued session counts, the cap and total admissions
+        """
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                "active": len(self._active),
+                "queued": len(self._queued),
+                "max_active": self.max_active,
+                "admitted": self.admitted,
+            }
+
+    def _prune(self, now: float) -> None:
+        if self.is_alive is not None:
+            for session_id in [s for s in self._active if not self.is_alive(s)]:
+                del self._active[session_id]
+                self._conversing.discard(session_id)
+                logger.debug(f"Session {session_id} ended ({len(self._active)} active)")
+        if self.idle_timeout is not None:
+            idle_since = now - self.idle_timeout
+            idle = [
+                s for s, seen in self._active.items()
+                if seen < idle_since and s not in self._conversing
+            ]
+            for session_id in idle:
+                del self._active[session_id]
+                logger.debug(f"Session {session_id} idle, slot freed ({len(self._active)} active)")
+        deadline = now - self.queue_timeout
+        for session_id in [s for s, seen in self._queued.items() if seen < deadline]:
+            del self._queued[session_id]
+
+
+def _is_session_alive(session_id: str) -> bool:
+    from streamlit.runtime import Runtime
+
+    return not Runtime.exists() or Runtime.instance().is_active_session(session_id)
+
+
+@st.cache_resource
+def get_session_manager(
+    max_active: Optional[int] = None, idle_timeout: Optional[float] = None
+) -> SessionManager:
+    """
+    Return the process-wide session manager, shared by all sessions
+
+    Args:
+        max_active (int): Maximum number of sessions admitted at once; unlimited when None
+        idle_timeout (float): Seconds after which a session outside a conversation loses its slot
+
+    Returns:
+        SessionManager: Session manager
+    """
+    return SessionManager(max_active, idle_timeout=idle_timeout, is_alive=_is_session_alive)
+
+
+def get_session_id() -> str:
+    """
+    Returns:
+        str: ID of the Streamlit session running the current script
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    return get_script_run_ctx().session_id
@@ -0,0 +1,313 @@
+"""
+Ephemeral Realtime session tokens.
+
+The long-lived API key stays on the server; the browser only ever sees
+short-lived client secrets minted through the Realtime sessions endpoint.
+SessionTokenPool keeps a few tokens pre-minted so that a click on Start
+does not wait for a mint round trip to OpenAI. The HTTP endpoint only
+hands tokens to pages of this app: requests must come from an allowed
+origin and carry the page's session credential (see session_credentials.py).
+"""
+import json
+import threading
+import time
+import urllib.request
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, NamedTuple, Optional, Sequence
+
+from session_credentials import SessionCredentials, is_origin_allowed
+from st_utils import get_logger
+
+logger = get_logger(__name__)
+
+SESSIONS_URL = "https://api.openai.com/v1/realtime/sessions"
+CREDENTIAL_HEADER = "X-Session-Credential"
+
+# Errors of a failed mint: network failures and malformed responses
+MINT_ERRORS = (OSError, KeyError, TypeError, ValueError)
+
+
+class SessionToken(NamedTuple):
+    """A minted client secret and its expiry as a Unix timestamp"""
+    value: str
+    expires_at: float
+
+
+def mint_session_token(
+    api_key: str,
+    *,
+    model: str,
+    voice: str,
+    url: str = SESSIONS_URL,
+    timeout: float = 10.0
+) -> SessionToken:
+    """
+    Mint a short-lived client token for one Realtime session.
+
+    Args:
+        api_key (str): OpenAI API key
+        model (str): Realtime model name
+        voice (str): Assistant voice
+        url (str): Realtime sessions endpoint
+        timeout (float): Request timeout in seconds
+
+    Returns:
+        SessionToken: Minted token
+    """
+    request = urllib.request.Request(
+        url,
+        data=json.dumps({"model": model, "voice": voice}).encode(),
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        client_secret = json.load(response)["client_secret"]
+    return SessionToken(client_secret["value"], float(client_secret["expires_at"]))
+
+
+class SessionTokenPool:
+    """
+    Small pool of pre-minted session tokens, refreshed before they expire.
+
+    A background thread keeps ``size`` tokens ready while tokens are being
+    requested; after ``idle_timeout`` seconds without a request it stops
+    minting and lets the pool run dry until the next ``get``. Tokens are
+    handed out once each; ``get`` falls back to minting synchronously if the
+    pool is empty.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        model: str,
+        voice: str,
+        size: int = 2,
+        refresh_margin: float = 20.0,
+        idle_timeout: float = 300.0,
+        url: str = SESSIONS_URL
+    ):
+        """
+        Args:
+            api_key (str): OpenAI API key
+            model (str): Realtime model name
+            voice (str): Assistant voice
+            size (int): Number of tokens to keep ready
+            refresh_margin (float): Seconds before expiry at which a token is discarded
+            idle_timeout (float): Seconds without a request after which the pool stops refilling
+            url (str): Realtime sessions endpoint
+        """
+        self.api_key = api_key
+        self.model = model
+        self.voice = voice
+        self.size = size
+        self.refresh_margin = refresh_margin
+        self.idle_timeout = idle_timeout
+        self.url = url
+        # Pre-warm for the first visitor, as if a token had just been requested
+        self._last_request = time.monotonic()
+        self._tokens = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def start(self) -> "SessionTokenPool":
+        """
+        Start refilling the pool in a daemon thread.
+
+        Returns:
+            SessionTokenPool: This pool
+        """
+        threading.Thread(target=self._refill_loop, name="session-token-pool", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the refill thread"""
+        self._stopped.set()
+        self._wake.set()
+
+    def get(self) -> SessionToken:
+        """
+        Take a fresh token, minting one on the spot if none is ready.
+
+        Returns:
+            SessionToken: Token with at least ``refresh_margin`` seconds left
+        """
+        self._last_request = time.monotonic()
+        with self._lock:
+            self._discard_expiring()
+            token = self._tokens.popleft() if self._tokens else None
+        self._wake.set()
+        return token or self._mint()
+
+    def ready(self) -> int:
+        """
+        Returns:
+            int: Number of tokens currently ready
+        """
+        with self._lock:
+            self._discard_expiring()
+            return len(self._tokens)
+
+    def _mint(self) -> SessionToken:
+        return mint_session_token(self.api_key, model=self.model, voice=self.voice, url=self.url)
+
+    def _discard_expiring(self) -> None:
+        deadline = time.time() + self.refresh_margin
+        while self._tokens and self._tokens[0].expires_at <= deadline:
+            self._tokens.popleft()
+
+    def _refill_loop(self) -> None:
+        retry_delay = 1.0
+        while not self._stopped.is_set():
+            self._wake.clear()
+            idle_in = self._last_request + self.idle_timeout - time.monotonic()
+            if idle_in <= 0:
+                # Nobody asked for a token lately: mint nothing until get() wakes us
+                self._wake.wait()
+                continue
+            try:
+                while self.ready() < self.size:
+                    token = self._mint()
+                    with self._lock:
+                        self._tokens.append(token)
+                retry_delay = 1.0
+            except MINT_ERRORS as error:
+                logger.warning(f"Failed to mint session token: {error!r}")
+                self._wake.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, 30.0)
+                continue
+
+            with self._lock:
+                next_expiry = self._tokens[0].expires_at if self._tokens else time.time()
+            self._wake.wait(min(max(next_expiry - self.refresh_margin - time.time(), 0.1), idle_in))
+
+
+class _SessionTokenHandler(BaseHTTPRequestHandler):
+    pool: SessionTokenPool = None
+    credentials: SessionCredentials = None
+    allowed_origins: Optional[Sequence[str]] = None
+    max_tokens_per_minute: int = 10
+    # Times of the tokens handed to each session in the last minute
+    issued: Dict[str, Deque[float]] = None
+    issued_lock: threading.Lock = None
+
+    def do_OPTIONS(self):
+        # CORS preflight for the credential header
+        if not self._origin_allowed():
+            self._respond(403, {"error": "origin_not_allowed"})
+            return
+        self.send_response(204)
+        self._send_cors_headers()
+        self.send_header("Access-Control-Allow-Methods", "GET")
+        self.send_header("Access-Control-Allow-Headers", CREDENTIAL_HEADER)
+        self.send_header("Access-Control-Max-Age", "600")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if not self._origin_allowed():
+            self._respond(403, {"error": "origin_not_allowed"})
+            return
+        session_id = self.credentials.verify(self.headers.get(CREDENTIAL_HEADER))
+        if session_id is None:
+            self._respond(401, {"error": "invalid_credential"})
+            return
+        if not self._take_quota(session_id):
+            logger.warning(
+                f"Session {session_id} exceeded {self.max_tokens_per_minute} tokens per minute"
+            )
+            self._respond(429, {"error": "too_many_tokens"})
+            return
+        try:
+            token = self.pool.get()
+        except MINT_ERRORS as error:
+            logger.error(f"Failed to mint session token: {error!r}")
+            self._respond(502, {"error": "token_unavailable"})
+        else:
+            logger.debug(f"Issued a session token to session {session_id}")
+            self._respond(200, token._asdict())
+
+    def _origin_allowed(self) -> bool:
+        return is_origin_allowed(
+            self.headers.get("Origin"), self.headers.get("Host"), self.allowed_origins
+        )
+
+    def _take_quota(self, session_id: str) -> bool:
+        now = time.monotonic()
+        with self.issued_lock:
+            times = self.issued[session_id]
+            while times and times[0] < now - 60:
+                times.popleft()
+            if len(times) >= self.max_tokens_per_minute:
+                return False
+            times.append(now)
+            # Forget sessions without recent tokens
+            for stale in [s for s, t in self.issued.items() if t[-1] < now - 60]:
+                del self.issued[stale]
+            return True
+
+    def _send_cors_headers(self) -> None:
+        # The page is served from the Streamlit origin, not this one
+        origin = self.headers.get("Origin")
+        if origin is not None and self._origin_allowed():
+            self.send_header("Access-Control-Allow-Origin", origin)
+        self.send_header("Vary", "Origin")
+
+    def _respond(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Cache-Control", "no-store")
+        self._send_cors_headers()
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def serve_session_tokens(
+    pool: SessionTokenPool,
+    credentials: SessionCredentials,
+    *,
+    allowed_origins: Optional[Sequence[str]] = None,
+    max_tokens_per_minute: int = 10,
+    host: str = "localhost",
+    port: int = 8766
+) -> ThreadingHTTPServer:
+    """
+    Serve tokens from a pool over HTTP (GET returns one token as JSON) in a daemon thread.
+
+    A request must carry a valid session credential in the
+    X-Session-Credential header and come from an allowed origin.
+
+    Args:
+        pool (SessionTokenPool): Pool to take tokens from
+        credentials (SessionCredentials): Verifies the credentials of requesting pages
+        allowed_origins (Sequence[str]): Origins pages may request tokens from, or
+            session_credentials.SAME_HOST; any origin when None
+        max_tokens_per_minute (int): Tokens handed to one session per minute at most
+        host (str): Interface to listen on
+        port (int): Port to listen on (0 picks a free port)
+
+    Returns:
+        ThreadingHTTPServer: Running server
+    """
+    handler = type("SessionTokenHandler", (_SessionTokenHandler,), {
+        "pool": pool,
+        "credentials": credentials,
+        "allowed_origins": allowed_origins,
+        "max_tokens_per_minute": max_tokens_per_minute,
+        "issued": defaultdict(deque),
+        "issued_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="session-token-server", daemon=True).start()
+    return server
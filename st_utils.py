@@ -1,27 +1,173 @@
+import contextvars
+import copy
+import itertools
+import json
 import logging
-import streamlit as st
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, TextIO
 
-@st.cache_resource
-def get_logger(name: str, level: int = logging.DEBUG) -> logging.Logger:
+# Logging is configured through environment variables; Streamlit also
+# exports top-level secrets.toml keys as environment variables, so these
+# can be set there as well:
+#   LOG_LEVEL         level of the app loggers (default: DEBUG)
+#   LOG_FORMAT        "text" or "json" (default: text)
+#   LOG_ASYNC         write from a background thread (default: true)
+#   LOG_SAMPLE_EVERY  keep one in every N DEBUG records (default: 1, all)
+LOG_TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s'
+
+_correlation_id = contextvars.ContextVar("correlation_id", default="-")
+_handler = None
+_exception_formatter = logging.Formatter()
+
+
+def set_correlation_id(value: str) -> None:
+    """
+    Tag the log records of the current thread or task with an ID, e.g. the session ID
+
+    Asyncio tasks created afterwards inherit the ID.
+
+    Args:
+        value (str): Correlation ID
     """
-    Create and return a cached logger instance
+    _correlation_id.set(value)
+
+
+class _ContextFilter(logging.Filter):
+    """Adds the correlation ID and drops all but one in every ``sample_every`` DEBUG records"""
+
+    def __init__(self, sample_every: int = 1):
+        super().__init__()
+        self.sample_every = sample_every
+        self._debug_count = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and self.sample_every > 1:
+            if next(self._debug_count) % self.sample_every:
+                return False
+        record.correlation_id = _correlation_id.get()
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    """
+    QueueHandler that owns its listener and drains it on close
+    (logging.shutdown closes it at exit)
+    """
+
+    def __init__(self, records: queue.SimpleQueue, listener: QueueListener):
+        super().__init__(records)
+        self.listener = listener
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments and render the traceback now, but leave
+        # formatting to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self) -> None:
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        super().close()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "session": getattr(record, "correlation_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry)
+
+
+def create_log_handler(
+    stream: Optional[TextIO] = None,
+    *,
+    use_queue: bool = True,
+    json_format: bool = False,
+    sample_every: int = 1
+) -> logging.Handler:
+    """
+    Create a log handler writing to a stream, optionally through a background thread
+
+    With ``use_queue`` the calling thread only puts records on a queue; a
+    QueueListener thread formats and writes them, so a slow or blocked
+    stream never stalls the Streamlit script thread.
+
+    Args:
+        stream (TextIO): Output stream (default: stderr)
+        use_queue (bool): Write from a background thread
+        json_format (bool): Emit one JSON object per record instead of text
+        sample_every (int): Keep one in every N DEBUG records
+
+    Returns:
+        logging.Handler: Handler to attach to loggers
+    """
+    stream_handler = logging.StreamHandler(stream)
+    formatter = JsonFormatter() if json_format else logging.Formatter(LOG_TEXT_FORMAT)
+    stream_handler.setFormatter(formatter)
+
+    if use_queue:
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, stream_handler)
+        listener.start()
+        handler = _QueueHandler(records, listener)
+    else:
+        handler = stream_handler
+    handler.addFilter(_ContextFilter(sample_every))
+    return handler
+
+
+def _get_handler() -> logging.Handler:
+    global _handler
+    if _handler is None:
+        _handler = create_log_handler(
+            use_queue=os.environ.get("LOG_ASYNC", "true").lower() not in ("0", "false", "no"),
+            json_format=os.environ.get("LOG_FORMAT", "text").lower() == "json",
+            sample_every=max(int(os.environ.get("LOG_SAMPLE_EVERY", 1)), 1),
+        )
+    return _handler
+
+
+def get_logger(name: str, level: Optional[int] = None) -> logging.Logger:
+    """
+    Create and return a configured logger instance
+
+    The logging module already keeps one logger per name and a handler is
+    only attached once, so repeated calls (e.g. on every rerun) are cheap.
+    All app loggers share one handler, which by default writes from a
+    background thread (see create_log_handler). This module deliberately
+    does not import Streamlit, so that the relay and other helpers can log
+    without loading it.
 
     Args:
         name (str): Logger name
-        level (int): Logging level (default: DEBUG)
+        level (int): Logging level (default: LOG_LEVEL, or DEBUG)
 
     Returns:
         logging.Logger: Configured logger instance
     """
     logger = logging.getLogger(name)
-    logger.setLevel(level)
+    logger.setLevel(level if level is not None else os.environ.get("LOG_LEVEL", "DEBUG").upper())
 
     # Add handler if none exists
     if not logger.handlers:
-        handler = logging.StreamHandler()
-        handler.setLevel(level)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        logger.addHandler(_get_handler())
 
     return logger
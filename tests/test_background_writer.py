@@ -0,0 +1,83 @@
+"""
+Tests for the bounded-queue background writer behind the recorders and the
+transcript store.
+"""
+import threading
+
+import pytest
+
+from background_writer import BackgroundWriter
+
+
+class ListWriter(BackgroundWriter):
+    """Collects batches in memory, failing on an item equal to ``fail_on``"""
+
+    def __init__(self, *, max_pending=100, max_batch=1, interval=0.0, fail_on=None):
+        super().__init__("list", max_pending=max_pending)
+        self.max_batch = max_batch
+        self.interval = interval
+        self.fail_on = fail_on
+        self.batches = []
+
+    def _write(self):
+        for batch in self._batches(self.max_batch, self.interval):
+            if self.fail_on in batch:
+                raise RuntimeError(f"cannot write {self.fail_on}")
+            self.batches.append(batch)
+
+
+def test_writes_items_in_order_until_close():
+    with ListWriter() as writer:
+        for item in range(10):
+            assert writer._put(item)
+
+    assert writer.batches == [[item] for item in range(10)]
+    assert writer.pending == 0
+
+
+def test_batches_collect_up_to_max_batch():
+    writer = ListWriter(max_batch=4, interval=60)
+    for item in range(10):
+        writer._put(item)
+    # Without close the last batch would wait out the interval
+    writer.start().close()
+
+    assert writer.batches == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_full_queue_drops_and_counts_items():
+    writer = ListWriter(max_pending=2)
+    results = [writer._put(item) for item in range(5)]
+
+    assert results == [True, True, False, False, False]
+    assert writer.dropped == 3
+    writer.start().close()
+    assert writer.batches == [[0], [1]]
+
+
+def test_failure_is_raised_from_close_and_flush_does_not_hang():
+    writer = ListWriter(fail_on=3).start()
+    for item in range(10):
+        writer._put(item)
+    flushed = threading.Thread(target=writer.flush, daemon=True)
+    flushed.start()
+    flushed.join(timeout=5)
+
+    assert not flushed.is_alive()
+    # Later items are discarded, and writing them never blocks
+    assert writer._put(11)
+    with pytest.raises(RuntimeError, match="cannot write 3"):
+        writer.close()
+    assert writer.batches == [[0], [1], [2]]
+
+
+def test_failure_after_close_is_raised():
+    class FinalizeFails(ListWriter):
+        def _write(self):
+            super()._write()
+            raise OSError("disk full")
+
+    writer = FinalizeFails().start()
+    writer._put(1)
+    with pytest.raises(OSError, match="disk full"):
+        writer.close()
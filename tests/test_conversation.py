@@ -0,0 +1,158 @@
+"""
+Tests for the conversation store and its context token budget.
+
+``benchmarks.py conversation`` reports the numbers for hour-long sessions;
+these tests pin down the budget and eviction rules behind them.
+"""
+from typing import List
+
+import pytest
+
+from benchmarks import _synthetic_session_events
+from conversation import SUMMARY_ITEM_PREFIX, ConversationStore
+
+MESSAGE = "The patient reports dull pain under the right ribs since last week. " * 3
+
+
+def message_created(item_id: str, role: str, text: str = MESSAGE) -> dict:
+    content_type = "input_text" if role == "user" else "text"
+    return {
+        "type": "conversation.item.created",
+        "item": {
+            "id": item_id,
+            "type": "message",
+            "role": role,
+            "content": [{"type": content_type, "text": text}],
+        },
+    }
+
+
+def response_done(item_id: str, text: str = MESSAGE) -> dict:
+    output = {"id": item_id, "content": [{"type": "text", "text": text}]}
+    return {"type": "response.done", "response": {"status": "completed", "output": [output]}}
+
+
+def handle(store: ConversationStore, event: dict) -> List[dict]:
+    """Feed an event to the store and answer its client events like the server would"""
+    sent = store.handle_event(event)
+    for client_event in list(sent):
+        if client_event["type"] == "conversation.item.delete":
+            deleted = {"type": "conversation.item.deleted", "item_id": client_event["item_id"]}
+            store.handle_event(deleted)
+        else:
+            store.handle_event({"type": "conversation.item.created", "item": client_event["item"]})
+    return sent
+
+
+def converse(store: ConversationStore, turns: int) -> List[str]:
+    """Play user and assistant turns, checking the budget after every response"""
+    deleted = []
+    for turn in range(turns):
+        handle(store, message_created(f"user_{turn}", "user"))
+        handle(store, message_created(f"assistant_{turn}", "assistant"))
+        sent = handle(store, response_done(f"assistant_{turn}"))
+        deleted.extend(e["item_id"] for e in sent if e["type"] == "conversation.item.delete")
+        if store.token_budget is not None:
+            assert store.tokens <= store.token_budget
+    return deleted
+
+
+def test_unbounded_store_keeps_every_item():
+    store = ConversationStore()
+    assert converse(store, 20) == []
+    assert len(store) == 40
+    assert store.tokens == sum(item.tokens for item in store)
+
+
+def test_budget_is_respected_after_every_response():
+    store = ConversationStore(token_budget=600, summarize=None)
+    deleted = converse(store, 30)
+
+    assert deleted
+    assert store.stats["truncations"] > 0
+    assert store.tokens == sum(item.tokens for item in store)
+    # Truncation goes below the budget, so it does not run on every response
+    assert store.stats["truncations"] < 30
+
+
+def test_budget_holds_over_a_one_hour_session():
+    budget = 16000
+    store = ConversationStore(token_budget=budget)
+    unbounded = ConversationStore()
+    peak_tokens = 0
+    item_counts = []
+    for event in _synthetic_session_events(60):
+        unbounded.handle_event(event)
+        handle(store, event)
+        peak_tokens = max(peak_tokens, store.tokens)
+        if event["type"] == "response.done":
+            assert store.tokens <= budget
+            item_counts.append(len(store))
+
+    assert len(item_counts) > 200
+    assert unbounded.tokens > 3 * budget
+    # Between responses the context only grows by the turn in progress
+    assert peak_tokens <= budget * 1.05
+    # The item count levels off instead of growing with the session
+    assert max(item_counts) < len(unbounded) / 3
+    half = len(item_counts) // 2
+    assert max(item_counts[half:]) <= max(item_counts[:half]) + store.keep_last
+    assert store.tokens == store.summary.tokens + sum(item.tokens for item in store)
+
+
+def test_eviction_is_oldest_first_and_keeps_the_last_items():
+    store = ConversationStore(token_budget=600, keep_last=4, summarize=None)
+    deleted = converse(store, 30)
+
+    ids = [f"{role}_{turn}" for turn in range(30) for role in ("user", "assistant")]
+    assert deleted == ids[:len(deleted)]
+    remaining = [item.item_id for item in store]
+    assert remaining == ids[len(deleted):]
+    assert len(remaining) >= store.keep_last
+
+
+def test_keep_last_wins_over_the_budget():
+    store = ConversationStore(token_budget=10, keep_last=2, summarize=None)
+    handle(store, message_created("user_0", "user"))
+    handle(store, message_created("assistant_0", "assistant"))
+    sent = handle(store, response_done("assistant_0"))
+
+    assert sent == []
+    assert [item.item_id for item in store] == ["user_0", "assistant_0"]
+    assert store.tokens > store.token_budget
+
+
+def test_summary_of_deleted_items_replaces_the_previous_one():
+    store = ConversationStore(token_budget=1500, keep_last=4)
+    converse(store, 40)
+
+    assert store.summary is not None
+    assert store.summary.item_id.startswith(SUMMARY_ITEM_PREFIX)
+    assert store.summary.role == "system"
+    # Only the latest summary is in the context, outside the ring of items
+    assert all(not item.item_id.startswith(SUMMARY_ITEM_PREFIX) for item in store)
+    assert store.tokens == store.summary.tokens + sum(item.tokens for item in store)
+
+
+def test_full_store_deletes_a_batch_of_the_oldest_items():
+    store = ConversationStore(capacity=10, keep_last=2, target_ratio=0.5, summarize=None)
+    for index in range(10):
+        assert store.handle_event(message_created(f"item_{index}", "user", "hello")) == []
+    sent = store.handle_event(message_created("item_10", "user", "hello"))
+
+    assert [event["item_id"] for event in sent] == [f"item_{index}" for index in range(5)]
+    assert [item.item_id for item in store] == [f"item_{index}" for index in range(5, 11)]
+
+
+def test_deleted_confirmations_for_deleted_items_are_no_ops():
+    store = ConversationStore(token_budget=600, summarize=None)
+    converse(store, 30)
+    tokens, items = store.tokens, len(store)
+
+    store.handle_event({"type": "conversation.item.deleted", "item_id": "user_0"})
+    assert (store.tokens, len(store)) == (tokens, items)
+
+
+def test_capacity_must_exceed_keep_last():
+    with pytest.raises(ValueError):
+        ConversationStore(capacity=4, keep_last=4)
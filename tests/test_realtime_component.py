@@ -0,0 +1,43 @@
+"""
+Tests for the client component build.
+"""
+import tempfile
+from pathlib import Path
+
+import realtime_component
+from realtime_component import BUNDLES, build_component
+
+
+def test_bundles_are_content_hashed_and_old_ones_removed(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    (source / "index.html").write_text(
+        '<script src="realtime_voice.js"></script><link href="realtime_voice.css">'
+    )
+    for name in BUNDLES:
+        (source / name).write_text(f"/* {name} v1 */")
+    build = build_component(source, tmp_path / "build")
+    first = sorted(path.name for path in build.iterdir())
+
+    (source / "realtime_voice.js").write_text("/* realtime_voice.js v2 */")
+    build_component(source, build)
+    second = sorted(path.name for path in build.iterdir())
+
+    assert len(first) == len(second) == 3
+    first_scripts = [name for name in first if name.endswith(".js")]
+    assert [name for name in second if name.endswith(".js")] != first_scripts
+    index = (build / "index.html").read_text()
+    assert all(name in index for name in second if name != "index.html")
+
+
+def test_unwritable_build_dir_falls_back_to_a_temp_dir(monkeypatch, tmp_path):
+    # A path below a regular file cannot be created, like a read-only deploy
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    monkeypatch.setattr(realtime_component, "BUILD_DIR", blocker / "build")
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    build = realtime_component._build_or_fall_back()
+
+    assert Path(build).parent == tmp_path
+    assert (Path(build) / "index.html").exists()
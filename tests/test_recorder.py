@@ -0,0 +1,100 @@
+"""
+Tests for the streaming session recorder.
+
+Throughput and memory numbers are measured by ``benchmarks.py recording``;
+these tests pin down the behavior behind them.
+"""
+import time
+import tracemalloc
+
+import pytest
+
+av = pytest.importorskip("av")
+
+from recorder import SessionRecorder
+
+SAMPLE_RATE = 24000
+# 20 ms of pcm16 mono audio
+CHUNK = b"\x00\x10" * (SAMPLE_RATE // 50)
+
+
+def decoded_samples(path) -> int:
+    with av.open(str(path)) as container:
+        return sum(frame.samples for frame in container.decode(audio=0))
+
+
+@pytest.mark.parametrize("suffix", [".wav", ".ogg"])
+def test_writes_every_chunk(tmp_path, suffix):
+    path = tmp_path / f"session{suffix}"
+    with SessionRecorder(path, sample_rate=SAMPLE_RATE) as recorder:
+        for _ in range(50):
+            assert recorder.write(CHUNK)
+
+    assert recorder.dropped_chunks == 0
+    assert recorder.samples_written == 50 * SAMPLE_RATE // 50
+    if suffix == ".wav":
+        assert decoded_samples(path) == SAMPLE_RATE
+    else:
+        # Opus is resampled to 48 kHz and padded to whole frames
+        assert decoded_samples(path) >= 2 * SAMPLE_RATE
+
+
+def test_queue_is_bounded_when_writer_falls_behind(tmp_path):
+    recorder = SessionRecorder(tmp_path / "session.wav", sample_rate=SAMPLE_RATE, max_pending=3)
+    # Without a running writer nothing is consumed, as if encoding stalled
+    results = [recorder.write(CHUNK) for _ in range(10)]
+
+    assert results == [True] * 3 + [False] * 7
+    assert recorder.pending == 3
+    assert recorder.dropped_chunks == 7
+
+    recorder.start()
+    recorder.close()
+    assert recorder.pending == 0
+    assert recorder.samples_written == 3 * len(CHUNK) // 2
+
+
+def test_rejects_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        SessionRecorder(tmp_path / "session.mp3")
+
+
+def test_close_without_start_is_a_no_op(tmp_path):
+    recorder = SessionRecorder(tmp_path / "session.wav")
+    recorder.close()
+    assert not (tmp_path / "session.wav").exists()
+
+
+def test_memory_stays_flat_over_a_long_recording(tmp_path):
+    # Chunks of 20 to 35 ms, like assistant deltas of varying length
+    chunks = [b"\x00\x10" * (480 + 30 * step) for step in range(13)]
+    max_pending = 50
+    recorder = SessionRecorder(
+        tmp_path / "long.wav", sample_rate=SAMPLE_RATE, max_pending=max_pending
+    ).start()
+
+    tracemalloc.start()
+    try:
+        traced = []
+        deepest = 0
+        samples = 0
+        # Ten minutes of audio
+        for minute in range(10):
+            while samples < (minute + 1) * 60 * SAMPLE_RATE:
+                chunk = chunks[samples % len(chunks)]
+                while recorder.pending >= max_pending:
+                    # Pace like a real-time stream instead of dropping audio
+                    time.sleep(0.001)
+                assert recorder.write(chunk)
+                samples += len(chunk) // 2
+                deepest = max(deepest, recorder.pending)
+            traced.append(tracemalloc.get_traced_memory()[0])
+        recorder.close()
+    finally:
+        tracemalloc.stop()
+
+    assert recorder.samples_written == samples
+    assert deepest <= max_pending
+    assert recorder.frame_pool.idle_frames <= recorder.frame_pool.max_frames
+    # Memory after the first minute does not grow with the length of the recording
+    assert max(traced[1:]) - traced[0] < 1024 * 1024
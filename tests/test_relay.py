@@ -0,0 +1,175 @@
+"""
+Tests for the Realtime relay against the local fake Realtime server.
+
+``benchmarks.py load`` reports the relay's throughput and resource use;
+these tests pin down what it accepts, forwards and tears down.
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+
+pytest.importorskip("av")
+pytest.importorskip("websockets")
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidStatus
+
+from fake_realtime import FAKE_TRANSCRIPT, FakeRealtimeServer
+from relay import INVALID_AUDIO_CLOSE_CODE, RelayServer
+from session_credentials import SAME_HOST, SessionCredentials
+
+ORIGIN = "https://app.example"
+# 20 ms of pcm16 mono audio at 24 kHz
+SPEECH = b"\x00\x10" * 480
+
+
+@asynccontextmanager
+async def running_relay(**kwargs):
+    async with FakeRealtimeServer(api_key="sk-test") as fake:
+        server = RelayServer("sk-test", model="test-model", port=0, url=fake.url, **kwargs)
+        await server.start()
+        try:
+            yield fake, server
+        finally:
+            await server.stop()
+
+
+async def receive_until(page, event_type: str):
+    """Collect the page's JSON events and audio bytes up to an event of ``event_type``"""
+    events, audio_bytes = [], 0
+    while not events or events[-1]["type"] != event_type:
+        message = await asyncio.wait_for(page.recv(), timeout=5)
+        if isinstance(message, bytes):
+            audio_bytes += len(message)
+        else:
+            events.append(json.loads(message))
+    return events, audio_bytes
+
+
+async def wait_for(condition, timeout: float = 5.0) -> None:
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+@pytest.mark.parametrize("query", ["", "?credential=", "?credential=forged.123.abc.def"])
+def test_rejects_pages_without_a_valid_credential(query):
+    async def scenario():
+        credentials = SessionCredentials("secret")
+        async with running_relay(credentials=credentials) as (_, server):
+            with pytest.raises(InvalidStatus) as rejected:
+                async with connect(f"ws://localhost:{server.port}/{query}"):
+                    pass
+            assert rejected.value.response.status_code == 403
+            assert server.active_sessions == 0
+
+    asyncio.run(scenario())
+
+
+def test_accepts_a_credential_issued_with_the_same_secret():
+    async def scenario():
+        credential = SessionCredentials("secret").issue("session-1")
+        async with running_relay(credentials=SessionCredentials("secret")) as (_, server):
+            async with connect(f"ws://localhost:{server.port}/?credential={credential}") as page:
+                events, _ = await receive_until(page, "session.created")
+                assert events[-1]["type"] == "session.created"
+
+    asyncio.run(scenario())
+
+
+def test_rejects_pages_from_other_origins():
+    async def scenario():
+        async with running_relay(allowed_origins=[ORIGIN]) as (_, server):
+            with pytest.raises(InvalidStatus) as rejected:
+                async with connect(f"ws://localhost:{server.port}", origin="https://evil.example"):
+                    pass
+            assert rejected.value.response.status_code == 403
+
+            async with connect(f"ws://localhost:{server.port}", origin=ORIGIN) as page:
+                await receive_until(page, "session.created")
+
+    asyncio.run(scenario())
+
+
+def test_same_host_checks_each_origin_against_the_request_host():
+    async def scenario():
+        async with running_relay(allowed_origins=[SAME_HOST]) as (_, server):
+            for origin in ("https://evil.example", "http://localhost.evil.example"):
+                with pytest.raises(InvalidStatus):
+                    async with connect(f"ws://localhost:{server.port}", origin=origin):
+                        pass
+            # The app is served from another port of the host the relay is reached at
+            app_origin = "http://localhost:8501"
+            async with connect(f"ws://localhost:{server.port}", origin=app_origin) as page:
+                await receive_until(page, "session.created")
+
+    asyncio.run(scenario())
+
+
+def test_forwards_events_and_audio_both_ways():
+    async def scenario():
+        async with running_relay() as (fake, server):
+            async with connect(f"ws://localhost:{server.port}") as page:
+                await receive_until(page, "session.created")
+                update = {"type": "session.update", "session": {"voice": "alloy"}}
+                await page.send(json.dumps(update))
+                events, _ = await receive_until(page, "session.updated")
+                assert events[-1]["session"] == {"voice": "alloy"}
+
+                for _ in range(10):
+                    await page.send(SPEECH)
+                await wait_for(lambda: fake.received_audio_bytes == 10 * len(SPEECH))
+                received_types = {e["type"] for e in fake.received_events}
+                assert "input_audio_buffer.append" in received_types
+
+                await page.send(json.dumps({"type": "response.create"}))
+                events, audio_bytes = await receive_until(page, "response.done")
+                # The fake answers with 200 ms of 24 kHz pcm16, relayed as binary messages
+                assert audio_bytes == 24000 * 2 // 5
+                assert "response.audio.delta" not in {e["type"] for e in events}
+                content = events[-1]["response"]["output"][0]["content"][0]
+                assert content["transcript"] == FAKE_TRANSCRIPT
+
+    asyncio.run(scenario())
+
+
+def test_closes_the_page_when_the_upstream_closes():
+    async def scenario():
+        fake = FakeRealtimeServer(api_key="sk-test")
+        await fake.__aenter__()
+        server = RelayServer("sk-test", model="test-model", port=0, url=fake.url)
+        await server.start()
+        try:
+            async with connect(f"ws://localhost:{server.port}") as page:
+                await receive_until(page, "session.created")
+                await fake.__aexit__(None, None, None)
+                with pytest.raises(ConnectionClosed):
+                    await asyncio.wait_for(page.recv(), timeout=5)
+            await wait_for(lambda: server.active_sessions == 0)
+        finally:
+            await server.stop()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize(
+    "audio", [b"\x00", b"\x00" * 961, b""], ids=["one byte", "odd length", "empty"]
+)
+def test_closes_the_page_on_audio_that_is_not_pcm16(audio):
+    async def scenario():
+        async with running_relay() as (fake, server):
+            async with connect(f"ws://localhost:{server.port}") as page:
+                await receive_until(page, "session.created")
+                await page.send(audio)
+                with pytest.raises(ConnectionClosed) as closed:
+                    while True:
+                        await asyncio.wait_for(page.recv(), timeout=5)
+                assert closed.value.rcvd.code == INVALID_AUDIO_CLOSE_CODE
+            await wait_for(lambda: server.active_sessions == 0)
+            assert fake.received_audio_bytes == 0
+
+    asyncio.run(scenario())
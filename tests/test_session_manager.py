@@ -0,0 +1,34 @@
+"""
+Tests for the process-wide session registry and its concurrency cap.
+"""
+from session_manager import SessionManager
+
+
+def manager(max_active: int = 1) -> SessionManager:
+    return SessionManager(max_active=max_active, is_alive=lambda session_id: True)
+
+
+def test_ending_a_conversation_keeps_the_slot_when_no_one_waits():
+    sessions = manager()
+    assert sessions.acquire("a") == 0
+    assert not sessions.set_conversation("a", True)
+    assert not sessions.set_conversation("a", False)
+
+    assert sessions.stats()["active"] == 1
+
+
+def test_ending_a_conversation_hands_the_slot_to_the_first_queued_session():
+    sessions = manager()
+    sessions.acquire("a")
+    sessions.set_conversation("a", True)
+    assert sessions.acquire("b") == 1
+
+    assert sessions.set_conversation("a", False)
+    assert sessions.acquire("b") == 0
+    # The released session queues behind everyone else on its next rerun
+    assert sessions.acquire("a") == 1
+
+
+def test_sessions_without_a_slot_are_ignored():
+    sessions = manager()
+    assert not sessions.set_conversation("unknown", False)
@@ -0,0 +1,57 @@
+"""
+Tests for the audio frame helpers.
+"""
+import pytest
+
+pytest.importorskip("av")
+
+from utils import AudioFramePool, audio_frame_to_pcm_audio
+
+FORMAT = dict(format="s16", layout="mono", sample_rate=24000)
+
+
+def test_released_frames_are_reused():
+    pool = AudioFramePool()
+    frame = pool.fill(b"\x01\x00" * 480, **FORMAT)
+    pool.release(frame)
+
+    again = pool.fill(b"\x02\x00" * 480, **FORMAT)
+    assert again is frame
+    assert audio_frame_to_pcm_audio(again) == b"\x02\x00" * 480
+    assert pool.idle_frames == 0
+
+
+def test_idle_frames_per_shape_are_capped():
+    pool = AudioFramePool(max_frames_per_key=2)
+    frames = [pool.acquire(samples=480, **FORMAT) for _ in range(5)]
+    for frame in frames:
+        pool.release(frame)
+
+    assert pool.idle_frames == 2
+
+
+def test_variable_sizes_do_not_grow_the_pool():
+    # Like assistant deltas, every chunk has a different length
+    pool = AudioFramePool(max_frames_per_key=4, max_frames=16)
+    for samples in range(100, 1100):
+        pool.release(pool.fill(b"\x00\x00" * samples, **FORMAT))
+
+    assert pool.idle_frames == 16
+    assert pool.shapes == 16
+
+
+def test_least_recently_used_shapes_are_evicted_first():
+    pool = AudioFramePool(max_frames=2)
+    small, medium, large = (
+        pool.acquire(format="s16", layout="mono", samples=samples, sample_rate=24000)
+        for samples in (100, 200, 300)
+    )
+    pool.release(small)
+    pool.release(medium)
+    # Reusing the small shape makes the medium one the least recently used
+    pool.release(pool.acquire(format="s16", layout="mono", samples=100, sample_rate=24000))
+    pool.release(large)
+
+    assert pool.acquire(format="s16", layout="mono", samples=100, sample_rate=24000) is small
+    assert pool.acquire(format="s16", layout="mono", samples=300, sample_rate=24000) is large
+    assert pool.acquire(format="s16", layout="mono", samples=200, sample_rate=24000) is not medium
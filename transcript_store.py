@@ -0,0 +1,240 @@
+"""
+Append-only store for the transcripts of all sessions.
+
+The client reports each finished user and assistant message. The script
+thread only queues it; a background writer thread inserts queued messages
+into SQLite in batches, one transaction per batch, so the script never
+waits on disk. A message whose text changes later (e.g. a second
+transcription of the same user turn) is appended again; queries return
+the latest version of each message.
+"""
+import atexit
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import List, Optional, Union
+
+import streamlit as st
+from background_writer import BackgroundWriter
+from st_utils import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcript (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    entry_index INTEGER NOT NULL,
+    case_id TEXT,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    client_time TEXT,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcript_session ON transcript (session_id, page_id, entry_index);
+"""
+
+# Latest version of every message of a session, in the order the messages started
+_SESSION_QUERY = """
+SELECT t.page_id, t.entry_index, t.case_id, t.role, t.text, t.client_time
+FROM transcript t
+JOIN (
+    SELECT MIN(id) AS first_id, MAX(id) AS last_id
+    FROM transcript
+    WHERE session_id = ?
+    GROUP BY page_id, entry_index
+) versions ON t.id = versions.last_id
+ORDER BY versions.first_id
+"""
+
+# One row per session, most recently active first; filters are added by list_sessions
+_SESSIONS_QUERY = """
+SELECT session_id, MAX(case_id) AS case_id, MIN(stored_at) AS started_at,
+    MAX(stored_at) AS last_stored_at, COUNT(DISTINCT page_id || '/' || entry_index) AS messages
+FROM transcript
+{where}
+GROUP BY session_id
+{having}
+ORDER BY last_stored_at DESC
+"""
+
+
+class TranscriptStore(BackgroundWriter):
+    """
+    SQLite transcript store with a batching background writer.
+
+    ``append`` never blocks the caller: when more than ``max_pending``
+    messages wait for the writer, new ones are dropped and counted in
+    ``dropped_messages`` rather than growing memory.
+    """
+
+    thread_name = "transcripts"
+    item_name = "messages"
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        *,
+        flush_interval: float = 1.0,
+        max_batch: int = 500,
+        max_pending: int = 10000
+    ):
+        """
+        Args:
+            path (Union[str, Path]): SQLite database file, created if missing
+            flush_interval (float): Seconds the writer collects messages before writing a batch
+            max_batch (int): Messages written at most per batch
+            max_pending (int): Messages queued before new ones are dropped
+        """
+        super().__init__(path, max_pending=max_pending)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.batches_written = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection:
+            # Write-ahead logging lets queries read while the writer commits
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+
+    def append(self, session_id: str, page_id: str, message: dict, case_id: str = None) -> bool:
+        """
+        Queue a transcript message for writing.
+
+        Args:
+            session_id (str): Streamlit session ID
+            page_id (str): ID of the client page instance that reported it
+            message (dict): Client report with index, role, text and time
+            case_id (str): Simulation case of the session
+
+        Returns:
+            bool: False if the message was dropped because the writer is behind
+        """
+        row = (
+            session_id,
+            page_id,
+            message["index"],
+            case_id,
+            message["role"],
+            message["text"],
+            message.get("time"),
+            time.time(),
+        )
+        return self._put(row)
+
+    @property
+    def dropped_messages(self) -> int:
+        """
+        Returns:
+            int: Messages dropped because the writer was behind
+        """
+        return self.dropped
+
+    def get_transcript(self, session_id: str) -> List[dict]:
+        """
+        Return the transcript of a session, e.g. for grading.
+
+        Messages still queued are not included; call ``flush`` first to
+        wait for them.
+
+        Args:
+            session_id (str): Streamlit session ID
+
+        Returns:
+            List[dict]: Latest version of each message, in conversation order
+        """
+        with closing(self._connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            return [dict(row) for row in connection.execute(_SESSION_QUERY, (session_id,))]
+
+    def list_sessions(
+        self, case: Optional[str] = None, since: Optional[float] = None
+    ) -> List[dict]:
+        """
+        Return the sessions with stored transcripts, to find the ID to pass to ``get_transcript``.
+
+        Args:
+            case (str): Only sessions of this simulation case
+            since (float): Only sessions active at or after this Unix timestamp
+
+        Returns:
+            List[dict]: session_id, case_id, started_at, last_stored_at and messages of each
+                session, most recently active first
+        """
+        where, having, params = "", "", []
+        if case is not None:
+            where = "WHERE case_id = ?"
+            params.append(case)
+        if since is not None:
+            having = "HAVING MAX(stored_at) >= ?"
+            params.append(since)
+        with closing(self._connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            query = _SESSIONS_QUERY.format(where=where, having=having)
+            return [dict(row) for row in connection.execute(query, params)]
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _write(self) -> None:
+        with closing(self._connect()) as connection:
+            for batch in self._batches(self.max_batch, self.flush_interval):
+                try:
+                    with connection:
+                        connection.executemany(
+                            "INSERT INTO transcript (session_id, page_id, entry_index, case_id,"
+                            " role, text, client_time, stored_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            batch
+                        )
+                    self.batches_written += 1
+                except sqlite3.Error as error:
+                    # A failed batch is lost, but later ones are still written
+                    logger.error(
+                        f"Failed to write {len(batch)} transcript messages to {self.path}: {error}"
+                    )
+
+
+@st.cache_resource
+def get_transcript_store(path: str) -> TranscriptStore:
+    """
+    Return the process-wide transcript store for a database file, shared by all sessions
+
+    Args:
+        path (str): SQLite database file
+
+    Returns:
+        TranscriptStore: Running transcript store
+    """
+    store = TranscriptStore(path).start()
+    atexit.register(store.close)
+    return store
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(
+        description="Print the stored transcript of a session, or the stored sessions,"
+                    " as JSON lines"
+    )
+    parser.add_argument("database")
+    parser.add_argument(
+        "session_id", nargs="?", help="Session to print; lists the stored sessions when omitted"
+    )
+    parser.add_argument("--case", help="Only list sessions of this case")
+    parser.add_argument(
+        "--since-hours", type=float, help="Only list sessions active in the last hours"
+    )
+    args = parser.parse_args()
+
+    store = TranscriptStore(args.database)
+    if args.session_id:
+        rows = store.get_transcript(args.session_id)
+    else:
+        since = time.time() - args.since_hours * 3600 if args.since_hours is not None else None
+        rows = store.list_sessions(case=args.case, since=since)
+    for row in rows:
+        print(json.dumps(row))
@@ -1,6 +1,40 @@
+import functools
+from collections import OrderedDict, deque
+from fractions import Fraction
+from typing import Iterator, List, Optional, Sequence, Union
+
 import av
 import numpy as np
 
+# NumPy sample types for the packed variant of each FFmpeg sample format
+_SAMPLE_DTYPES = {
+    "u8": np.uint8,
+    "s16": np.int16,
+    "s32": np.int32,
+    "s64": np.int64,
+    "flt": np.float32,
+    "dbl": np.float64,
+}
+
+def frame_geometry(format: str, layout: str):
+    """
+    Resolve the NumPy dtype, planarity and channel count of a sample format and layout.
+
+    This is how the helpers here map between AudioFrame planes and NumPy
+    arrays; use it to read or fill frame planes directly, e.g. in place.
+
+    Args:
+        format (str): Audio format string
+        layout (str): Channel layout
+
+    Returns:
+        tuple: (dtype, is_planar, channels)
+    """
+    audio_format = av.AudioFormat(format)
+    dtype = np.dtype(_SAMPLE_DTYPES[audio_format.packed.name])
+    channels = len(av.AudioLayout(layout).channels)
+    return dtype, audio_format.is_planar, channels
+
 def audio_frame_to_pcm_audio(frame: av.AudioFrame) -> bytes:
     """
     Convert an AudioFrame to PCM audio bytes.
@@ -11,14 +45,36 @@ def audio_frame_to_pcm_audio(frame: av.AudioFrame) -> bytes:
     Returns:
         bytes: PCM audio data
     """
+    if not frame.format.is_planar:
+        # Packed audio lives in a single plane, so one copy is enough
+        return bytes(audio_frame_to_pcm_views(frame)[0])
     return frame.to_ndarray().tobytes()
 
+def audio_frame_to_pcm_views(frame: av.AudioFrame) -> List[memoryview]:
+    """
+    Return zero-copy views over the PCM audio data of each frame plane.
+
+    Packed formats yield a single view of interleaved samples; planar
+    formats yield one view per channel. The views share memory with the
+    frame, so they are only valid until the frame is modified or reused.
+
+    Args:
+        frame (av.AudioFrame): Input audio frame
+
+    Returns:
+        List[memoryview]: Byte views, one per plane
+    """
+    dtype, is_planar, channels = frame_geometry(frame.format.name, frame.layout.name)
+    nbytes = frame.samples * dtype.itemsize * (1 if is_planar else channels)
+    return [memoryview(plane)[:nbytes] for plane in frame.planes]
+
 def pcm_audio_to_audio_frame(
     pcm_audio: bytes,
     *,
     format: str,
     layout: str,
-    sample_rate: int
+    sample_rate: int,
+    pool: Optional["AudioFramePool"] = None
 ) -> av.AudioFrame:
     """
     Convert PCM audio bytes to an AudioFrame.
@@ -28,36 +84,311 @@ def pcm_audio_to_audio_frame(
         format (str): Audio format string
         layout (str): Channel layout
         sample_rate (int): Audio sample rate
+        pool (AudioFramePool): Optional pool to refill a preallocated frame from
 
     Returns:
         av.AudioFrame: Configured audio frame
     """
-    raw_data = np.frombuffer(pcm_audio, np.int16).reshape(1, -1)
+    if pool is not None:
+        return pool.fill(pcm_audio, format=format, layout=layout, sample_rate=sample_rate)
+
+    dtype, is_planar, channels = frame_geometry(format, layout)
+    raw_data = np.frombuffer(pcm_audio, dtype).reshape(channels if is_planar else 1, -1)
     frame = av.AudioFrame.from_ndarray(raw_data, format=format, layout=layout)
     frame.sample_rate = sample_rate
     return frame
 
+@functools.lru_cache(maxsize=64)
+def _get_silence_bytes(nbytes: int) -> bytes:
+    """
+    Return a shared, immutable zero-filled buffer of the given size.
+
+    Args:
+        nbytes (int): Buffer size in bytes
+
+    Returns:
+        bytes: Zero-filled buffer
+    """
+    return bytes(nbytes)
+
 def get_blank_audio_frame(
     *,
     format: str,
     layout: str,
     samples: int,
-    sample_rate: int
+    sample_rate: int,
+    pts: Optional[int] = None,
+    pool: Optional["AudioFramePool"] = None
 ) -> av.AudioFrame:
     """
     Create a blank audio frame with specified parameters.
 
+    Planes are filled from cached silence buffers, so repeated calls do not
+    allocate a fresh zero buffer per plane.
+
     Args:
         format (str): Audio format string
         layout (str): Channel layout
         samples (int): Number of samples
         sample_rate (int): Audio sample rate
+        pts (int): Optional presentation timestamp to stamp on the frame
+        pool (AudioFramePool): Optional pool to take the frame from
 
     Returns:
         av.AudioFrame: Blank audio frame
     """
-    frame = av.AudioFrame(format=format, layout=layout, samples=samples)
+    if pool is not None:
+        frame = pool.acquire(format=format, layout=layout, samples=samples, sample_rate=sample_rate)
+    else:
+        frame = av.AudioFrame(format=format, layout=layout, samples=samples)
     for p in frame.planes:
-        p.update(bytes(p.buffer_size))
+        p.update(_get_silence_bytes(p.buffer_size))
     frame.sample_rate = sample_rate
+    frame.pts = pts
+    if pts is not None:
+        frame.time_base = Fraction(1, sample_rate)
     return frame
+
+def iter_blank_audio_frames(
+    count: int,
+    *,
+    format: str,
+    layout: str,
+    samples: int,
+    sample_rate: int,
+    start_pts: int = 0,
+    pool: Optional["AudioFramePool"] = None
+) -> Iterator[av.AudioFrame]:
+    """
+    Generate consecutive blank audio frames with increasing timestamps.
+
+    Timestamps are counted in samples (a time base of 1/sample_rate),
+    starting at ``start_pts``.
+
+    Args:
+        count (int): Number of frames to generate
+        format (str): Audio format string
+        layout (str): Channel layout
+        samples (int): Number of samples per frame
+        sample_rate (int): Audio sample rate
+        start_pts (int): Timestamp of the first frame
+        pool (AudioFramePool): Optional pool to take the frames from
+
+    Yields:
+        av.AudioFrame: Blank audio frame
+    """
+    for i in range(count):
+        yield get_blank_audio_frame(
+            format=format,
+            layout=layout,
+            samples=samples,
+            sample_rate=sample_rate,
+            pts=start_pts + i * samples,
+            pool=pool
+        )
+
+def audio_frames_to_pcm_array(frames: Sequence[av.AudioFrame]) -> np.ndarray:
+    """
+    Convert a batch of AudioFrames to a single contiguous PCM array.
+
+    The output uses the same shape convention as ``av.AudioFrame.to_ndarray``:
+    ``(channels, total_samples)`` for planar formats and
+    ``(1, total_samples * channels)`` for packed (interleaved) formats.
+    Each frame plane is copied exactly once, straight into the output buffer.
+
+    Args:
+        frames (Sequence[av.AudioFrame]): Frames sharing one format and layout
+
+    Returns:
+        np.ndarray: Contiguous PCM audio data
+    """
+    if not frames:
+        raise ValueError("At least one frame is required")
+
+    first = frames[0]
+    dtype, is_planar, channels = frame_geometry(first.format.name, first.layout.name)
+    total_samples = sum(frame.samples for frame in frames)
+
+    if is_planar:
+        out = np.empty((channels, total_samples), dtype)
+    else:
+        out = np.empty((1, total_samples * channels), dtype)
+
+    offset = 0
+    for frame in frames:
+        if frame.format.name != first.format.name or frame.layout.name != first.layout.name:
+            raise ValueError("All frames must share the same format and layout")
+        count = frame.samples if is_planar else frame.samples * channels
+        for row, plane in zip(out, frame.planes):
+            row[offset:offset + count] = np.frombuffer(plane, dtype, count)
+        offset += count
+    return out
+
+def pcm_array_to_audio_frames(
+    pcm_audio: Union[bytes, np.ndarray],
+    *,
+    format: str,
+    layout: str,
+    sample_rate: int,
+    samples_per_frame: int
+) -> List[av.AudioFrame]:
+    """
+    Split a large PCM buffer into AudioFrames of a fixed duration.
+
+    ``pcm_audio`` is either raw bytes or an array in the shape returned by
+    ``audio_frames_to_pcm_array``. Frame planes are filled directly from views
+    of the input; the last frame holds the remaining samples and may be shorter.
+
+    Args:
+        pcm_audio (Union[bytes, np.ndarray]): Input PCM audio data
+        format (str): Audio format string
+        layout (str): Channel layout
+        sample_rate (int): Audio sample rate
+        samples_per_frame (int): Number of samples per channel in each frame
+
+    Returns:
+        List[av.AudioFrame]: Configured audio frames
+    """
+    dtype, is_planar, channels = frame_geometry(format, layout)
+    if isinstance(pcm_audio, (bytes, bytearray, memoryview)):
+        pcm_audio = np.frombuffer(pcm_audio, dtype)
+    raw_data = np.ascontiguousarray(pcm_audio, dtype).reshape(channels if is_planar else 1, -1)
+    # Values per plane row that make up one sample of every channel
+    stride = 1 if is_planar else channels
+    total_samples = raw_data.shape[1] // stride
+
+    frames = []
+    for start in range(0, total_samples, samples_per_frame):
+        samples = min(samples_per_frame, total_samples - start)
+        frame = av.AudioFrame(format=format, layout=layout, samples=samples)
+        begin = start * stride
+        end = begin + samples * stride
+        for row, plane in zip(raw_data, frame.planes):
+            plane.update(memoryview(row[begin:end]).cast("B"))
+        frame.sample_rate = sample_rate
+        frames.append(frame)
+    return frames
+
+class AudioFramePool:
+    """
+    Pool of preallocated AudioFrames that are refilled in place.
+
+    Frames are grouped by (format, layout, samples, sample_rate). Callers
+    take a frame with ``acquire`` or ``fill`` and hand it back with
+    ``release`` once every consumer is done with it; released frames are
+    reused instead of allocating a new ``av.AudioFrame`` per chunk.
+
+    Streams with variable chunk sizes, such as assistant audio deltas,
+    produce many frame shapes, so besides the per-shape limit the pool
+    keeps at most ``max_frames`` idle frames in total and evicts those of
+    the least recently used shapes first.
+    """
+
+    def __init__(self, max_frames_per_key: int = 64, max_frames: int = 256):
+        """
+        Args:
+            max_frames_per_key (int): Maximum idle frames kept per frame shape
+            max_frames (int): Maximum idle frames kept across all shapes
+        """
+        self.max_frames_per_key = max_frames_per_key
+        self.max_frames = max_frames
+        self.idle_frames = 0
+        # Idle frames by shape, least recently used shape first
+        self._free = OrderedDict()
+
+    def acquire(
+        self,
+        *,
+        format: str,
+        layout: str,
+        samples: int,
+        sample_rate: int
+    ) -> av.AudioFrame:
+        """
+        Take a frame from the pool, allocating one if none is idle.
+
+        The returned frame's contents are undefined until it is filled.
+
+        Args:
+            format (str): Audio format string
+            layout (str): Channel layout
+            samples (int): Number of samples
+            sample_rate (int): Audio sample rate
+
+        Returns:
+            av.AudioFrame: Frame with the requested shape
+        """
+        key = (format, layout, samples, sample_rate)
+        free = self._free.get(key)
+        if free:
+            frame = free.pop()
+            self.idle_frames -= 1
+            if free:
+                self._free.move_to_end(key)
+            else:
+                del self._free[key]
+        else:
+            frame = av.AudioFrame(format=format, layout=layout, samples=samples)
+            frame.sample_rate = sample_rate
+        frame.pts = None
+        return frame
+
+    def fill(
+        self,
+        pcm_audio: bytes,
+        *,
+        format: str,
+        layout: str,
+        sample_rate: int
+    ) -> av.AudioFrame:
+        """
+        Take a frame from the pool and copy PCM audio bytes into its planes.
+
+        Args:
+            pcm_audio (bytes): Input PCM audio data, laid out as in ``audio_frame_to_pcm_audio``
+            format (str): Audio format string
+            layout (str): Channel layout
+            sample_rate (int): Audio sample rate
+
+        Returns:
+            av.AudioFrame: Filled audio frame
+        """
+        dtype, is_planar, channels = frame_geometry(format, layout)
+        data = memoryview(pcm_audio).cast("B")
+        samples = len(data) // (dtype.itemsize * channels)
+        frame = self.acquire(format=format, layout=layout, samples=samples, sample_rate=sample_rate)
+        plane_size = len(data) // len(frame.planes)
+        for i, plane in enumerate(frame.planes):
+            plane.update(data[i * plane_size:(i + 1) * plane_size])
+        return frame
+
+    def release(self, frame: av.AudioFrame) -> None:
+        """
+        Return a frame to the pool for reuse.
+
+        Args:
+            frame (av.AudioFrame): Frame previously obtained from this pool
+        """
+        key = (frame.format.name, frame.layout.name, frame.samples, frame.sample_rate)
+        free = self._free.get(key)
+        if free is None:
+            free = self._free[key] = deque()
+        elif len(free) >= self.max_frames_per_key:
+            return
+        self._free.move_to_end(key)
+        free.append(frame)
+        self.idle_frames += 1
+        while self.idle_frames > self.max_frames:
+            oldest_key, oldest = next(iter(self._free.items()))
+            oldest.popleft()
+            self.idle_frames -= 1
+            if not oldest:
+                del self._free[oldest_key]
+
+    @property
+    def shapes(self) -> int:
+        """
+        Returns:
+            int: Number of frame shapes with idle frames
+        """
+        return len(self._free)